@@ -18,11 +18,22 @@ from routes.projects import projects_bp
 from routes.finance import finance_bp
 from routes.inventory_ext import inventory_ext_bp
 from routes.crm import crm_bp
+from routes.reports import reports_bp
+from services.report_jobs import report_job_service
+from services.import_jobs import import_job_service
+from services.parallel_export import parallel_export_service
+from services.image_processing import image_processing_service
+from services.file_serving import file_serving_service
+from services.storage import storage_service
+from services.image_cache import image_cache
 from websocket_server import init_websocket, start_background_tasks
+from utils.upload_limits import UploadLimitRequest
 
 
 def create_app(config_name='default'):
     app = Flask(__name__)
+    # Lets import routes accept larger uploads than MAX_CONTENT_LENGTH
+    app.request_class = UploadLimitRequest
     
     # Ensure .env file exists with JWT_SECRET_KEY before loading config
     # This prevents logout on server restart
@@ -74,6 +85,27 @@ def create_app(config_name='default'):
     os.makedirs(os.path.join(upload_folder, 'avatars'), exist_ok=True)
     os.makedirs(os.path.join(upload_folder, 'products'), exist_ok=True)
     
+    # Start the report job workers
+    report_job_service.init_app(app)
+    
+    # Start the import job workers; they pick up jobs a previous process left unfinished
+    import_job_service.init_app(app)
+    
+    # Parallel exports render shards in worker processes, started on first use
+    parallel_export_service.init_app(app)
+    
+    # Uploaded images are resized in worker processes, started on first use
+    image_processing_service.init_app(app)
+    
+    # Uploads are served with cache headers, optionally through the front proxy
+    file_serving_service.init_app(app)
+    
+    # Uploads are kept on local disk or in an S3-compatible bucket
+    storage_service.init_app(app)
+    
+    # Renders of the /img endpoint are cached on local disk
+    image_cache.init_app(app)
+    
     # Register blueprints
     app.register_blueprint(products_bp, url_prefix='/api/v1')
     app.register_blueprint(customers_bp, url_prefix='/api/v1')
@@ -89,6 +121,7 @@ def create_app(config_name='default'):
     app.register_blueprint(crm_bp, url_prefix='/api/v1')
     app.register_blueprint(finance_bp, url_prefix='/api/v1')
     app.register_blueprint(inventory_ext_bp, url_prefix='/api/v1')
+    app.register_blueprint(reports_bp, url_prefix='/api/v1')
     # Health check endpoint
     @app.route('/health', methods=['GET'])
     def health_check():
@@ -112,7 +145,8 @@ def create_app(config_name='default'):
                 'auth': '/api/v1/auth',
                 'settings': '/api/v1/settings',
                 'uploads': '/api/v1/upload',
-                'export_import': '/api/v1/export'
+                'export_import': '/api/v1/export',
+                'reports': '/api/v1/reports/jobs'
             }
         })
     
@@ -141,12 +175,14 @@ def create_app(config_name='default'):
     
     return app, socketio
 
-# Create app instance for Flask-Migrate
-app, socketio = create_app()
+# Create app instance for Flask-Migrate. Worker processes spawned for parallel
+# exports import this module as __mp_main__ and must not start a second app.
+if __name__ != '__mp_main__':
+    app, socketio = create_app()
 
 if __name__ == '__main__':
     # Start background tasks for WebSocket updates
     start_background_tasks()
     
-    # Run the application with SocketIO support
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    # Run the development server with SocketIO support (serve.py runs production)
+    socketio.run(app, debug=app.config['DEBUG'], host='0.0.0.0', port=5000)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Throughput of the CSV import endpoints
+
+Generates a customers CSV and a products CSV with fresh emails and SKUs, posts
+them to /import/customers and /import/products, and reports rows per second.
+A slice of rows is deliberately invalid and must come back as row errors.
+Imported rows are deleted again afterwards (deleting products checks
+order_items row by row, so cleanup takes longer than the import).
+
+Usage:
+    python benchmarks/bulk_import.py
+    python benchmarks/bulk_import.py --rows 100000
+"""
+
+import os
+import io
+import sys
+import csv
+import time
+import uuid
+import argparse
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import User, Customer, Product
+from flask_jwt_extended import create_access_token
+
+# Every INVALID_EVERY-th row is missing its name
+INVALID_EVERY = 100
+
+def build_csv(header, make_row, rows: int) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    for n in range(rows):
+        row = make_row(n)
+        if n % INVALID_EVERY == INVALID_EVERY - 1:
+            row[0] = ''
+        writer.writerow(row)
+    return output.getvalue().encode('utf-8')
+
+def post_import(client, headers, dataset: str, content: bytes):
+    start = time.perf_counter()
+    response = client.post(
+        f'/api/v1/import/{dataset}',
+        headers=headers,
+        data={'file': (io.BytesIO(content), f'{dataset}.csv')},
+        content_type='multipart/form-data'
+    )
+    return response, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure CSV import throughput')
+    parser.add_argument('--rows', type=int, default=100000, help='Rows per file')
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    with app.app_context():
+        admin = User.query.filter(User.role.in_(['admin', 'manager'])).first()
+        if not admin:
+            print("❌ Need an admin or manager user in the database")
+            return False
+        token = create_access_token(identity=str(admin.id))
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    expected_errors = args.rows // INVALID_EVERY
+
+    files = {
+        'customers': build_csv(
+            ['Name', 'Email', 'Company', 'Phone', 'Status', 'Address'],
+            lambda n: [f'Bulk {n}', f'bulk-{run_id}-{n}@example.com', 'Bulk Co', '555-0100', 'Active', f'{n} Bulk Street'],
+            args.rows
+        ),
+        'products': build_csv(
+            ['Name', 'SKU', 'Category', 'Price', 'Stock', 'Status', 'Description'],
+            lambda n: [f'Bulk {n}', f'BULK-{run_id}-{n}', 'Bulk', f'{n % 1000}.99', str(n % 50), 'In Stock', ''],
+            args.rows
+        )
+    }
+
+    ok = True
+    try:
+        for dataset, content in files.items():
+            response, elapsed = post_import(client, headers, dataset, content)
+            data = response.get_json().get('data', {})
+            passed = (
+                response.status_code == 200
+                and data.get('imported_count') == args.rows - expected_errors
+                and data.get('error_count') == expected_errors
+            )
+            ok = ok and passed
+            print(
+                f"{'✓' if passed else '❌'} {dataset:<10} {args.rows} rows in {elapsed:6.2f} s "
+                f"({args.rows / elapsed:9.0f} rows/s)   imported {data.get('imported_count')}   "
+                f"errors {data.get('error_count')}"
+            )
+            if response.status_code != 200:
+                print(f"    {response.get_json()}")
+    finally:
+        with app.app_context():
+            Customer.query.filter(Customer.email.like(f'bulk-{run_id}-%')).delete(synchronize_session=False)
+            Product.query.filter(Product.sku.like(f'BULK-{run_id}-%')).delete(synchronize_session=False)
+            db.session.commit()
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark for /dashboard/stats
+
+Compares the old one-query-per-metric implementation with the single-pass
+stats service: SQL statements per call and latency.
+
+Usage:
+    python benchmarks/dashboard_stats.py --seed 1000000 --runs 20
+"""
+
+import os
+import sys
+import time
+import argparse
+from decimal import Decimal
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import Customer, Order, OrderItem
+from services.dashboard_stats import dashboard_stats_service
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import contains_eager, selectinload
+
+SEED_SQL = """
+INSERT INTO products (id, name, sku, category, price, stock, status, created_at, updated_at)
+SELECT gen_random_uuid(), 'Bench Product ' || g, 'BENCH-' || g, 'Bench', 10 + g % 90, 1000000, 'In Stock', now(), now()
+FROM generate_series(1, 200) g;
+
+INSERT INTO customers (id, name, email, status, join_date, created_at, updated_at)
+SELECT gen_random_uuid(), 'Bench Customer ' || g, 'bench' || g || '@example.com',
+       CASE WHEN g % 5 = 0 THEN 'Inactive' ELSE 'Active' END,
+       current_date - (g % 730), now() - ((g % 730) || ' days')::interval, now()
+FROM generate_series(1, :customers) g;
+
+CREATE TEMP TABLE bench_customers AS
+SELECT id, row_number() OVER () AS n FROM customers WHERE email LIKE 'bench%@example.com';
+CREATE TEMP TABLE bench_products AS
+SELECT id, price, row_number() OVER () AS n FROM products WHERE sku LIKE 'BENCH-%';
+
+INSERT INTO orders (id, order_number, customer_id, total, status, order_date, payment_method, created_at, updated_at)
+SELECT gen_random_uuid(), 'BENCH-' || g, c.id, 0,
+       (ARRAY['Pending', 'Processing', 'Shipped', 'Completed', 'Cancelled'])[1 + g % 5],
+       current_date - (g % 730), 'Credit Card',
+       now() - ((g % 730) || ' days')::interval, now() - ((g % 730) || ' days')::interval + ((g % 7) || ' days')::interval
+FROM generate_series(1, :orders) g
+JOIN bench_customers c ON c.n = 1 + g % :customers;
+
+INSERT INTO order_items (id, order_id, product_id, quantity, unit_price, subtotal)
+SELECT gen_random_uuid(), o.id, p.id, 1 + (abs(hashtext(o.order_number)) % 4), p.price,
+       p.price * (1 + (abs(hashtext(o.order_number)) % 4))
+FROM orders o
+JOIN bench_products p ON p.n = 1 + abs(hashtext(o.order_number)) % 200
+WHERE o.order_number LIKE 'BENCH-%';
+
+UPDATE orders o SET total = i.subtotal
+FROM order_items i WHERE i.order_id = o.id AND o.order_number LIKE 'BENCH-%';
+
+ANALYZE;
+"""
+
+def seed(orders):
+    """Seed the database with benchmark rows"""
+    print(f"Seeding {orders:,} orders...")
+    db.session.execute(text(SEED_SQL), {'orders': orders, 'customers': max(orders // 20, 1)})
+    db.session.commit()
+    print("✓ Seed complete")
+
+def legacy_stats(current_start, previous_start):
+    """The previous /dashboard/stats implementation, one query per metric"""
+    total_revenue = db.session.query(func.sum(Order.total)).filter(
+        Order.status != 'Cancelled', Order.created_at >= current_start
+    ).scalar() or Decimal('0.0')
+    active_customers = Customer.query.filter_by(status='Active').count()
+    new_active_current = Customer.query.filter(
+        Customer.status == 'Active', Customer.created_at >= current_start
+    ).count()
+    new_active_prev = Customer.query.filter(
+        Customer.status == 'Active', Customer.created_at >= previous_start, Customer.created_at < current_start
+    ).count()
+    products_sold = db.session.query(func.sum(OrderItem.quantity)).join(Order).filter(
+        Order.created_at >= current_start
+    ).scalar() or 0
+    pending_orders = Order.query.filter_by(status='Pending').count()
+    recent_orders = db.session.query(Order).join(Customer).order_by(Order.created_at.desc()).limit(5).all()
+    for order in recent_orders:
+        [item.product.name for item in order.order_items[:2]]
+    dashboard_stats_service.get_top_products(current_start, limit=4)
+    prev_revenue = db.session.query(func.sum(Order.total)).filter(
+        Order.status != 'Cancelled', Order.created_at >= previous_start, Order.created_at < current_start
+    ).scalar() or Decimal('0.0')
+    prev_products_sold = db.session.query(func.sum(OrderItem.quantity)).join(Order).filter(
+        Order.created_at >= previous_start, Order.created_at < current_start
+    ).scalar() or 0
+    prev_pending_orders = Order.query.filter(
+        Order.status == 'Pending', Order.created_at >= previous_start, Order.created_at < current_start
+    ).count()
+    return total_revenue, active_customers, new_active_current, new_active_prev, products_sold, \
+        pending_orders, prev_revenue, prev_products_sold, prev_pending_orders
+
+def run(label, fn, runs):
+    """Run fn `runs` times and print statement count and latency percentiles"""
+    statements = []
+    timings = []
+
+    def count_statement(*args, **kwargs):
+        statements[-1] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    try:
+        for _ in range(runs):
+            statements.append(0)
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+            db.session.expunge_all()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<10} statements/call: {max(statements):>3}   p50: {p50:9.1f} ms   p95: {p95:9.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark /dashboard/stats')
+    parser.add_argument('--seed', type=int, default=0, help='Number of orders to seed before running')
+    parser.add_argument('--runs', type=int, default=20, help='Calls per implementation')
+    parser.add_argument('--days', default='30', help='Value of the days query parameter')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.seed:
+            seed(args.seed)
+
+        print(f"Orders in database: {Order.query.count():,}")
+        current_start, previous_start, _ = dashboard_stats_service.resolve_period(args.days)
+
+        def single_pass():
+            dashboard_stats_service.get_period_metrics(current_start, previous_start)
+            dashboard_stats_service.get_top_products(current_start, limit=4)
+            db.session.query(Order).join(Customer).options(
+                contains_eager(Order.customer),
+                selectinload(Order.order_items).joinedload(OrderItem.product)
+            ).order_by(Order.created_at.desc()).limit(5).all()
+
+        run('before', lambda: legacy_stats(current_start, previous_start), args.runs)
+        run('after', single_pass, args.runs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Check that delivery-time statistics never load Order rows
+
+Adds --orders completed orders for the run (removed afterwards), then calls
+the endpoints that report delivery time while counting SQL statements and
+ORM load events for Order. The statistics are aggregated in the database by
+services/dashboard_stats.py, so no Order instance should be built no matter
+how many orders exist; the script exits non-zero if one is, or if an
+endpoint fails or leaves out the delivery_time percentiles.
+
+Usage:
+    python benchmarks/delivery_stats.py
+    python benchmarks/delivery_stats.py --orders 200000
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import Order
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, text
+
+ENDPOINTS = [
+    ('GET /dashboard/performance-metrics', '/api/v1/dashboard/performance-metrics'),
+    ('GET /analytics/overview', '/api/v1/analytics/overview'),
+]
+
+DELIVERY_KEYS = {'average_days', 'p50_days', 'p90_days', 'p99_days', 'sample_size'}
+
+SEED_SQL = """
+INSERT INTO customers (id, name, email, status, join_date, created_at, updated_at)
+VALUES (gen_random_uuid(), 'Delivery Bench', 'delivery-bench@example.com', 'Active', current_date, now(), now());
+
+INSERT INTO orders (id, order_number, customer_id, total, status, order_date, payment_method, created_at, updated_at)
+SELECT gen_random_uuid(), 'DELIVERY-BENCH-' || g,
+       (SELECT id FROM customers WHERE email = 'delivery-bench@example.com'), 100, 'Completed',
+       current_date - (g % 365), 'Credit Card',
+       now() - ((g % 365) || ' days')::interval, now() - ((g % 365) || ' days')::interval + ((g % 20) || ' days')::interval
+FROM generate_series(1, :orders) g;
+"""
+
+CLEANUP_SQL = """
+DELETE FROM orders WHERE order_number LIKE 'DELIVERY-BENCH-%';
+DELETE FROM customers WHERE email = 'delivery-bench@example.com';
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description='Check delivery-time statistics load no Order rows')
+    parser.add_argument('--orders', type=int, default=5000, help='Completed orders added for the run')
+    args = parser.parse_args()
+
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+        if args.orders:
+            for statement in SEED_SQL.strip().split(';\n\n'):
+                db.session.execute(text(statement), {'orders': args.orders})
+            db.session.commit()
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    statements = [0]
+    loaded = [0]
+
+    def count_statement(*args, **kwargs):
+        statements[0] += 1
+
+    def count_load(*args, **kwargs):
+        loaded[0] += 1
+
+    ok = True
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    event.listen(Order, 'load', count_load)
+    try:
+        for label, url in ENDPOINTS:
+            statements[0] = loaded[0] = 0
+            start = time.perf_counter()
+            response = client.get(url, headers=headers)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            delivery = (response.get_json() or {}).get('data', {}).get('delivery_time') or {}
+            passed = response.status_code == 200 and loaded[0] == 0 and DELIVERY_KEYS <= set(delivery)
+            ok = ok and passed
+            print(f"{'✓' if passed else '❌'} {label:<38} Order rows loaded: {loaded[0]:>6}   "
+                  f"statements: {statements[0]:>3}   {elapsed_ms:7.1f} ms   "
+                  f"sample {delivery.get('sample_size')}, p50 {delivery.get('p50_days')} / p99 {delivery.get('p99_days')} days")
+    finally:
+        event.remove(Order, 'load', count_load)
+        event.remove(engine, 'before_cursor_execute', count_statement)
+        if args.orders:
+            with app.app_context():
+                for statement in CLEANUP_SQL.strip().split(';\n'):
+                    db.session.execute(text(statement))
+                db.session.commit()
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Memory and time to first byte of the export endpoints
+
+Downloads each export while tracing Python allocations, and reports the size,
+the peak traced memory, the time until the first chunk arrived and the total
+time. With the streaming sinks the peak should not grow with the row count;
+Parquet peaks at about one record batch.
+
+Usage:
+    python benchmarks/export_streaming.py
+    python benchmarks/export_streaming.py --dataset orders
+    python benchmarks/export_streaming.py --format csv --format parquet --format arrow
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+
+def measure(client, url, headers):
+    """Download url chunk by chunk; return (status, bytes, first byte s, total s, peak bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first_byte = None
+    size = 0
+
+    response = client.get(url, headers=headers, buffered=False)
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return response.status_code, size, first_byte or total, total, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure export memory and latency')
+    parser.add_argument('--dataset', choices=['customers', 'products', 'orders', 'order-items', 'expenses'],
+                        action='append', help='Dataset to export (repeatable, default customers, products, orders)')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], action='append',
+                        help='Export format (repeatable, default csv)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        admin = User.query.filter(User.role.in_(['admin', 'manager'])).first()
+        if not admin:
+            print("❌ Need an admin or manager user in the database")
+            return False
+        token = create_access_token(identity=str(admin.id))
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    ok = True
+    for dataset in args.dataset or ['customers', 'products', 'orders']:
+        for format_type in args.format or ['csv']:
+            status, size, first_byte, total, peak = measure(
+                client, f'/api/v1/export/{dataset}?format={format_type}', headers
+            )
+            ok = ok and status == 200
+            print(
+                f"{'✓' if status == 200 else '❌'} {dataset:<11} {format_type:<7} {size / 1024:8.1f} KiB   "
+                f"first byte {first_byte * 1000:7.1f} ms   total {total * 1000:7.1f} ms   "
+                f"peak {peak / 1024 / 1024:6.2f} MiB"
+            )
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
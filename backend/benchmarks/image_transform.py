@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Cold and cached latency of the /img transform endpoint
+
+Uploads a camera-sized JPEG, then for each --width sends --concurrency
+simultaneous requests for that new size (a cold burst) followed by
+--requests sequential ones (cache hits). Reports how many renders the burst
+caused (1 with single-flight), the slowest cold response and the p50/p99 of
+the hits. The image and its cached renders are removed afterwards.
+
+Usage:
+    python benchmarks/image_transform.py
+    python benchmarks/image_transform.py --concurrency 32 --width 320 --width 640 --width 1280
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+from services.image_cache import image_cache
+from services.image_processing import image_processing_service
+from services.image_store import image_store
+from PIL import Image
+
+def make_jpeg(width: int, height: int) -> bytes:
+    noise = Image.effect_noise((width // 4, height // 4), 64).resize((width, height))
+    img = Image.merge('RGB', (noise, Image.linear_gradient('L').resize((width, height)), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def timed_get(client, url):
+    start = time.perf_counter()
+    response = client.get(url)
+    return response.status_code, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure /img transform latency and single-flight')
+    parser.add_argument('--width', type=int, action='append', help='Widths to request (repeatable, default 320 and 960)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Simultaneous requests for a new size')
+    parser.add_argument('--requests', type=int, default=200, help='Sequential requests once cached')
+    parser.add_argument('--size', default='4000x3000', help='Uploaded image size WIDTHxHEIGHT')
+    args = parser.parse_args()
+
+    with app.app_context():
+        admin = User.query.filter(User.role.in_(['admin', 'manager'])).first()
+        if not admin:
+            print("❌ Need an admin or manager user in the database")
+            return False
+        token = create_access_token(identity=str(admin.id))
+        db.session.remove()
+
+    client = app.test_client()
+    width, height = (int(value) for value in args.size.split('x'))
+    response = client.post(
+        '/api/v1/upload/product-image', headers={'Authorization': f'Bearer {token}'},
+        data={'file': (io.BytesIO(make_jpeg(width, height) + os.urandom(16)), 'photo.jpg')},
+        content_type='multipart/form-data'
+    )
+    if response.status_code != 200:
+        print(f"❌ Upload failed: {response.get_json()}")
+        return False
+    image_hash = response.get_json()['data']['hash']
+
+    # Count renders that reach the worker pool
+    renders = []
+    transform = image_processing_service.transform
+    image_processing_service.transform = lambda *a: renders.append(a) or transform(*a)
+
+    print(f"Image {width}x{height}; {args.concurrency} concurrent cold requests; CPUs: {os.cpu_count()}")
+    ok = True
+    try:
+        for target in args.width or [320, 960]:
+            url = f'/api/v1/img/{image_hash}?w={target}&fmt=webp'
+            renders.clear()
+            cold = []
+            threads = [
+                threading.Thread(target=lambda: cold.append(timed_get(app.test_client(), url)))
+                for _ in range(args.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            hits = [timed_get(client, url) for _ in range(args.requests)]
+            statuses = {status for status, _ in cold + hits}
+            latencies = [seconds for _, seconds in hits]
+            ok = ok and statuses == {200} and len(renders) == 1
+            print(
+                f"{'✓' if statuses == {200} else '❌'} w={target:<5} renders {len(renders):3}   "
+                f"cold max {max(seconds for _, seconds in cold) * 1000:8.1f} ms   "
+                f"cached p50 {statistics.median(latencies) * 1000:6.2f} ms   p99 {percentile(latencies, 0.99) * 1000:6.2f} ms"
+            )
+    finally:
+        image_processing_service.transform = transform
+        with app.app_context():
+            image_store.delete(image_hash)
+        for name in os.listdir(image_cache.folder):
+            if name.startswith(image_hash):
+                os.remove(os.path.join(image_cache.folder, name))
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
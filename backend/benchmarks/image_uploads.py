@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Latency of unrelated API calls while images are being uploaded
+
+Keeps --uploaders threads posting a large JPEG to /upload/product-image while
+one thread calls a light endpoint in a loop, and reports upload throughput
+and the p50/p99 latency of the light calls. It runs once with images resized
+in the request thread (IMAGE_WORKERS=0) and once per --workers value with the
+process pool; with the pool the light calls should no longer queue behind
+the resizes. Uploads rejected with 503 (pool saturated) are counted
+separately. Every upload gets a few random bytes appended after the JPEG
+data, so the image store cannot serve it as a duplicate of an earlier one.
+
+Usage:
+    python benchmarks/image_uploads.py
+    python benchmarks/image_uploads.py --uploaders 8 --workers 2 --workers 4 --seconds 20
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import statistics
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import User
+from flask_jwt_extended import create_access_token
+from services.image_processing import image_processing_service
+from services.image_store import image_store
+from PIL import Image
+
+def make_jpeg(width: int, height: int) -> bytes:
+    """A camera-sized JPEG with enough detail not to compress to nothing"""
+    noise = Image.effect_noise((width // 4, height // 4), 64).resize((width, height))
+    img = Image.merge('RGB', (noise, Image.linear_gradient('L').resize((width, height)), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def run(client, headers, image, uploaders: int, seconds: float):
+    """Upload and probe concurrently; return (upload statuses, probe latencies)"""
+    stop = time.perf_counter() + seconds
+    statuses = []
+    latencies = []
+    hashes = []
+
+    def upload():
+        while time.perf_counter() < stop:
+            response = client.post(
+                '/api/v1/upload/product-image', headers=headers,
+                data={'file': (io.BytesIO(image + os.urandom(16)), 'photo.jpg')}, content_type='multipart/form-data'
+            )
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                hashes.append(response.get_json()['data']['hash'])
+            elif response.status_code == 503:
+                time.sleep(float(response.headers.get('Retry-After', 1)) * random.random())
+
+    def probe():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            client.get('/health')
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=upload) for _ in range(uploaders)] + [threading.Thread(target=probe)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        for image_hash in hashes:
+            image_store.delete(image_hash)
+    return statuses, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API latency during image uploads')
+    parser.add_argument('--uploaders', type=int, default=4, help='Concurrent upload threads')
+    parser.add_argument('--workers', type=int, action='append', help='Pool sizes to try (repeatable, default 2)')
+    parser.add_argument('--seconds', type=float, default=10, help='Duration of each run')
+    parser.add_argument('--size', default='4000x3000', help='Uploaded image size WIDTHxHEIGHT')
+    args = parser.parse_args()
+
+    with app.app_context():
+        admin = User.query.filter(User.role.in_(['admin', 'manager'])).first()
+        if not admin:
+            print("❌ Need an admin or manager user in the database")
+            return False
+        token = create_access_token(identity=str(admin.id))
+        db.session.remove()
+
+    width, height = (int(value) for value in args.size.split('x'))
+    image = make_jpeg(width, height)
+    print(f"Image {width}x{height}, {len(image) / 1024 / 1024:.1f} MiB; {args.uploaders} uploaders; CPUs: {os.cpu_count()}")
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    ok = True
+    for workers in [0] + (args.workers or [2]):
+        app.config['IMAGE_WORKERS'] = workers
+        image_processing_service.init_app(app)
+        # Start the pool before measuring
+        image_processing_service.resize(image, (10, 10))
+
+        statuses, latencies = run(client, headers, image, args.uploaders, args.seconds)
+        done = statuses.count(200)
+        rejected = statuses.count(503)
+        ok = ok and done > 0 and set(statuses) <= {200, 503}
+        label = f'{workers} workers' if workers else 'in-thread'
+        print(
+            f"{'✓' if done else '❌'} {label:<10} uploads {done / args.seconds:6.1f}/s   503s {rejected:4}   "
+            f"/health p50 {statistics.median(latencies) * 1000:7.1f} ms   "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms   max {max(latencies) * 1000:7.1f} ms"
+        )
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for POST /orders
+
+Creates a product with little stock, fires many single-unit orders for it in
+parallel and checks that stock never goes negative, that exactly as many
+orders succeed as there was stock, and that the order items agree with the
+stock that was taken. Prints throughput; exits non-zero on oversell.
+
+The script cleans up after itself through the API.
+
+Usage:
+    python benchmarks/order_concurrency.py
+    python benchmarks/order_concurrency.py --orders 500 --stock 50 --workers 32
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import Product, OrderItem
+from sqlalchemy import func
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress POST /orders against a low-stock product')
+    parser.add_argument('--orders', type=int, default=300, help='Orders to submit')
+    parser.add_argument('--stock', type=int, default=50, help='Starting stock of the product')
+    parser.add_argument('--workers', type=int, default=32, help='Parallel clients')
+    args = parser.parse_args()
+
+    client = app.test_client()
+    run_id = uuid.uuid4().hex[:8]
+
+    customer = client.post('/api/v1/customers', json={
+        'name': f'Stress Customer {run_id}',
+        'email': f'stress-{run_id}@example.com'
+    }).get_json()['data']
+    product = client.post('/api/v1/products', json={
+        'name': f'Stress Product {run_id}',
+        'sku': f'STRESS-{run_id}',
+        'category': 'Stress',
+        'price': 10,
+        'stock': args.stock
+    }).get_json()['data']
+
+    def place_order(n):
+        # Each thread gets its own app context and database session
+        response = app.test_client().post('/api/v1/orders', json={
+            'order_number': f'STRESS-{run_id}-{n}',
+            'customer_id': customer['id'],
+            'total': 10,
+            'order_items': [{'product_id': product['id'], 'quantity': 1, 'unit_price': 10}]
+        })
+        data = response.get_json()
+        return response.status_code, data.get('data', {}).get('id') if response.status_code == 201 else data.get('error')
+
+    print(f"Placing {args.orders} orders for a product with stock {args.stock} ({args.workers} workers)...")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(place_order, range(args.orders)))
+    elapsed = time.perf_counter() - start
+
+    created = [detail for status, detail in results if status == 201]
+    rejected = [detail for status, detail in results if status == 409]
+    failed = [(status, detail) for status, detail in results if status not in (201, 409)]
+
+    with app.app_context():
+        final_stock = db.session.get(Product, uuid.UUID(product['id'])).stock
+        units_sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).filter(
+            OrderItem.product_id == uuid.UUID(product['id'])
+        ).scalar()
+
+    expected = min(args.orders, args.stock)
+    ok = (
+        final_stock >= 0
+        and len(created) == expected
+        and units_sold == len(created)
+        and final_stock == args.stock - units_sold
+    )
+
+    print(f"  created:     {len(created)} (expected {expected})")
+    print(f"  rejected:    {len(rejected)}")
+    print(f"  errors:      {len(failed)}")
+    for status, detail in failed[:5]:
+        print(f"    {status}: {detail}")
+    print(f"  final stock: {final_stock}   units in order items: {units_sold}")
+    print(f"  throughput:  {args.orders / elapsed:.1f} requests/s ({elapsed:.2f} s)")
+    print("✅ No oversell" if ok else "❌ Stock and orders disagree")
+
+    # Clean up
+    for order_id in created:
+        client.delete(f'/api/v1/orders/{order_id}')
+    client.delete(f"/api/v1/products/{product['id']}")
+    client.delete(f"/api/v1/customers/{customer['id']}")
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
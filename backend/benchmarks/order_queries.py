@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+SQL statement counts for the endpoints that serialize orders
+
+Calls each endpoint at two page sizes and counts the statements it issues.
+With the loader profiles in services/query_profiles.py the count must not
+grow with the number of orders returned; the script exits non-zero if it does.
+
+Usage:
+    python benchmarks/order_queries.py
+    python benchmarks/order_queries.py --small 5 --large 50
+"""
+
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import Order
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+def count_statements(engine, client, url, headers):
+    """Request url and return (status code, statements issued)"""
+    statements = [0]
+
+    def count_statement(*args, **kwargs):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    return response.status_code, statements[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Count SQL statements per order endpoint')
+    parser.add_argument('--small', type=int, default=5, help='Small page size')
+    parser.add_argument('--large', type=int, default=50, help='Large page size')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if Order.query.count() < args.large:
+            print(f"❌ Need at least {args.large} orders in the database")
+            return False
+
+        order_id = db.session.query(Order.id).first()[0]
+        token = create_access_token(identity='benchmark')
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Endpoints whose row count follows per_page must stay flat
+    scaled = [
+        ('GET /orders', '/api/v1/orders?per_page={n}'),
+    ]
+    fixed = [
+        ('GET /orders/<id>', f'/api/v1/orders/{order_id}'),
+        ('GET /dashboard/stats', '/api/v1/dashboard/stats'),
+    ]
+
+    ok = True
+    for label, url in scaled:
+        status_small, small = count_statements(engine, client, url.format(n=args.small), headers)
+        status_large, large = count_statements(engine, client, url.format(n=args.large), headers)
+        flat = small == large and status_small == status_large == 200
+        ok = ok and flat
+        print(f"{'✓' if flat else '❌'} {label:<22} per_page={args.small}: {small:>3}   per_page={args.large}: {large:>3}")
+
+    for label, url in fixed:
+        status, statements = count_statements(engine, client, url, headers)
+        ok = ok and status == 200
+        print(f"{'✓' if status == 200 else '❌'} {label:<22} statements: {statements:>3}")
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
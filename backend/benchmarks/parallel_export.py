@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Throughput of single-process versus sharded parallel order exports
+
+Downloads /export/orders (and /export/order-items for the columnar formats)
+once without sharding and once per --shards value with ?parallel=N, and
+reports rows per second. --orders adds that many synthetic orders (with two
+items each) for the run and deletes them afterwards, so the export is large
+enough for the worker start-up cost not to dominate. The speed-up is bounded
+by the number of CPU cores (EXPORT_WORKERS).
+
+Usage:
+    python benchmarks/parallel_export.py
+    python benchmarks/parallel_export.py --orders 500000 --shards 2 --shards 4 --shards 8
+    python benchmarks/parallel_export.py --format parquet
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from models import User, Order, OrderItem
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+def seed_orders(count: int, prefix: str):
+    """Insert count orders numbered {prefix}N, each with two items"""
+    db.session.execute(text("""
+        INSERT INTO orders (id, order_number, customer_id, total, status, order_date, created_at, updated_at)
+        SELECT gen_random_uuid(), :prefix || n,
+               (SELECT id FROM customers ORDER BY id OFFSET (n * 7919) % (SELECT COUNT(*) FROM customers) LIMIT 1),
+               round((10 + random() * 990)::numeric, 2), 'Completed', CURRENT_DATE,
+               now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc'
+        FROM generate_series(1, :count) AS n
+    """), {'prefix': prefix, 'count': count})
+    db.session.execute(text("""
+        INSERT INTO order_items (id, order_id, product_id, quantity, unit_price, subtotal)
+        SELECT gen_random_uuid(), o.id, p.id, 1, o.total / 2, o.total / 2
+        FROM orders o
+        CROSS JOIN LATERAL (SELECT id FROM products ORDER BY random() LIMIT 2) p
+        WHERE o.order_number LIKE :pattern
+    """), {'pattern': f'{prefix}%'})
+    db.session.commit()
+
+def remove_orders(prefix: str):
+    order_ids = db.session.query(Order.id).filter(Order.order_number.like(f'{prefix}%'))
+    OrderItem.query.filter(OrderItem.order_id.in_(order_ids.scalar_subquery())).delete(synchronize_session=False)
+    Order.query.filter(Order.order_number.like(f'{prefix}%')).delete(synchronize_session=False)
+    db.session.commit()
+
+def download(client, url, headers):
+    """Download url; return (status, bytes, seconds)"""
+    start = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    return response.status_code, size, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare single-process and sharded exports')
+    parser.add_argument('--orders', type=int, default=0, help='Synthetic orders to add for the run')
+    parser.add_argument('--shards', type=int, action='append', help='Shard counts to try (repeatable, default 2 and 4)')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv', help='Export format')
+    args = parser.parse_args()
+
+    prefix = f'PX-{uuid.uuid4().hex[:8]}-'
+    with app.app_context():
+        admin = User.query.filter(User.role.in_(['admin', 'manager'])).first()
+        if not admin:
+            print("❌ Need an admin or manager user in the database")
+            return False
+        token = create_access_token(identity=str(admin.id))
+
+        if args.orders:
+            print(f"Adding {args.orders} orders...")
+            seed_orders(args.orders, prefix)
+        counts = {
+            'orders': Order.query.count(),
+            'order-items': OrderItem.query.count()
+        }
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    datasets = ['orders'] if args.format == 'csv' else ['orders', 'order-items']
+    print(f"CPUs: {os.cpu_count()}   workers: {app.config['EXPORT_WORKERS']}")
+
+    ok = True
+    try:
+        for dataset in datasets:
+            rows = counts[dataset]
+            baseline = None
+            for shards in [None] + (args.shards or [2, 4]):
+                url = f'/api/v1/export/{dataset}?format={args.format}'
+                if shards:
+                    url += f'&parallel={shards}'
+                status, size, seconds = download(client, url, headers)
+                ok = ok and status == 200
+                baseline = baseline or seconds
+                label = f'{shards} shards' if shards else 'single'
+                print(
+                    f"{'✓' if status == 200 else '❌'} {dataset:<11} {label:<10} {rows:>9} rows   "
+                    f"{size / 1024 / 1024:8.1f} MiB   {seconds:7.2f} s   {rows / seconds:>9.0f} rows/s   "
+                    f"x{baseline / seconds:4.2f}"
+                )
+    finally:
+        if args.orders:
+            with app.app_context():
+                remove_orders(prefix)
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Round trips and latency of the /stats endpoints
+
+Calls every stats endpoint, counts the SQL statements it issues and times
+repeated calls. With services/status_stats.py each endpoint should need a
+single round trip; the script exits non-zero if any needs more.
+
+Usage:
+    python benchmarks/stats_queries.py
+    python benchmarks/stats_queries.py --repeat 200
+"""
+
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+ENDPOINTS = [
+    ('GET /orders/stats', '/api/v1/orders/stats'),
+    ('GET /products/stats', '/api/v1/products/stats'),
+    ('GET /customers/stats', '/api/v1/customers/stats'),
+    ('GET /hr/stats', '/api/v1/hr/stats'),
+    ('GET /projects/stats', '/api/v1/projects/stats'),
+    ('GET /crm/stats', '/api/v1/crm/stats'),
+    ('GET /analytics/finance-stats', '/api/v1/analytics/finance-stats'),
+]
+
+def count_statements(engine, client, url, headers):
+    """Request url and return (status code, statements issued)"""
+    statements = [0]
+
+    def count_statement(*args, **kwargs):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    return response.status_code, statements[0]
+
+def main():
+    parser = argparse.ArgumentParser(description='Count SQL statements and time each stats endpoint')
+    parser.add_argument('--repeat', type=int, default=50, help='Timed calls per endpoint')
+    args = parser.parse_args()
+
+    with app.app_context():
+        token = create_access_token(identity='benchmark')
+        engine = db.engine
+        db.session.remove()
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    ok = True
+    for label, url in ENDPOINTS:
+        status, statements = count_statements(engine, client, url, headers)
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            client.get(url, headers=headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        passed = status == 200 and statements == 1
+        ok = ok and passed
+        print(f"{'✓' if passed else '❌'} {label:<30} statements: {statements:>2}   {elapsed_ms:7.2f} ms/call")
+
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
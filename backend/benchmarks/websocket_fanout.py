@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Websocket fan-out across several server processes
+
+Starts --servers copies of serve.py on consecutive ports from --port, all on
+the same message bus (--queue, postgres LISTEN/NOTIFY by default, on a
+channel of their own), and connects --clients dashboard clients to each.
+Once the servers have announced their counts, checks that every server's
+/dashboard/realtime reports the whole cluster. Then this process, like a
+background job outside the servers, publishes --messages events to the
+dashboard room through a write-only bus and every client records when each
+one arrives.
+
+Reports deliveries (every client should get every message, whichever
+server it is on) and the publish-to-delivery p50/p99. A --payload above
+7900 bytes exercises the overflow table NOTIFY needs for large messages.
+
+Usage:
+    python benchmarks/websocket_fanout.py
+    python benchmarks/websocket_fanout.py --servers 4 --clients 500 --messages 100
+    python benchmarks/websocket_fanout.py --payload 20000
+    python benchmarks/websocket_fanout.py --queue redis://localhost:6379/0
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import urllib.request
+
+# Socket.IO clients and server start-up are shared with the soak test
+from websocket_soak import SoakClient, start_server, percentile, eventlet
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class FanoutClient(SoakClient):
+    def __init__(self, port: int):
+        super().__init__(port, active=False)
+        self.received = {}
+
+    def on_event(self, event: str, *args):
+        if event == 'fanout_probe':
+            self.received[args[0]['id']] = time.time() - args[0]['sent']
+
+def realtime_stats(port: int) -> dict:
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/v1/dashboard/realtime', timeout=5) as response:
+        return json.loads(response.read())['data']
+
+def main():
+    parser = argparse.ArgumentParser(description='Check websocket events reach the clients of every server')
+    parser.add_argument('--servers', type=int, default=3, help='Server processes')
+    parser.add_argument('--clients', type=int, default=200, help='Dashboard clients per server')
+    parser.add_argument('--messages', type=int, default=50, help='Events published to the dashboard room')
+    parser.add_argument('--rate', type=float, default=20, help='Events published per second')
+    parser.add_argument('--payload', type=int, default=256, help='Bytes of filler in each event')
+    parser.add_argument('--queue', default='postgres', help='WEBSOCKET_MESSAGE_QUEUE for the servers and the publisher')
+    parser.add_argument('--port', type=int, default=5060, help='Port of the first server')
+    args = parser.parse_args()
+
+    # Servers inherit these; a channel of their own keeps other servers on
+    # the same database out of the counts
+    os.environ.update(
+        WEBSOCKET_MESSAGE_QUEUE=args.queue,
+        WEBSOCKET_CHANNEL=f'fanout-benchmark-{os.getpid()}',
+        WEBSOCKET_PRESENCE_INTERVAL='2',
+    )
+    from config import Config
+    from services.message_bus import create_message_bus
+
+    publisher = create_message_bus(
+        {name: getattr(Config, name) for name in dir(Config) if name.isupper()}, write_only=True
+    )
+    if publisher is None:
+        print("❌ --queue none has no bus to publish on")
+        return False
+
+    ports = [args.port + index for index in range(args.servers)]
+    clients = [FanoutClient(port) for port in ports for _ in range(args.clients)]
+    servers = []
+    try:
+        for port in ports:
+            servers.append(start_server('eventlet', port))
+
+        until = time.time() + 3600
+        pool = eventlet.GreenPool(len(clients))
+        for index, client in enumerate(clients):
+            pool.spawn_n(client.run, until)
+            if index % 100 == 99:
+                eventlet.sleep(0.2)
+        while sum(client.connected for client in clients) < len(clients) and not any(client.dropped for client in clients):
+            eventlet.sleep(0.5)
+
+        # Three presence intervals: every server has heard every other
+        eventlet.sleep(6)
+        total = len(clients)
+        ok = True
+        print(f"{args.servers} servers ({args.queue}), {args.clients} dashboard clients each")
+        for port in ports:
+            stats = realtime_stats(port)
+            counted = stats['servers'] == args.servers and stats['clients'] == total and stats['rooms']['dashboard'] == total
+            ok = ok and counted
+            print(f"{'✓' if counted else '❌'} :{port} reports {stats['servers']} servers, {stats['clients']} clients, "
+                  f"{stats['rooms']['dashboard']} in dashboard")
+
+        filler = 'x' * args.payload
+        for message_id in range(args.messages):
+            publisher.emit('fanout_probe', {'id': message_id, 'sent': time.time(), 'filler': filler},
+                           namespace='/', room='dashboard')
+            eventlet.sleep(1 / args.rate)
+        eventlet.sleep(3)
+        # Before closing, which ends every client's connection
+        dropped = sum(client.dropped for client in clients)
+    finally:
+        for client in clients:
+            client.close()
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    latencies = [latency for client in clients for latency in client.received.values()]
+    expected = args.messages * len(clients)
+    delivered = len(latencies) == expected and dropped == 0
+    print(f"{'✓' if delivered else '❌'} delivered {len(latencies)}/{expected} "
+          f"({args.messages} events x {len(clients)} clients, {args.payload} byte payload), {dropped} dropped")
+    if latencies:
+        print(f"  publish to delivery: p50 {statistics.median(latencies) * 1000:.1f} ms   p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    return ok and delivered
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
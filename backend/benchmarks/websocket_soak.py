@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Websocket connection soak test
+
+Starts serve.py in --mode (eventlet by default) on --port, opens --idle
+clients that only join the dashboard room and answer keepalive pings, plus
+--active clients that also send a ping event every second and time the pong.
+Everything stays connected for --seconds (at least one keepalive interval
+and one periodic dashboard broadcast at the default 60), then the server's
+peak memory is compared with its memory before the clients connected.
+
+Reports connections held, drops, dashboard broadcasts received, active
+ping/pong p50/p99, server threads and resident memory per connection. Fails
+if any client is dropped or a connection costs more than --max-kb.
+
+The clients are green threads in this process (eventlet), so the machine
+needs file descriptors for twice the client count (ulimit -n).
+
+Usage:
+    python benchmarks/websocket_soak.py
+    python benchmarks/websocket_soak.py --idle 5000 --active 200 --seconds 120
+    python benchmarks/websocket_soak.py --mode threading --idle 500
+"""
+
+import eventlet
+eventlet.monkey_patch()
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+from wsproto import WSConnection, ConnectionType
+from wsproto.events import AcceptConnection, CloseConnection, Ping, Request, TextMessage
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def server_stats(pid: int):
+    """(resident memory in KiB, thread count) of a process"""
+    stats = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            stats[key] = value.split()
+    return int(stats['VmRSS'][0]), int(stats['Threads'][0])
+
+def start_server(mode: str, port: int):
+    env = dict(os.environ, WEBSOCKET_ASYNC_MODE=mode, PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, 'serve.py'], cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(60):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1)
+            break
+        except OSError:
+            eventlet.sleep(0.5)
+    else:
+        server.kill()
+        raise RuntimeError('Server did not start')
+    eventlet.sleep(2)
+    if server.poll() is not None:
+        raise RuntimeError(f'Server exited; is port {port} already in use?')
+    return server
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class SoakClient:
+    """
+    Minimal Socket.IO client speaking the Engine.IO v4 websocket protocol,
+    one green thread per connection
+    """
+
+    def __init__(self, port: int, active: bool):
+        self.port = port
+        self.active = active
+        self.sock = None
+        self.ws = None
+        self.pending = []
+        self.connected = False
+        self.dropped = False
+        self.broadcasts = 0
+        self.latencies = []
+        self.sent_at = None
+
+    def _send(self, event):
+        self.sock.sendall(self.ws.send(event))
+
+    def send_text(self, text: str):
+        self._send(TextMessage(data=text))
+
+    def receive(self):
+        """Next text message, or None once a second so the caller can check the clock"""
+        while not self.pending:
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                if not self.connected:
+                    raise
+                return None
+            if not data:
+                raise ConnectionError('Server closed the connection')
+            self.ws.receive_data(data)
+            for event in self.ws.events():
+                if isinstance(event, AcceptConnection):
+                    self.pending.append('')
+                elif isinstance(event, TextMessage):
+                    self.pending.append(event.data)
+                elif isinstance(event, Ping):
+                    self._send(event.response())
+                elif isinstance(event, CloseConnection):
+                    raise ConnectionError(f'Server closed the websocket: {event.code}')
+        return self.pending.pop(0)
+
+    def connect(self):
+        # A busy server can take a while to accept thousands of clients
+        self.sock = socket.create_connection(('127.0.0.1', self.port), timeout=60)
+        self.ws = WSConnection(ConnectionType.CLIENT)
+        self._send(Request(host=f'127.0.0.1:{self.port}', target='/socket.io/?EIO=4&transport=websocket'))
+        self.receive()                   # websocket handshake
+        self.receive()                   # Engine.IO open packet
+        self.send_text('40')             # Socket.IO connect
+        while not self.receive().startswith('40'):
+            pass
+        self.send_text('42' + json.dumps(['join_room', {'room': 'dashboard'}]))
+        self.sock.settimeout(1)
+        self.connected = True
+
+    def run(self, until: float):
+        try:
+            self.connect()
+            if self.active:
+                eventlet.spawn(self._ping_loop, until)
+            while time.time() < until:
+                message = self.receive()
+                if not message:
+                    continue
+                if message == '2':
+                    # Engine.IO keepalive
+                    self.send_text('3')
+                elif message.startswith('42'):
+                    self.on_event(*json.loads(message[2:]))
+        except OSError:
+            self.dropped = self.connected
+
+    def on_event(self, event: str, *args):
+        if event == 'dashboard_update':
+            self.broadcasts += 1
+        elif event == 'pong' and self.sent_at:
+            self.latencies.append(time.perf_counter() - self.sent_at)
+            self.sent_at = None
+
+    def _ping_loop(self, until: float):
+        while time.time() < until and not self.dropped:
+            self.sent_at = time.perf_counter()
+            try:
+                self.send_text('42' + json.dumps(['ping']))
+            except OSError:
+                return
+            eventlet.sleep(1)
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Hold thousands of websocket clients against one server process')
+    parser.add_argument('--mode', choices=['eventlet', 'threading'], default='eventlet', help='WEBSOCKET_ASYNC_MODE of the server')
+    parser.add_argument('--idle', type=int, default=2000, help='Clients that only listen')
+    parser.add_argument('--active', type=int, default=100, help='Clients that also send a ping every second')
+    parser.add_argument('--seconds', type=float, default=60, help='How long every client stays connected')
+    parser.add_argument('--port', type=int, default=5055, help='Port for the server under test')
+    parser.add_argument('--max-kb', type=float, default=96, help='Largest server memory per connection that passes')
+    args = parser.parse_args()
+
+    clients = [SoakClient(args.port, active=False) for _ in range(args.idle)] + \
+              [SoakClient(args.port, active=True) for _ in range(args.active)]
+    server = start_server(args.mode, args.port)
+    try:
+        rss_before, threads_before = server_stats(server.pid)
+
+        print(f"Server: {args.mode} mode, pid {server.pid}, {rss_before / 1024:.1f} MiB, {threads_before} threads")
+        start = time.time()
+        until = start + args.seconds
+        pool = eventlet.GreenPool(len(clients) + 1)
+        # Ramp up in small steps so the listen backlog is not overrun
+        for index, client in enumerate(clients):
+            pool.spawn_n(client.run, until)
+            if index % 100 == 99:
+                eventlet.sleep(0.2)
+
+        peak_rss, peak_threads = rss_before, threads_before
+        while time.time() < until:
+            eventlet.sleep(2)
+            rss, threads = server_stats(server.pid)
+            peak_rss, peak_threads = max(peak_rss, rss), max(peak_threads, threads)
+            connected = sum(client.connected and not client.dropped for client in clients)
+            print(f"  {time.time() - start:5.0f} s   {connected:6} connected   {rss / 1024:7.1f} MiB   {threads:5} threads", end='\r')
+        pool.waitall()
+        print()
+    finally:
+        for client in clients:
+            client.close()
+        server.terminate()
+        server.wait()
+
+    connected = sum(client.connected for client in clients)
+    dropped = sum(client.dropped for client in clients)
+    broadcasts = sum(client.broadcasts for client in clients)
+    latencies = [latency for client in clients for latency in client.latencies]
+    per_connection = (peak_rss - rss_before) / max(connected, 1)
+
+    ok = connected == len(clients) and dropped == 0 and per_connection <= args.max_kb
+    print(f"{'✓' if connected == len(clients) else '❌'} connected   {connected}/{len(clients)}   dropped {dropped}")
+    print(f"  dashboard broadcasts received: {broadcasts}")
+    if latencies:
+        print(f"  active ping/pong: p50 {statistics.median(latencies) * 1000:.1f} ms   p99 {percentile(latencies, 0.99) * 1000:.1f} ms   ({len(latencies)} pings)")
+    print(f"{'✓' if per_connection <= args.max_kb else '❌'} server memory {rss_before / 1024:.1f} -> {peak_rss / 1024:.1f} MiB, "
+          f"{per_connection:.1f} KiB per connection (limit {args.max_kb:.0f}); threads {threads_before} -> {peak_threads}")
+    return ok
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -2,12 +2,17 @@ from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import UUID
 from werkzeug.security import generate_password_hash, check_password_hash
+from services.image_store import variant_urls
 import uuid
 
 db = SQLAlchemy()
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Delta exports read changes in (updated_at, id) order
+        db.Index('ix_products_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(255), nullable=False)
@@ -37,6 +42,7 @@ class Product(db.Model):
             'stock': self.stock,
             'status': self.status,
             'image': self.image,
+            'image_variants': variant_urls(self.image),
             'description': self.description,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -44,6 +50,10 @@ class Product(db.Model):
 
 class Customer(db.Model):
     __tablename__ = 'customers'
+    __table_args__ = (
+        # Delta exports read changes in (updated_at, id) order
+        db.Index('ix_customers_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = db.Column(db.String(255), nullable=False)
@@ -58,10 +68,23 @@ class Customer(db.Model):
     
     # Relationships
     orders = db.relationship('Order', backref='customer', lazy=True)
+    stats = db.relationship('CustomerStats', uselist=False, lazy=True, passive_deletes=True)
     
     def __repr__(self):
         return f'<Customer {self.name}>'
     
+    def stats_dict(self):
+        """Lifetime order stats from the customer_stats projection"""
+        if self.stats:
+            return self.stats.to_dict()
+        return {
+            'total_orders': 0,
+            'total_spent': 0,
+            'average_order_value': 0,
+            'first_order_at': None,
+            'last_order_at': None
+        }
+    
     def to_dict(self):
         return {
             'id': str(self.id),
@@ -72,25 +95,28 @@ class Customer(db.Model):
             'status': self.status,
             'join_date': self.join_date.isoformat() if self.join_date else None,
             'address': self.address,
-            'total_orders': len(self.orders),
-            'total_spent': sum(float(order.total) for order in self.orders if order.status != 'Cancelled'),
+            **self.stats_dict(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Delta exports read changes in (updated_at, id) order
+        db.Index('ix_orders_updated_at_id', 'updated_at', 'id'),
+    )
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
-    customer_id = db.Column(UUID(as_uuid=True), db.ForeignKey('customers.id'), nullable=False)
+    customer_id = db.Column(UUID(as_uuid=True), db.ForeignKey('customers.id'), nullable=False, index=True)
     total = db.Column(db.Numeric(10, 2), nullable=False)
-    status = db.Column(db.String(50), default='Pending')  # Pending, Processing, Shipped, Completed, Cancelled
+    status = db.Column(db.String(50), default='Pending', index=True)  # Pending, Processing, Shipped, Completed, Cancelled
     order_date = db.Column(db.Date, default=datetime.utcnow().date)
     payment_method = db.Column(db.String(100))
     shipping_address = db.Column(db.Text)
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
@@ -120,7 +146,7 @@ class OrderItem(db.Model):
     __tablename__ = 'order_items'
     
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    order_id = db.Column(UUID(as_uuid=True), db.ForeignKey('orders.id'), nullable=False)
+    order_id = db.Column(UUID(as_uuid=True), db.ForeignKey('orders.id'), nullable=False, index=True)
     product_id = db.Column(UUID(as_uuid=True), db.ForeignKey('products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)
@@ -140,6 +166,221 @@ class OrderItem(db.Model):
             'subtotal': float(self.subtotal)
         }
 
+class DailySalesRollup(db.Model):
+    __tablename__ = 'daily_sales_rollup'
+
+    # One row per calendar day (UTC), maintained incrementally by services/sales_rollup.py
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Excludes cancelled orders
+    order_count = db.Column(db.Integer, nullable=False, default=0)  # Excludes cancelled orders
+    units_sold = db.Column(db.Integer, nullable=False, default=0)  # Excludes cancelled orders
+    new_customers = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DailySalesRollup {self.day}>'
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'revenue': float(self.revenue),
+            'order_count': self.order_count,
+            'units_sold': self.units_sold,
+            'new_customers': self.new_customers,
+            'cancelled_count': self.cancelled_count,
+            'cancelled_total': float(self.cancelled_total)
+        }
+
+class CustomerStats(db.Model):
+    __tablename__ = 'customer_stats'
+
+    # One row per customer with orders, maintained incrementally by services/customer_stats.py
+    customer_id = db.Column(UUID(as_uuid=True), db.ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)  # All orders, including cancelled
+    billable_order_count = db.Column(db.Integer, nullable=False, default=0)  # Excludes cancelled orders
+    lifetime_spend = db.Column(db.Numeric(14, 2), nullable=False, default=0)  # Excludes cancelled orders
+    first_order_at = db.Column(db.DateTime)
+    last_order_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CustomerStats {self.customer_id}>'
+
+    @property
+    def average_order_value(self):
+        if not self.billable_order_count:
+            return 0
+        return float(self.lifetime_spend) / self.billable_order_count
+
+    def to_dict(self):
+        return {
+            'total_orders': self.order_count,
+            'total_spent': float(self.lifetime_spend),
+            'average_order_value': round(self.average_order_value, 2),
+            'first_order_at': self.first_order_at.isoformat() if self.first_order_at else None,
+            'last_order_at': self.last_order_at.isoformat() if self.last_order_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+
+    # One row per Idempotency-Key per endpoint and caller, managed by services/idempotency.py
+    scope = db.Column(db.String(255), primary_key=True)  # "<endpoint>:<user id or anonymous>"
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing, committed, completed
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary)
+    response_mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)  # A crashed request's uncommitted claim can be taken over after this
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope} {self.key}>'
+
+class ExportTombstone(db.Model):
+    __tablename__ = 'export_tombstones'
+    __table_args__ = (
+        # The deletions feed reads a dataset in (deleted_at, record_id) order
+        db.Index('ix_export_tombstones_feed', 'dataset', 'deleted_at', 'record_id'),
+    )
+
+    # One row per deleted customer, product or order, for delta export consumers
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    dataset = db.Column(db.String(50), nullable=False)  # customers, products, orders
+    record_id = db.Column(UUID(as_uuid=True), nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExportTombstone {self.dataset} {self.record_id}>'
+
+class WebsocketMessage(db.Model):
+    __tablename__ = 'websocket_messages'
+    # Only needed for a minute and written by every large event; not worth WAL
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+
+    # Websocket events too large for a NOTIFY payload, written and purged by services/message_bus.py
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), index=True)
+
+    def __repr__(self):
+        return f'<WebsocketMessage {self.id}>'
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+    __table_args__ = (
+        # Submitting the same file again for the same import finds the existing job
+        db.UniqueConstraint('dataset', 'mode', 'file_hash', name='uq_import_jobs_file'),
+    )
+
+    # One row per spooled CSV import, processed in checkpointed batches by services/import_jobs.py
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dataset = db.Column(db.String(50), nullable=False)  # customers, products
+    mode = db.Column(db.String(20), nullable=False, default='insert')  # insert, upsert
+    file_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the uploaded file
+    filename = db.Column(db.String(255))
+    path = db.Column(db.String(500), nullable=False)  # Spooled copy, removed once the job completes
+    total_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    # Checkpoint: everything before byte_offset is committed, in the same transaction as these counters
+    byte_offset = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    imported_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_count = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)  # Why the job failed
+    worker_token = db.Column(db.String(32))  # Set by the worker that currently owns the job
+    lease_expires_at = db.Column(db.DateTime)  # A running job whose lease expired can be resumed
+    created_by = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    row_errors = db.relationship('ImportRowError', lazy='dynamic', passive_deletes=True,
+                                 order_by='ImportRowError.line_no')
+
+    def __repr__(self):
+        return f'<ImportJob {self.dataset} {self.status}>'
+
+    def to_dict(self, error_limit: int = 10):
+        return {
+            'id': str(self.id),
+            'dataset': self.dataset,
+            'mode': self.mode,
+            'filename': self.filename,
+            'file_hash': self.file_hash,
+            'status': self.status,
+            'total_bytes': self.total_bytes,
+            'processed_bytes': self.byte_offset,
+            'progress': round(self.byte_offset / self.total_bytes * 100, 1) if self.total_bytes else 0,
+            'rows_processed': self.rows_processed,
+            'imported_count': self.imported_count,
+            'updated_count': self.updated_count,
+            'error_count': self.error_count,
+            'errors': [f"Row {row.line_no}: {row.message}" for row in self.row_errors.limit(error_limit)],
+            'error': self.error,
+            'status_url': f"/api/v1/import/jobs/{self.id}",
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class ImportRowError(db.Model):
+    __tablename__ = 'import_row_errors'
+
+    id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
+    job_id = db.Column(UUID(as_uuid=True), db.ForeignKey('import_jobs.id', ondelete='CASCADE'), nullable=False, index=True)
+    line_no = db.Column(db.Integer, nullable=False)  # Data row number, counting from 1
+    message = db.Column(db.Text, nullable=False)
+
+    def __repr__(self):
+        return f'<ImportRowError {self.job_id} row {self.line_no}>'
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_jobs'
+
+    # One row per rendered report, shared by every request for the same report
+    # of the same data; rendered and pruned by services/report_jobs.py
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False)  # Report type, format, parameters and data version
+    report_type = db.Column(db.String(20), nullable=False)  # dashboard, crm
+    format = db.Column(db.String(10), nullable=False)  # pdf, csv, xlsx
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    error = db.Column(db.Text)  # Why the job failed
+    path = db.Column(db.String(500))  # Rendered file, deleted together with the job
+    mimetype = db.Column(db.String(100))
+    download_name = db.Column(db.String(255))
+    worker_token = db.Column(db.String(32))  # Set by the worker that currently renders the job
+    lease_expires_at = db.Column(db.DateTime)  # A running job whose lease expired is rendered again
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReportJob {self.report_type}/{self.format} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': str(self.id),
+            'report_type': self.report_type,
+            'format': self.format,
+            'params': self.params,
+            'status': self.status,
+            'error': self.error,
+            'status_url': f"/api/v1/reports/jobs/{self.id}",
+            'download_url': f"/api/v1/reports/jobs/{self.id}/download" if self.status == 'completed' else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -183,6 +424,7 @@ class User(db.Model):
             'phone': self.phone,
             'role': self.role,
             'avatar': self.avatar,
+            'avatar_variants': variant_urls(self.avatar),
             'is_active': self.is_active,
             'email_verified': self.email_verified,
             'created_at': self.created_at.isoformat() if self.created_at else None,
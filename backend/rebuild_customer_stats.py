@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Check or rebuild the customer stats projection for SmartBiz360 Backend
+
+Usage:
+    python rebuild_customer_stats.py            # rewrite drifted customers
+    python rebuild_customer_stats.py --check    # report drift without writing
+"""
+
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from services.customer_stats import customer_stats_service
+
+def check_customer_stats():
+    """Compare customer_stats with a fresh computation from orders"""
+
+    print("Checking customer stats...")
+
+    with app.app_context():
+        try:
+            drifted = customer_stats_service.check()
+
+            if drifted:
+                print(f"❌ {len(drifted)} customers have stale stats:")
+                for customer_id in drifted[:20]:
+                    print(f"   {customer_id}")
+                if len(drifted) > 20:
+                    print(f"   ... and {len(drifted) - 20} more")
+                print("Run without --check to rebuild")
+                return False
+
+            print("✅ Customer stats match orders")
+            return True
+
+        except Exception as e:
+            print(f"❌ Check failed: {e}")
+            return False
+
+def rebuild_customer_stats():
+    """Recompute customer_stats rows from orders"""
+
+    print("Rebuilding customer stats...")
+
+    with app.app_context():
+        try:
+            # Make sure the stats table exists
+            db.create_all()
+
+            rows = customer_stats_service.rebuild()
+            db.session.commit()
+
+            print(f"✅ Rebuilt stats for {rows} drifted customers")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {e}")
+            return False
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check or rebuild the customer stats projection')
+    parser.add_argument('--check', action='store_true', help='Only report customers whose stats have drifted')
+    args = parser.parse_args()
+
+    success = check_customer_stats() if args.check else rebuild_customer_stats()
+    sys.exit(0 if success else 1)
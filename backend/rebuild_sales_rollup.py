@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Rebuild or backfill the daily sales rollup for SmartBiz360 Backend
+
+Usage:
+    python rebuild_sales_rollup.py                       # rebuild every day
+    python rebuild_sales_rollup.py --from 2024-01-01     # backfill from a date
+    python rebuild_sales_rollup.py --from 2024-01-01 --to 2024-01-31
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Load environment variables
+load_dotenv()
+
+# Scripts serve no websocket clients, so they stay off the message bus
+os.environ['WEBSOCKET_MESSAGE_QUEUE'] = 'none'
+
+from app import app, db
+from services.sales_rollup import sales_rollup_service
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD argument"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def rebuild_sales_rollup(start_day=None, end_day=None):
+    """Recompute daily_sales_rollup rows from orders and customers"""
+
+    print("Rebuilding daily sales rollup...")
+
+    with app.app_context():
+        try:
+            # Make sure the rollup table exists
+            db.create_all()
+
+            rows = sales_rollup_service.rebuild(start_day, end_day)
+            db.session.commit()
+
+            print(f"✅ Rebuilt {rows} days ({start_day or 'beginning'} to {end_day or 'today'})")
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Rebuild failed: {e}")
+            return False
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild or backfill the daily sales rollup')
+    parser.add_argument('--from', dest='start_day', help='First day to rebuild (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='end_day', help='Last day to rebuild (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    success = rebuild_sales_rollup(parse_day(args.start_day), parse_day(args.end_day))
+    sys.exit(0 if success else 1)
@@ -1,8 +1,10 @@
 from flask import Blueprint, jsonify, request
-from models import db, Product, Customer, Order, OrderItem, Expense, Lead, Deal
-from sqlalchemy import func, desc
+from models import db, Product, Customer, CustomerStats, Order, OrderItem, Expense, Lead, Deal, DailySalesRollup
+from sqlalchemy import func, desc, select
 from datetime import datetime, timedelta
 from decimal import Decimal
+from services.dashboard_stats import dashboard_stats_service
+from services.status_stats import status_stats_service
 
 analytics_bp = Blueprint('analytics', __name__)
 
@@ -43,22 +45,8 @@ def get_analytics_overview():
         profit = total_revenue - total_expenses
         profit_margin = (profit / total_revenue * 100) if total_revenue > 0 else Decimal('0.0')
         
-        # Average delivery time: Days from order creation to completion
-        completed_orders = Order.query.filter(
-            Order.status == 'Completed',
-            Order.created_at.isnot(None),
-            Order.updated_at.isnot(None)
-        ).all()
-        if completed_orders:
-            delivery_times = []
-            for order in completed_orders:
-                if order.created_at and order.updated_at:
-                    days = (order.updated_at - order.created_at).days
-                    if days >= 0:
-                        delivery_times.append(days)
-            avg_delivery_time = Decimal(sum(delivery_times) / len(delivery_times)) if delivery_times else Decimal('0.0')
-        else:
-            avg_delivery_time = Decimal('0.0')
+        # Delivery time: Days from order creation to completion, aggregated in SQL
+        delivery_time = dashboard_stats_service.get_delivery_time_stats()
         
         return jsonify({
             'success': True,
@@ -69,7 +57,8 @@ def get_analytics_overview():
                 'avg_order_value': float(avg_order_value),
                 'customer_satisfaction': float(customer_satisfaction),
                 'profit_margin': float(profit_margin),
-                'avg_delivery_time': float(avg_delivery_time)
+                'avg_delivery_time': delivery_time['average_days'],
+                'delivery_time': delivery_time
             }
         }), 200
         
@@ -89,31 +78,33 @@ def get_revenue_trends():
             # Last 30 days
             end_date = datetime.now()
             start_date = end_date - timedelta(days=30)
-            group_by = func.date(Order.created_at)
+            group_by = DailySalesRollup.day
         elif period == 'weekly':
             # Last 12 weeks
             end_date = datetime.now()
             start_date = end_date - timedelta(weeks=12)
-            group_by = func.date_trunc('week', Order.created_at)
+            group_by = func.date_trunc('week', DailySalesRollup.day)
         elif period == 'yearly':
             # Last 5 years
             end_date = datetime.now()
             start_date = end_date - timedelta(days=365*5)
-            group_by = func.date_trunc('year', Order.created_at)
+            group_by = func.date_trunc('year', DailySalesRollup.day)
         else:
             # Monthly (default)
             end_date = datetime.now()
             start_date = end_date - timedelta(days=365)
-            group_by = func.date_trunc('month', Order.created_at)
+            group_by = func.date_trunc('month', DailySalesRollup.day)
         
+        # Read from the daily rollup so cost depends on days, not orders
         revenue_data = db.session.query(
             group_by.label('period'),
-            func.sum(Order.total).label('revenue'),
-            func.count(Order.id).label('orders')
+            func.sum(DailySalesRollup.revenue).label('revenue'),
+            func.sum(DailySalesRollup.order_count).label('orders')
         ).filter(
-            Order.created_at >= start_date,
-            Order.status != 'Cancelled'
-        ).group_by(group_by).order_by(group_by).all()
+            DailySalesRollup.day >= start_date.date()
+        ).group_by(group_by).having(
+            func.sum(DailySalesRollup.order_count) > 0
+        ).order_by(group_by).all()
         
         trends = []
         for data in revenue_data:
@@ -123,7 +114,7 @@ def get_revenue_trends():
                          data.period.strftime('%Y-%W') if period == 'weekly' else
                          data.period.strftime('%Y'),
                 'revenue': float(data.revenue),
-                'orders': data.orders
+                'orders': int(data.orders)
             })
         
         return jsonify({
@@ -145,29 +136,26 @@ def get_customer_insights():
         end_date = datetime.now()
         start_date = end_date - timedelta(days=365)
         
+        month = func.date_trunc('month', DailySalesRollup.day)
         customer_growth = db.session.query(
-            func.date_trunc('month', Customer.created_at).label('month'),
-            func.count(Customer.id).label('new_customers')
+            month.label('month'),
+            func.sum(DailySalesRollup.new_customers).label('new_customers')
         ).filter(
-            Customer.created_at >= start_date
-        ).group_by(
-            func.date_trunc('month', Customer.created_at)
-        ).order_by(
-            func.date_trunc('month', Customer.created_at)
-        ).all()
+            DailySalesRollup.day >= start_date.date()
+        ).group_by(month).having(
+            func.sum(DailySalesRollup.new_customers) > 0
+        ).order_by(month).all()
         
         # Top customers by revenue
         top_customers = db.session.query(
             Customer.name,
             Customer.email,
-            func.count(Order.id).label('total_orders'),
-            func.sum(Order.total).label('total_spent')
-        ).join(Order).filter(
-            Order.status != 'Cancelled'
-        ).group_by(
-            Customer.id, Customer.name, Customer.email
+            CustomerStats.billable_order_count.label('total_orders'),
+            CustomerStats.lifetime_spend.label('total_spent')
+        ).join(CustomerStats, CustomerStats.customer_id == Customer.id).filter(
+            CustomerStats.billable_order_count > 0
         ).order_by(
-            desc(func.sum(Order.total))
+            desc(CustomerStats.lifetime_spend)
         ).limit(10).all()
         
         # Customer retention (customers with multiple orders)
@@ -189,7 +177,7 @@ def get_customer_insights():
         for month_data in customer_growth:
             growth_data.append({
                 'month': month_data.month.strftime('%Y-%m'),
-                'new_customers': month_data.new_customers
+                'new_customers': int(month_data.new_customers)
             })
         
         top_customers_data = []
@@ -382,8 +370,14 @@ def get_inventory_value():
 def get_finance_stats():
     """Get key finance stats including net profit"""
     try:
-        total_revenue = db.session.query(func.sum(Order.total)).filter(Order.status != 'Cancelled').scalar() or 0
-        total_expenses = db.session.query(func.sum(Expense.amount)).scalar() or 0
+        # Order totals per status, plus total expenses, in one round trip
+        histogram = status_stats_service.histogram(
+            Order.status,
+            aggregates={'revenue': func.sum(Order.total).filter(Order.status != 'Cancelled')},
+            extras={'total_expenses': select(func.sum(Expense.amount)).scalar_subquery()}
+        )
+        total_revenue = histogram.totals['revenue'] or 0
+        total_expenses = histogram.extras['total_expenses'] or 0
         net_profit = total_revenue - total_expenses
         
         return jsonify({
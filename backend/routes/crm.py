@@ -1,18 +1,16 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, current_app, jsonify, request, send_file
 from flask_jwt_extended import jwt_required
 from models import db, Lead, Deal, Customer
 from schemas import lead_schema, leads_schema, deal_schema, deals_schema
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime
-from utils.decorators import admin_required
-import csv
-import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
+from utils.decorators import admin_required, idempotent
+from utils.pagination import paginate_list, PaginationError
+from services.sales_rollup import sales_rollup_service
+from services.reports import REPORT_FORMATS
+from services.report_jobs import report_job_service
+from services.status_stats import status_stats_service
 
 crm_bp = Blueprint('crm', __name__)
 
@@ -21,8 +19,6 @@ crm_bp = Blueprint('crm', __name__)
 def get_leads():
     """Get all leads with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         
         query = Lead.query
@@ -35,16 +31,14 @@ def get_leads():
                 )
             )
             
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        items, pagination = paginate_list(query, Lead, {'created_at': Lead.created_at, 'name': Lead.name})
         return jsonify({
             'success': True,
-            'data': leads_schema.dump(pagination.items),
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total
-            }
+            'data': leads_schema.dump(items),
+            'pagination': pagination
         }), 200
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -88,6 +82,7 @@ def get_deals():
 
 @crm_bp.route('/deals', methods=['POST'])
 @admin_required()
+@idempotent()
 def create_deal():
     """Create a new deal"""
     try:
@@ -139,20 +134,27 @@ def update_deal(deal_id):
 def get_crm_stats():
     """Get key CRM metrics for the dashboard"""
     try:
-        total_leads = Lead.query.count()
-       
-        pipeline_value = db.session.query(func.sum(Deal.value)).filter(
-            Deal.stage.in_(['Qualified', 'Proposal', 'Negotiation'])
-        ).scalar() or 0
-       
         current_quarter = (datetime.utcnow().month - 1) // 3 + 1
         start_month = 3 * current_quarter - 2
         start_of_quarter = datetime(datetime.utcnow().year, start_month, 1)
         
-        revenue_this_quarter = db.session.query(func.sum(Deal.value)).filter(
-            Deal.stage == 'Closed Won',
-            Deal.close_date >= start_of_quarter
-        ).scalar() or 0
+        # Deal value per stage, plus the lead count, in one round trip
+        histogram = status_stats_service.histogram(
+            Deal.stage,
+            aggregates={
+                'value': func.sum(Deal.value),
+                'value_this_quarter': func.sum(Deal.value).filter(Deal.close_date >= start_of_quarter)
+            },
+            extras={'total_leads': select(func.count()).select_from(Lead).scalar_subquery()}
+        )
+        total_leads = histogram.extras['total_leads']
+       
+        pipeline_value = sum(
+            histogram.aggregates.get(stage, {}).get('value') or 0
+            for stage in ['Qualified', 'Proposal', 'Negotiation']
+        )
+        
+        revenue_this_quarter = histogram.aggregates.get('Closed Won', {}).get('value_this_quarter') or 0
        
         conversion_rate = "24.5%"
 
@@ -192,6 +194,7 @@ def convert_lead(lead_id):
         )
         db.session.add(new_customer)
         db.session.flush() # To get the new_customer.id
+        sales_rollup_service.apply_customers(new_customer.created_at)
 
         # Create a new deal linked to the new customer
         new_deal = Deal(
@@ -229,119 +232,18 @@ def export_crm_report():
     """Export CRM report in various formats"""
     try:
         format_type = request.args.get('format', 'pdf').lower()
-        
-        # Get CRM data
-        leads = Lead.query.all()
-        deals = Deal.query.all()
-        customers = Customer.query.all()
-        
-        stats = {
-            'total_leads': len(leads),
-            'total_deals': len(deals),
-            'total_customers': len(customers),
-            'pipeline_value': float(db.session.query(func.sum(Deal.value)).filter(
-                Deal.stage.in_(['Qualified', 'Proposal', 'Negotiation'])
-            ).scalar() or 0),
-        }
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'crm_report_{timestamp}'
-        
-        if format_type == 'csv':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['CRM Report'])
-            writer.writerow(['Generated At', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-            writer.writerow([])
-            writer.writerow(['Metric', 'Value'])
-            writer.writerow(['Total Leads', stats['total_leads']])
-            writer.writerow(['Total Deals', stats['total_deals']])
-            writer.writerow(['Total Customers', stats['total_customers']])
-            writer.writerow(['Pipeline Value', f"${stats['pipeline_value']:,.2f}"])
-            writer.writerow([])
-            writer.writerow(['Deals'])
-            writer.writerow(['Name', 'Stage', 'Value', 'Customer'])
-            for deal in deals[:50]:
-                writer.writerow([deal.name, deal.stage, f"${float(deal.value):,.2f}", deal.customer.name if deal.customer else ''])
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
-        
-        elif format_type == 'xlsx':
-            output = io.StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['CRM Report'])
-            writer.writerow(['Generated At', datetime.now().strftime('%Y-%m-%d %H:%M:%S')])
-            writer.writerow([])
-            writer.writerow(['Metric', 'Value'])
-            writer.writerow(['Total Leads', stats['total_leads']])
-            writer.writerow(['Total Deals', stats['total_deals']])
-            writer.writerow(['Total Customers', stats['total_customers']])
-            writer.writerow(['Pipeline Value', f"${stats['pipeline_value']:,.2f}"])
-            
-            output.seek(0)
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'{filename}.xlsx'
-            )
-        
-        else:  # PDF
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
-            story = []
-            styles = getSampleStyleSheet()
-            
-            story.append(Paragraph("CRM Report", ParagraphStyle('Title', parent=styles['Heading1'], fontSize=20, textColor=colors.HexColor('#1e40af'), alignment=1)))
-            story.append(Spacer(1, 0.2*inch))
-            
-            # Stats table
-            stats_data = [
-                ['Metric', 'Value'],
-                ['Total Leads', str(stats['total_leads'])],
-                ['Total Deals', str(stats['total_deals'])],
-                ['Total Customers', str(stats['total_customers'])],
-                ['Pipeline Value', f"${stats['pipeline_value']:,.2f}"],
-            ]
-            stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
-            stats_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-            ]))
-            story.append(stats_table)
-            story.append(Spacer(1, 0.3*inch))
-            
-            # Deals table
-            if deals:
-                deals_data = [['Deal Name', 'Stage', 'Value', 'Customer']]
-                for deal in deals[:20]:
-                    deals_data.append([deal.name, deal.stage, f"${float(deal.value):,.2f}", deal.customer.name if deal.customer else ''])
-                deals_table = Table(deals_data, colWidths=[2*inch, 1.5*inch, 1*inch, 1.5*inch])
-                deals_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-                ]))
-                story.append(Paragraph("<b>Recent Deals</b>", styles['Heading2']))
-                story.append(Spacer(1, 0.1*inch))
-                story.append(deals_table)
-            
-            doc.build(story)
-            buffer.seek(0)
-            return send_file(buffer, mimetype='application/pdf', as_attachment=True, download_name=f'{filename}.pdf')
-        
+        if format_type not in REPORT_FORMATS:
+            format_type = 'pdf'
+        
+        # Served from the report cache when the data has not changed
+        job = report_job_service.submit('crm', format_type, {})
+        job = report_job_service.wait(job.id, current_app.config.get('REPORT_WAIT_SECONDS'))
+        if job.status not in report_job_service.FINISHED:
+            # Still rendering: hand back the job to poll, as POST /reports/jobs does
+            return jsonify({'success': True, 'message': f'Report job {job.status}', 'data': job.to_dict()}), 202
+        if job.status == 'failed':
+            raise Exception(job.error)
+        
+        return send_file(job.path, mimetype=job.mimetype, as_attachment=True, download_name=job.download_name)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify
 from models import db, Customer
 from schemas import customer_schema, customers_schema
+from utils.pagination import paginate_list, PaginationError
 from sqlalchemy.exc import IntegrityError
+from services.sales_rollup import sales_rollup_service
+from services.query_profiles import load_profile
+from services.status_stats import status_stats_service
+from services.delta_export import delta_export_service
 import uuid
 
 customers_bp = Blueprint('customers', __name__)
@@ -10,14 +15,12 @@ customers_bp = Blueprint('customers', __name__)
 def get_customers():
     """Get all customers with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         status = request.args.get('status', '')
         company = request.args.get('company', '')
         
         # Build query
-        query = Customer.query
+        query = Customer.query.options(*load_profile('customer_list'))
         
         if search:
             query = query.filter(
@@ -34,36 +37,30 @@ def get_customers():
         if company:
             query = query.filter(Customer.company == company)
         
-        # Pagination
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        customers = pagination.items
+        # Pagination (keyset when ?cursor= is given)
+        customers, pagination = paginate_list(query, Customer, {
+            'created_at': Customer.created_at,
+            'name': Customer.name
+        }, detailed=True)
         
         # Add calculated fields for each customer
         customers_data = []
         for customer in customers:
             customer_dict = customer_schema.dump(customer)
-            customer_dict['total_orders'] = len(customer.orders)
-            customer_dict['total_spent'] = float(sum(order.total for order in customer.orders if order.status != 'Cancelled'))
+            customer_dict.update(customer.stats_dict())
             customers_data.append(customer_dict)
         
         return jsonify({
             'success': True,
             'data': customers_data,
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except PaginationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -74,10 +71,9 @@ def get_customers():
 def get_customer(customer_id):
     """Get a specific customer by ID"""
     try:
-        customer = Customer.query.get_or_404(customer_id)
+        customer = Customer.query.options(*load_profile('customer_list')).get_or_404(customer_id)
         customer_data = customer_schema.dump(customer)
-        customer_data['total_orders'] = len(customer.orders)
-        customer_data['total_spent'] = float(sum(order.total for order in customer.orders if order.status != 'Cancelled'))
+        customer_data.update(customer.stats_dict())
         
         return jsonify({
             'success': True,
@@ -125,6 +121,8 @@ def create_customer():
         )
         
         db.session.add(customer)
+        db.session.flush()
+        sales_rollup_service.apply_customers(customer.created_at)
         db.session.commit()
         
         return jsonify({
@@ -210,6 +208,8 @@ def delete_customer(customer_id):
                 'error': 'Cannot delete customer that has orders'
             }), 400
         
+        sales_rollup_service.apply_customers(customer.created_at, count=-1)
+        delta_export_service.record_deletion('customers', customer.id)
         db.session.delete(customer)
         db.session.commit()
         
@@ -229,16 +229,14 @@ def delete_customer(customer_id):
 def get_customer_stats():
     """Get customer statistics"""
     try:
-        total_customers = Customer.query.count()
-        active_customers = Customer.query.filter_by(status='Active').count()
-        inactive_customers = Customer.query.filter_by(status='Inactive').count()
+        histogram = status_stats_service.histogram(Customer.status)
         
         return jsonify({
             'success': True,
             'data': {
-                'total_customers': total_customers,
-                'active_customers': active_customers,
-                'inactive_customers': inactive_customers
+                'total_customers': histogram.total,
+                'active_customers': histogram.counts.get('Active', 0),
+                'inactive_customers': histogram.counts.get('Inactive', 0)
             }
         }), 200
         
@@ -1,8 +1,15 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, User, Customer, Product, Order, OrderItem
-import csv
-import io
+from models import db, User
+from services.exports import export_service
+from services.xlsx_export import xlsx_sink
+from services.csv_export import csv_sink
+from services.columnar_export import columnar_export_service, ColumnarExportError
+from services.delta_export import delta_export_service, DeltaExportError
+from services.parallel_export import parallel_export_service
+from services.bulk_import import BulkImportError
+from services.import_jobs import import_job_service
+from utils.upload_limits import upload_limit
 from datetime import datetime
 import uuid
 
@@ -11,7 +18,7 @@ export_import_bp = Blueprint('export_import', __name__)
 @export_import_bp.route('/export/customers', methods=['GET'])
 @jwt_required()
 def export_customers():
-    """Export customers to CSV or Excel"""
+    """Export customers to CSV, Excel, Parquet or Arrow"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -24,63 +31,37 @@ def export_customers():
         
         format_type = request.args.get('format', 'csv').lower()
         
-        if format_type not in ['csv', 'excel']:
+        if format_type not in ['csv', 'excel', 'parquet', 'arrow']:
             return jsonify({
                 'success': False,
-                'error': 'Invalid format. Use csv or excel'
+                'error': 'Invalid format. Use csv, excel, parquet or arrow'
             }), 400
         
-        # Get all customers
-        customers = Customer.query.all()
-        
-        # Prepare data
-        data = []
-        for customer in customers:
-            data.append({
-                'ID': str(customer.id),
-                'Name': customer.name,
-                'Email': customer.email,
-                'Company': customer.company or '',
-                'Phone': customer.phone or '',
-                'Status': customer.status,
-                'Join Date': customer.join_date.strftime('%Y-%m-%d') if customer.join_date else '',
-                'Address': customer.address or '',
-                'Total Orders': len(customer.orders),
-                'Total Spent': sum(float(order.total) for order in customer.orders if order.status != 'Cancelled'),
-                'Created At': customer.created_at.strftime('%Y-%m-%d %H:%M:%S') if customer.created_at else ''
-            })
-        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'customers_export_{timestamp}'
         
+        if format_type in columnar_export_service.FORMATS:
+            return _columnar_export('customers', format_type, filename)
+        
+        # Rows are read from a server-side cursor
+        window = _export_window('customers', *export_service.delta_columns('customers'),
+                                joins=export_service.delta_joins('customers'))
+        columns, rows = export_service.dataset('customers', window)
+        
         if format_type == 'csv':
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
-        else:  # excel - for now return CSV with excel extension
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
+            # Encoded and sent in chunks while the cursor is read
+            response = csv_sink.send(rows, f'{filename}.csv', header=columns)
+        else:  # excel
+            response = xlsx_sink.send(rows, f'{filename}.xlsx', header=columns, sheet_name='Customers')
         
+        return delta_export_service.headers(response, window)
+        
+    except DeltaExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except Exception as e:
         return jsonify({
             'success': False,
@@ -90,7 +71,7 @@ def export_customers():
 @export_import_bp.route('/export/products', methods=['GET'])
 @jwt_required()
 def export_products():
-    """Export products to CSV or Excel"""
+    """Export products to CSV, Excel, Parquet or Arrow"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -103,63 +84,37 @@ def export_products():
         
         format_type = request.args.get('format', 'csv').lower()
         
-        if format_type not in ['csv', 'excel']:
+        if format_type not in ['csv', 'excel', 'parquet', 'arrow']:
             return jsonify({
                 'success': False,
-                'error': 'Invalid format. Use csv or excel'
+                'error': 'Invalid format. Use csv, excel, parquet or arrow'
             }), 400
         
-        # Get all products
-        products = Product.query.all()
-        
-        # Prepare data
-        data = []
-        for product in products:
-            data.append({
-                'ID': str(product.id),
-                'Name': product.name,
-                'SKU': product.sku,
-                'Category': product.category,
-                'Price': float(product.price),
-                'Stock': product.stock,
-                'Status': product.status,
-                'Image': product.image or '',
-                'Description': product.description or '',
-                'Created At': product.created_at.strftime('%Y-%m-%d %H:%M:%S') if product.created_at else '',
-                'Updated At': product.updated_at.strftime('%Y-%m-%d %H:%M:%S') if product.updated_at else ''
-            })
-        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'products_export_{timestamp}'
         
+        if format_type in columnar_export_service.FORMATS:
+            return _columnar_export('products', format_type, filename)
+        
+        # Rows are read from a server-side cursor
+        window = _export_window('products', *export_service.delta_columns('products'),
+                                joins=export_service.delta_joins('products'))
+        columns, rows = export_service.dataset('products', window)
+        
         if format_type == 'csv':
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
-        else:  # excel - for now return CSV with excel extension
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
+            # Encoded and sent in chunks while the cursor is read
+            response = csv_sink.send(rows, f'{filename}.csv', header=columns)
+        else:  # excel
+            response = xlsx_sink.send(rows, f'{filename}.xlsx', header=columns, sheet_name='Products')
+        
+        return delta_export_service.headers(response, window)
         
+    except DeltaExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except Exception as e:
         return jsonify({
             'success': False,
@@ -169,7 +124,7 @@ def export_products():
 @export_import_bp.route('/export/orders', methods=['GET'])
 @jwt_required()
 def export_orders():
-    """Export orders to CSV or Excel"""
+    """Export orders to CSV, Excel, Parquet or Arrow"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -182,76 +137,50 @@ def export_orders():
         
         format_type = request.args.get('format', 'csv').lower()
         
-        if format_type not in ['csv', 'excel']:
+        if format_type not in ['csv', 'excel', 'parquet', 'arrow']:
             return jsonify({
                 'success': False,
-                'error': 'Invalid format. Use csv or excel'
+                'error': 'Invalid format. Use csv, excel, parquet or arrow'
             }), 400
         
-        # Get all orders
-        orders = Order.query.all()
-        
-        # Prepare data
-        data = []
-        for order in orders:
-            products_list = ', '.join([item.product.name for item in order.order_items])
-            data.append({
-                'ID': str(order.id),
-                'Order Number': order.order_number,
-                'Customer': order.customer.name if order.customer else '',
-                'Customer Email': order.customer.email if order.customer else '',
-                'Products': products_list,
-                'Total': float(order.total),
-                'Status': order.status,
-                'Order Date': order.order_date.strftime('%Y-%m-%d') if order.order_date else '',
-                'Payment Method': order.payment_method or '',
-                'Shipping Address': order.shipping_address or '',
-                'Notes': order.notes or '',
-                'Created At': order.created_at.strftime('%Y-%m-%d %H:%M:%S') if order.created_at else '',
-                'Updated At': order.updated_at.strftime('%Y-%m-%d %H:%M:%S') if order.updated_at else ''
-            })
-        
         # Generate filename
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'orders_export_{timestamp}'
         
+        if request.args.get('parallel'):
+            return _parallel_export('orders', format_type, filename)
+        
+        if format_type in columnar_export_service.FORMATS:
+            return _columnar_export('orders', format_type, filename)
+        
+        # Rows are read from a server-side cursor
+        window = _export_window('orders', *export_service.delta_columns('orders'),
+                                joins=export_service.delta_joins('orders'))
+        columns, rows = export_service.dataset('orders', window)
+        
         if format_type == 'csv':
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
-        else:  # excel - for now return CSV with excel extension
-            output = io.StringIO()
-            writer = csv.DictWriter(output, fieldnames=data[0].keys() if data else [])
-            writer.writeheader()
-            writer.writerows(data)
-            output.seek(0)
-            
-            return send_file(
-                io.BytesIO(output.getvalue().encode('utf-8')),
-                mimetype='text/csv',
-                as_attachment=True,
-                download_name=f'{filename}.csv'
-            )
+            # Encoded and sent in chunks while the cursor is read
+            response = csv_sink.send(rows, f'{filename}.csv', header=columns)
+        else:  # excel
+            response = xlsx_sink.send(rows, f'{filename}.xlsx', header=columns, sheet_name='Orders')
         
+        return delta_export_service.headers(response, window)
+        
+    except DeltaExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@export_import_bp.route('/import/customers', methods=['POST'])
+@export_import_bp.route('/export/order-items', methods=['GET'])
 @jwt_required()
-def import_customers():
-    """Import customers from CSV or Excel"""
+def export_order_items():
+    """Export order items to Parquet or Arrow"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -262,102 +191,60 @@ def import_customers():
                 'error': 'Insufficient permissions'
             }), 403
         
-        if 'file' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'No file provided'
-            }), 400
+        format_type = request.args.get('format', 'parquet').lower()
         
-        file = request.files['file']
-        if file.filename == '':
+        if format_type not in columnar_export_service.FORMATS:
             return jsonify({
                 'success': False,
-                'error': 'No file selected'
+                'error': 'Invalid format. Use parquet or arrow'
             }), 400
         
-        # Read file based on extension
-        filename = file.filename.lower()
-        if filename.endswith('.csv'):
-            # Read CSV file
-            file_content = file.read().decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(file_content))
-            data_rows = list(csv_reader)
-        elif filename.endswith(('.xlsx', '.xls')):
-            return jsonify({
-                'success': False,
-                'error': 'Excel files not supported yet. Please use CSV format.'
-            }), 400
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Unsupported file format. Use CSV files'
-            }), 400
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if request.args.get('parallel'):
+            return _parallel_export('order_items', format_type, f'order_items_export_{timestamp}')
+        return _columnar_export('order_items', format_type, f'order_items_export_{timestamp}')
         
-        if not data_rows:
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@export_import_bp.route('/export/expenses', methods=['GET'])
+@jwt_required()
+def export_expenses():
+    """Export expenses to Parquet or Arrow"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or user.role not in ['admin', 'manager']:
             return jsonify({
                 'success': False,
-                'error': 'No data found in file'
-            }), 400
+                'error': 'Insufficient permissions'
+            }), 403
         
-        # Validate required columns
-        required_columns = ['Name', 'Email']
-        missing_columns = [col for col in required_columns if col not in data_rows[0].keys()]
-        if missing_columns:
+        format_type = request.args.get('format', 'parquet').lower()
+        
+        if format_type not in columnar_export_service.FORMATS:
             return jsonify({
                 'success': False,
-                'error': f'Missing required columns: {", ".join(missing_columns)}'
+                'error': 'Invalid format. Use parquet or arrow'
             }), 400
         
-        # Process data
-        imported_count = 0
-        errors = []
-        
-        for index, row in enumerate(data_rows):
-            try:
-                # Check if customer already exists
-                existing_customer = Customer.query.filter_by(email=row['Email']).first()
-                if existing_customer:
-                    errors.append(f"Row {index + 1}: Email {row['Email']} already exists")
-                    continue
-                
-                # Create customer
-                customer = Customer(
-                    name=row['Name'],
-                    email=row['Email'],
-                    company=row.get('Company', ''),
-                    phone=row.get('Phone', ''),
-                    status=row.get('Status', 'Active'),
-                    address=row.get('Address', '')
-                )
-                
-                db.session.add(customer)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-        
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': f'Successfully imported {imported_count} customers',
-            'data': {
-                'imported_count': imported_count,
-                'errors': errors[:10]  # Limit errors to first 10
-            }
-        }), 200
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return _columnar_export('expenses', format_type, f'expenses_export_{timestamp}')
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
-@export_import_bp.route('/import/products', methods=['POST'])
+@export_import_bp.route('/export/<any(customers, products, orders):dataset>/deletions', methods=['GET'])
 @jwt_required()
-def import_products():
-    """Import products from CSV or Excel"""
+def export_deletions(dataset):
+    """List customers, products or orders deleted since a watermark"""
     try:
         current_user_id = get_jwt_identity()
         user = User.query.get(current_user_id)
@@ -368,6 +255,150 @@ def import_products():
                 'error': 'Insufficient permissions'
             }), 403
         
+        since = request.args.get('since')
+        limit = min(request.args.get('limit', 10000, type=int), 100000)
+        if limit < 1:
+            raise DeltaExportError('limit must be a positive number')
+        
+        tombstones, window = delta_export_service.deletions(
+            dataset,
+            delta_export_service.parse_since(since, dataset) if since else None,
+            limit
+        )
+        
+        response = jsonify({
+            'success': True,
+            'data': {
+                'deleted': [{
+                    'id': str(tombstone.record_id),
+                    'deleted_at': tombstone.deleted_at.isoformat()
+                } for tombstone in tombstones],
+                'watermark': delta_export_service.encode(window.watermark),
+                'has_more': window.has_more
+            }
+        })
+        return delta_export_service.headers(response, window), 200
+        
+    except DeltaExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _export_window(dataset: str, updated_column, id_column, joins=()):
+    """
+    Delta window for an export request
+
+    ?since= takes an ISO 8601 timestamp or the X-Export-Watermark token of an
+    earlier export and ?limit= caps the rows returned; without either the
+    whole table is exported. joins are the tables updated_column reads from.
+    """
+    since = request.args.get('since')
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        raise DeltaExportError('limit must be a positive number')
+    
+    if not since and not limit:
+        return delta_export_service.full_window()
+    
+    return delta_export_service.window(
+        updated_column, id_column,
+        delta_export_service.parse_since(since, dataset) if since else None,
+        limit,
+        joins=joins
+    )
+
+def _columnar_export(dataset: str, format_type: str, filename: str):
+    """
+    Stream dataset as Parquet or an Arrow IPC stream
+
+    ?columns=a,b,c exports only those columns; ?since= and ?limit= work as
+    for the CSV exports.
+    """
+    columns = [column.strip() for column in request.args.get('columns', '').split(',') if column.strip()]
+    
+    try:
+        window = _export_window(dataset, *columnar_export_service.delta_columns(dataset),
+                                joins=columnar_export_service.delta_joins(dataset))
+        stmt, schema = columnar_export_service.query(dataset, columns=columns, window=window)
+    except DeltaExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except ColumnarExportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    # Record batches are encoded and sent while the cursor is read
+    response = columnar_export_service.send(stmt, schema, format_type, filename)
+    return delta_export_service.headers(response, window)
+
+def _parallel_export(dataset: str, format_type: str, filename: str):
+    """
+    Export dataset in ?parallel=N key-range shards rendered by worker processes
+
+    CSV shards are concatenated into one file; Parquet and Arrow shards are
+    returned as the parts of a zip archive.
+    """
+    shards = request.args.get('parallel', type=int)
+    if not shards or not 2 <= shards <= parallel_export_service.MAX_SHARDS:
+        return jsonify({
+            'success': False,
+            'error': f'parallel must be a number of shards from 2 to {parallel_export_service.MAX_SHARDS}'
+        }), 400
+    
+    formats = parallel_export_service.FORMATS[dataset]
+    if format_type not in formats:
+        return jsonify({
+            'success': False,
+            'error': f'Parallel exports support {", ".join(formats)}'
+        }), 400
+    
+    if request.args.get('since') or request.args.get('limit'):
+        return jsonify({
+            'success': False,
+            'error': 'Parallel exports cannot be combined with since or limit'
+        }), 400
+    
+    columns = None
+    if format_type != 'csv':
+        columns = [column.strip() for column in request.args.get('columns', '').split(',') if column.strip()] or None
+        try:
+            # Check the projection before any worker starts
+            columnar_export_service.query(dataset, columns=columns)
+        except ColumnarExportError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+    
+    return parallel_export_service.send(dataset, format_type, shards, filename, columns=columns)
+
+def _import_upload(dataset: str, wait: bool = True):
+    """
+    Submit a CSV upload as an import job and build the response
+
+    The CSV is either the 'file' field of a multipart form or, with
+    Content-Type: text/csv, the raw request body, which is then spooled
+    straight from the request stream. ?mode=upsert updates existing rows
+    (matched by email or SKU) instead of reporting them as errors.
+
+    With wait, the request waits up to IMPORT_SYNC_TIMEOUT seconds for the job
+    and answers like a synchronous import; otherwise, or if the job is still
+    running, it returns 202 with the job and its status_url.
+    """
+    filename = None
+    if request.mimetype == 'text/csv':
+        source = request.stream
+    else:
         if 'file' not in request.files:
             return jsonify({
                 'success': False,
@@ -382,80 +413,169 @@ def import_products():
             }), 400
         
         # Read file based on extension
-        filename = file.filename.lower()
-        if filename.endswith('.csv'):
-            # Read CSV file
-            file_content = file.read().decode('utf-8')
-            csv_reader = csv.DictReader(io.StringIO(file_content))
-            data_rows = list(csv_reader)
-        elif filename.endswith(('.xlsx', '.xls')):
+        filename = file.filename
+        if filename.lower().endswith(('.xlsx', '.xls')):
             return jsonify({
                 'success': False,
                 'error': 'Excel files not supported yet. Please use CSV format.'
             }), 400
-        else:
+        elif not filename.lower().endswith('.csv'):
             return jsonify({
                 'success': False,
                 'error': 'Unsupported file format. Use CSV files'
             }), 400
+        source = file.stream
+    
+    mode = request.args.get('mode', 'insert').lower()
+    
+    try:
+        job, started = import_job_service.submit(
+            dataset, mode, source, filename=filename, user_id=get_jwt_identity()
+        )
+    except BulkImportError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    if wait:
+        job = import_job_service.wait(job.id, current_app.config.get('IMPORT_SYNC_TIMEOUT'))
+    
+    data = job.to_dict()
+    if job.status == 'failed':
+        return jsonify({
+            'success': False,
+            'error': job.error,
+            'data': data
+        }), 400
+    
+    if job.status != 'completed':
+        return jsonify({
+            'success': True,
+            'message': f'Import job {job.status}' if started else 'This file is already being imported',
+            'data': data
+        }), 202
+    
+    if started:
+        message = f'Successfully imported {job.imported_count} {dataset}'
+        if job.updated_count:
+            message += f' and updated {job.updated_count}'
+    else:
+        message = 'This file has already been imported'
+    
+    return jsonify({
+        'success': True,
+        'message': message,
+        'data': data
+    }), 200
+
+@export_import_bp.route('/import/customers', methods=['POST'])
+@jwt_required()
+@upload_limit('IMPORT_MAX_CONTENT_LENGTH')
+def import_customers():
+    """Import customers from CSV"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
         
-        if not data_rows:
+        if not user or user.role not in ['admin', 'manager']:
             return jsonify({
                 'success': False,
-                'error': 'No data found in file'
-            }), 400
+                'error': 'Insufficient permissions'
+            }), 403
+        
+        return _import_upload('customers')
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@export_import_bp.route('/import/products', methods=['POST'])
+@jwt_required()
+@upload_limit('IMPORT_MAX_CONTENT_LENGTH')
+def import_products():
+    """Import products from CSV"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
         
-        # Validate required columns
-        required_columns = ['Name', 'SKU', 'Category', 'Price']
-        missing_columns = [col for col in required_columns if col not in data_rows[0].keys()]
-        if missing_columns:
+        if not user or user.role not in ['admin', 'manager']:
             return jsonify({
                 'success': False,
-                'error': f'Missing required columns: {", ".join(missing_columns)}'
+                'error': 'Insufficient permissions'
+            }), 403
+        
+        return _import_upload('products')
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@export_import_bp.route('/import/jobs', methods=['POST'])
+@jwt_required()
+@upload_limit('IMPORT_MAX_CONTENT_LENGTH')
+def create_import_job():
+    """Start a background import job (?dataset=customers|products)"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or user.role not in ['admin', 'manager']:
+            return jsonify({
+                'success': False,
+                'error': 'Insufficient permissions'
+            }), 403
+        
+        dataset = request.args.get('dataset', '').lower()
+        if dataset not in ('customers', 'products'):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid dataset. Use customers or products'
             }), 400
         
-        # Process data
-        imported_count = 0
-        errors = []
-        
-        for index, row in enumerate(data_rows):
-            try:
-                # Check if product already exists
-                existing_product = Product.query.filter_by(sku=row['SKU']).first()
-                if existing_product:
-                    errors.append(f"Row {index + 1}: SKU {row['SKU']} already exists")
-                    continue
-                
-                # Create product
-                product = Product(
-                    name=row['Name'],
-                    sku=row['SKU'],
-                    category=row['Category'],
-                    price=float(row['Price']),
-                    stock=int(row.get('Stock', 0)),
-                    status=row.get('Status', 'In Stock'),
-                    description=row.get('Description', '')
-                )
-                
-                db.session.add(product)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-        
-        db.session.commit()
+        return _import_upload(dataset, wait=False)
         
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@export_import_bp.route('/import/jobs/<uuid:job_id>', methods=['GET'])
+@jwt_required()
+def get_import_job(job_id):
+    """Get the progress of an import job"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user or user.role not in ['admin', 'manager']:
+            return jsonify({
+                'success': False,
+                'error': 'Insufficient permissions'
+            }), 403
+        
+        job = import_job_service.get(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Import job not found'
+            }), 404
+        
+        error_limit = min(request.args.get('errors', 10, type=int), 1000)
         return jsonify({
             'success': True,
-            'message': f'Successfully imported {imported_count} products',
-            'data': {
-                'imported_count': imported_count,
-                'errors': errors[:10]  # Limit errors to first 10
-            }
+            'data': job.to_dict(error_limit=error_limit)
         }), 200
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
@@ -2,6 +2,8 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required
 from models import db, Expense
 from schemas import expense_schema, expenses_schema
+from utils.pagination import paginate_list, PaginationError
+from utils.decorators import idempotent
 from sqlalchemy.exc import IntegrityError
 
 finance_bp = Blueprint('finance', __name__)
@@ -11,29 +13,26 @@ finance_bp = Blueprint('finance', __name__)
 def get_expenses():
     """Get all expenses with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         category = request.args.get('category', '')
 
         query = Expense.query
         if category:
             query = query.filter(Expense.category.ilike(f'%{category}%'))
             
-        pagination = query.order_by(Expense.date.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        items, pagination = paginate_list(query.order_by(Expense.date.desc()), Expense, {'date': Expense.date, 'created_at': Expense.created_at, 'amount': Expense.amount}, default_sort='-date')
         return jsonify({
             'success': True,
-            'data': expenses_schema.dump(pagination.items),
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total
-            }
+            'data': expenses_schema.dump(items),
+            'pagination': pagination
         }), 200
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @finance_bp.route('/expenses', methods=['POST'])
 @jwt_required()
+@idempotent()
 def add_expense():
     """Add a new expense record"""
     try:
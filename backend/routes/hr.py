@@ -3,9 +3,10 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, User, Attendance, Expense
 from schemas import users_schema, user_schema, attendance_schema, attendances_schema
 from datetime import datetime, date
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
+from services.status_stats import status_stats_service
 import uuid
 
 hr_bp = Blueprint('hr', __name__)
@@ -270,26 +271,37 @@ def delete_employee(employee_id):
 def get_hr_stats():
     """Get HR dashboard statistics"""
     try:
-        total_employees = User.query.count()
         today = date.today()
-        present_today = Attendance.query.filter_by(date=today, status='Present').count()
-        on_leave = Attendance.query.filter_by(date=today, status='On Leave').count()
         
         # Payroll: Sum of expenses in 'Payroll' or 'Salary' category for current month
         current_month = datetime.now().month
         current_year = datetime.now().year
-        payroll_expenses = db.session.query(func.sum(Expense.amount)).filter(
+        this_month = [
             func.extract('month', Expense.date) == current_month,
-            func.extract('year', Expense.date) == current_year,
-            Expense.category.in_(['Payroll', 'Salary', 'Employee Benefits'])
-        ).scalar() or Decimal('0.0')
+            func.extract('year', Expense.date) == current_year
+        ]
+        
+        # Today's attendance per status, with the headcount and payroll sums in the same round trip
+        histogram = status_stats_service.histogram(
+            Attendance.status,
+            filters=[Attendance.date == today],
+            extras={
+                'total_employees': select(func.count()).select_from(User).scalar_subquery(),
+                'payroll': select(func.sum(Expense.amount)).where(
+                    *this_month,
+                    Expense.category.in_(['Payroll', 'Salary', 'Employee Benefits'])
+                ).scalar_subquery(),
+                'all_expenses': select(func.sum(Expense.amount)).where(*this_month).scalar_subquery()
+            }
+        )
+        total_employees = histogram.extras['total_employees']
+        present_today = histogram.counts.get('Present', 0)
+        on_leave = histogram.counts.get('On Leave', 0)
+        payroll_expenses = histogram.extras['payroll'] or Decimal('0.0')
         
-        # If no payroll expenses found, calculate from all expenses this month (fallback)
+        # If no payroll expenses found, use all expenses this month (fallback)
         if payroll_expenses == 0:
-            payroll_expenses = db.session.query(func.sum(Expense.amount)).filter(
-                func.extract('month', Expense.date) == current_month,
-                func.extract('year', Expense.date) == current_year
-            ).scalar() or Decimal('0.0')
+            payroll_expenses = histogram.extras['all_expenses'] or Decimal('0.0')
         
         payroll_this_month = f"${float(payroll_expenses):,.2f}" 
         
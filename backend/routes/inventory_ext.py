@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required
 from models import db, Supplier, PurchaseOrder
 from schemas import supplier_schema, suppliers_schema, purchase_order_schema, purchase_orders_schema
 from sqlalchemy.exc import IntegrityError
+from utils.decorators import idempotent
 
 inventory_ext_bp = Blueprint('inventory_ext', __name__)
 
@@ -113,6 +114,7 @@ def get_purchase_orders():
 
 @inventory_ext_bp.route('/purchase-orders', methods=['POST'])
 @jwt_required()
+@idempotent()
 def create_purchase_order():
     """Create a new purchase order"""
     try:
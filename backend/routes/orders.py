@@ -1,7 +1,15 @@
 from flask import Blueprint, request, jsonify
-from models import db, Order, OrderItem, Product, Customer
+from models import db, Order, OrderItem, Customer
 from schemas import order_schema, orders_schema, order_item_schema
 from sqlalchemy.exc import IntegrityError
+from services.sales_rollup import sales_rollup_service
+from services.customer_stats import customer_stats_service
+from services.query_profiles import load_profile
+from services.inventory import inventory_service, StockError
+from services.status_stats import status_stats_service
+from services.delta_export import delta_export_service
+from utils.pagination import paginate_list, PaginationError
+from utils.decorators import idempotent
 from decimal import Decimal
 import uuid
 from datetime import datetime
@@ -12,14 +20,12 @@ orders_bp = Blueprint('orders', __name__)
 def get_orders():
     """Get all orders with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         status = request.args.get('status', '')
         customer_id = request.args.get('customer_id', '')
         
         # Build query
-        query = Order.query
+        query = Order.query.options(*load_profile('order_list'))
         
         if search:
             query = query.join(Customer).filter(
@@ -35,28 +41,24 @@ def get_orders():
         if customer_id:
             query = query.filter(Order.customer_id == customer_id)
         
-        # Pagination
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        orders = pagination.items
+        # Pagination (keyset when ?cursor= is given)
+        orders, pagination = paginate_list(query, Order, {
+            'created_at': Order.created_at,
+            'total': Order.total,
+            'order_number': Order.order_number
+        }, detailed=True)
         
         return jsonify({
             'success': True,
             'data': orders_schema.dump(orders),
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except PaginationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -67,7 +69,7 @@ def get_orders():
 def get_order(order_id):
     """Get a specific order by ID"""
     try:
-        order = Order.query.get_or_404(order_id)
+        order = Order.query.options(*load_profile('order_detail')).get_or_404(order_id)
         return jsonify({
             'success': True,
             'data': order_schema.dump(order)
@@ -80,6 +82,7 @@ def get_order(order_id):
         }), 500
 
 @orders_bp.route('/orders', methods=['POST'])
+@idempotent()
 def create_order():
     """Create a new order"""
     try:
@@ -114,20 +117,9 @@ def create_order():
         total = Decimal('0.0')
         order_items_data = []
         
+        inventory_service.validate(data['order_items'])
+        
         for item_data in data['order_items']:
-            product = Product.query.get(item_data['product_id'])
-            if not product:
-                return jsonify({
-                    'success': False,
-                    'error': f'Product with ID {item_data["product_id"]} not found'
-                }), 404
-            
-            if product.stock < item_data['quantity']:
-                return jsonify({
-                    'success': False,
-                    'error': f'Insufficient stock for product {product.name}'
-                }), 400
-            
             subtotal = Decimal(str(item_data['unit_price'])) * item_data['quantity']
             total += subtotal
             
@@ -153,7 +145,7 @@ def create_order():
         db.session.add(order)
         db.session.flush()  # Get the order ID
         
-        # Create order items and update stock
+        # Create order items
         for item_data in order_items_data:
             order_item = OrderItem(
                 order_id=order.id,
@@ -163,25 +155,33 @@ def create_order():
                 subtotal=item_data['subtotal']
             )
             db.session.add(order_item)
-            
-            # Update product stock
-            product = Product.query.get(item_data['product_id'])
-            product.stock -= item_data['quantity']
-            
-            # Update product status based on stock
-            if product.stock == 0:
-                product.status = 'Out of Stock'
-            elif product.stock <= 10:
-                product.status = 'Low Stock'
+        
+        # Take stock for every item at once; fails if another order got there first
+        inventory_service.reserve(order_items_data)
+        
+        # Keep the daily sales rollup and customer stats in the same transaction
+        sales_rollup_service.apply_order(sales_rollup_service.order_contribution(
+            order, units=sum(item_data['quantity'] for item_data in order_items_data)
+        ))
+        customer_stats_service.apply_order(customer_stats_service.order_contribution(order))
         
         db.session.commit()
         
+        # Reload with the customer, items and products in one round trip
+        order = Order.query.options(*load_profile('order_detail')).get(order.id)
+        
         return jsonify({
             'success': True,
             'message': 'Order created successfully',
             'data': order_schema.dump(order)
         }), 201
         
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except IntegrityError:
         db.session.rollback()
         return jsonify({
@@ -220,6 +220,13 @@ def update_order(order_id):
                     'error': 'Order number already exists'
                 }), 400
         
+        # Capture the rollup and customer stats contributions before status or items change
+        rollup_before = None
+        stats_before = None
+        if 'status' in data or 'order_items' in data:
+            rollup_before = sales_rollup_service.order_contribution(order)
+            stats_before = customer_stats_service.order_contribution(order)
+        
         # Update basic fields
         for field in ['status', 'payment_method', 'shipping_address', 'notes']:
             if field in data:
@@ -227,38 +234,19 @@ def update_order(order_id):
         
         # Update order items if provided
         if 'order_items' in data:
-            # Remove existing order items
+            # Remove existing order items and give their stock back
+            inventory_service.release([
+                {'product_id': item.product_id, 'quantity': item.quantity}
+                for item in order.order_items
+            ])
             for item in order.order_items:
-                # Restore product stock
-                product = Product.query.get(item.product_id)
-                product.stock += item.quantity
-                
-                # Update product status
-                if product.stock > 10:
-                    product.status = 'In Stock'
-                elif product.stock > 0:
-                    product.status = 'Low Stock'
-                else:
-                    product.status = 'Out of Stock'
-                
                 db.session.delete(item)
             
+            inventory_service.validate(data['order_items'])
+            
             # Add new order items
             total = Decimal('0.0')
             for item_data in data['order_items']:
-                product = Product.query.get(item_data['product_id'])
-                if not product:
-                    return jsonify({
-                        'success': False,
-                        'error': f'Product with ID {item_data["product_id"]} not found'
-                    }), 404
-                
-                if product.stock < item_data['quantity']:
-                    return jsonify({
-                        'success': False,
-                        'error': f'Insufficient stock for product {product.name}'
-                    }), 400
-                
                 subtotal = Decimal(str(item_data['unit_price'])) * item_data['quantity']
                 total += subtotal
                 
@@ -270,26 +258,40 @@ def update_order(order_id):
                     subtotal=float(subtotal)
                 )
                 db.session.add(order_item)
-                
-                # Update product stock
-                product.stock -= item_data['quantity']
-                
-                # Update product status
-                if product.stock == 0:
-                    product.status = 'Out of Stock'
-                elif product.stock <= 10:
-                    product.status = 'Low Stock'
+            
+            # Take stock for the new items
+            inventory_service.reserve(data['order_items'])
             
             order.total = total
         
+        # Move the order's contribution in the daily sales rollup
+        if rollup_before:
+            units = sum(item_data['quantity'] for item_data in data['order_items']) if 'order_items' in data else rollup_before.units
+            sales_rollup_service.apply_order(rollup_before, sign=-1)
+            sales_rollup_service.apply_order(sales_rollup_service.order_contribution(order, units=units))
+        
+        # Move the order's contribution in its customer's stats
+        if stats_before:
+            customer_stats_service.apply_order(stats_before, sign=-1)
+            customer_stats_service.apply_order(customer_stats_service.order_contribution(order))
+        
         db.session.commit()
         
+        # Reload with the customer, items and products in one round trip
+        order = Order.query.options(*load_profile('order_detail')).get(order.id)
+        
         return jsonify({
             'success': True,
             'message': 'Order updated successfully',
             'data': order_schema.dump(order)
         }), 200
         
+    except StockError as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
     except IntegrityError:
         db.session.rollback()
         return jsonify({
@@ -310,18 +312,16 @@ def delete_order(order_id):
         order = Order.query.get_or_404(order_id)
         
         # Restore product stock
-        for item in order.order_items:
-            product = Product.query.get(item.product_id)
-            product.stock += item.quantity
-            
-            # Update product status
-            if product.stock > 10:
-                product.status = 'In Stock'
-            elif product.stock > 0:
-                product.status = 'Low Stock'
-            else:
-                product.status = 'Out of Stock'
+        inventory_service.release([
+            {'product_id': item.product_id, 'quantity': item.quantity}
+            for item in order.order_items
+        ])
+        
+        # Remove the order from the daily sales rollup and customer stats
+        sales_rollup_service.apply_order(sales_rollup_service.order_contribution(order), sign=-1)
+        customer_stats_service.apply_order(customer_stats_service.order_contribution(order), sign=-1)
         
+        delta_export_service.record_deletion('orders', order.id)
         db.session.delete(order)
         db.session.commit()
         
@@ -341,22 +341,18 @@ def delete_order(order_id):
 def get_order_stats():
     """Get order statistics"""
     try:
-        total_orders = Order.query.count()
-        completed_orders = Order.query.filter_by(status='Completed').count()
-        processing_orders = Order.query.filter_by(status='Processing').count()
-        shipped_orders = Order.query.filter_by(status='Shipped').count()
-        pending_orders = Order.query.filter_by(status='Pending').count()
-        cancelled_orders = Order.query.filter_by(status='Cancelled').count()
+        histogram = status_stats_service.histogram(Order.status)
+        counts = histogram.counts
         
         return jsonify({
             'success': True,
             'data': {
-                'total_orders': total_orders,
-                'completed': completed_orders,
-                'processing': processing_orders,
-                'shipped': shipped_orders,
-                'pending': pending_orders,
-                'cancelled': cancelled_orders
+                'total_orders': histogram.total,
+                'completed': counts.get('Completed', 0),
+                'processing': counts.get('Processing', 0),
+                'shipped': counts.get('Shipped', 0),
+                'pending': counts.get('Pending', 0),
+                'cancelled': counts.get('Cancelled', 0)
             }
         }), 200
         
@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from models import db, Product
 from schemas import product_schema, products_schema
+from utils.pagination import paginate_list, PaginationError
 from sqlalchemy.exc import IntegrityError
+from services.status_stats import status_stats_service
+from services.delta_export import delta_export_service
 import uuid
 
 products_bp = Blueprint('products', __name__)
@@ -10,8 +13,6 @@ products_bp = Blueprint('products', __name__)
 def get_products():
     """Get all products with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         category = request.args.get('category', '')
         status = request.args.get('status', '')
@@ -34,28 +35,25 @@ def get_products():
         if status:
             query = query.filter(Product.status == status)
         
-        # Pagination
-        pagination = query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        products = pagination.items
+        # Pagination (keyset when ?cursor= is given)
+        products, pagination = paginate_list(query, Product, {
+            'created_at': Product.created_at,
+            'name': Product.name,
+            'price': Product.price,
+            'stock': Product.stock
+        }, detailed=True)
         
         return jsonify({
             'success': True,
             'data': products_schema.dump(products),
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'pagination': pagination
         }), 200
         
+    except PaginationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -199,6 +197,7 @@ def delete_product(product_id):
                 'error': 'Cannot delete product that is used in orders'
             }), 400
         
+        delta_export_service.record_deletion('products', product.id)
         db.session.delete(product)
         db.session.commit()
         
@@ -218,18 +217,16 @@ def delete_product(product_id):
 def get_product_stats():
     """Get product statistics"""
     try:
-        total_products = Product.query.count()
-        in_stock = Product.query.filter_by(status='In Stock').count()
-        low_stock = Product.query.filter_by(status='Low Stock').count()
-        out_of_stock = Product.query.filter_by(status='Out of Stock').count()
+        histogram = status_stats_service.histogram(Product.status)
+        counts = histogram.counts
         
         return jsonify({
             'success': True,
             'data': {
-                'total_products': total_products,
-                'in_stock': in_stock,
-                'low_stock': low_stock,
-                'out_of_stock': out_of_stock
+                'total_products': histogram.total,
+                'in_stock': counts.get('In Stock', 0),
+                'low_stock': counts.get('Low Stock', 0),
+                'out_of_stock': counts.get('Out of Stock', 0)
             }
         }), 200
         
@@ -2,9 +2,12 @@ from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, Project, Task, User, ProjectActivity
 from schemas import project_schema, projects_schema, task_schema, tasks_schema
+from utils.pagination import paginate_list, PaginationError
+from sqlalchemy import func, select
 from sqlalchemy.exc import IntegrityError
 from datetime import date, datetime
 from websocket_server import notify_project_updated
+from services.status_stats import status_stats_service
 
 projects_bp = Blueprint('projects', __name__)
 
@@ -13,8 +16,6 @@ projects_bp = Blueprint('projects', __name__)
 def get_projects():
     """Get all projects with pagination and filtering"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
         status = request.args.get('status', '')
 
@@ -24,16 +25,14 @@ def get_projects():
         if status:
             query = query.filter(Project.status == status)
             
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        items, pagination = paginate_list(query, Project, {'created_at': Project.created_at, 'name': Project.name})
         return jsonify({
             'success': True,
-            'data': projects_schema.dump(pagination.items),
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total
-            }
+            'data': projects_schema.dump(items),
+            'pagination': pagination
         }), 200
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -264,16 +263,21 @@ def get_project_stats():
     """Get key project metrics for the dashboard"""
     try:
         active_statuses = ['Planning', 'In Progress', 'Review']
-        active_projects_count = Project.query.filter(Project.status.in_(active_statuses)).count()
         
-        at_risk_count = Project.query.filter(
-            Project.status.in_(active_statuses),
-            Project.end_date < date.today()
-        ).count()
+        # Projects per status with their overdue count, plus distinct task assignees, in one round trip
+        assignees = select(Task.assignee_id).distinct().subquery()
+        histogram = status_stats_service.histogram(
+            Project.status,
+            filters=[Project.status.in_(active_statuses)],
+            aggregates={'overdue': func.count().filter(Project.end_date < date.today())},
+            extras={'team_members': select(func.count()).select_from(assignees).scalar_subquery()}
+        )
+        active_projects_count = histogram.total
+        at_risk_count = histogram.totals['overdue']
         
         on_track_count = active_projects_count - at_risk_count
         
-        team_members_count = db.session.query(Task.assignee_id).distinct().count()
+        team_members_count = histogram.extras['team_members']
 
         return jsonify({
             'success': True,
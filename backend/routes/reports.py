@@ -0,0 +1,77 @@
+from flask import Blueprint, jsonify, request, send_file
+from flask_jwt_extended import jwt_required
+from services.report_jobs import report_job_service
+
+reports_bp = Blueprint('reports', __name__)
+
+@reports_bp.route('/reports/jobs', methods=['POST'])
+@jwt_required()
+def create_report_job():
+    """Queue a dashboard or CRM report for background rendering"""
+    try:
+        data = request.get_json() or {}
+        report_type = data.get('type', 'dashboard')
+        format_type = str(data.get('format', 'pdf')).lower()
+
+        params = {}
+        if report_type == 'dashboard':
+            params['days'] = str(data.get('days', '30'))
+
+        job = report_job_service.submit(report_type, format_type, params)
+
+        return jsonify({
+            'success': True,
+            'data': job.to_dict()
+        }), 200 if job.status == 'completed' else 202
+
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@reports_bp.route('/reports/jobs/<uuid:job_id>', methods=['GET'])
+@jwt_required()
+def get_report_job(job_id):
+    """Get the status of a report job"""
+    job = report_job_service.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Report job not found'
+        }), 404
+
+    return jsonify({
+        'success': True,
+        'data': job.to_dict()
+    })
+
+@reports_bp.route('/reports/jobs/<uuid:job_id>/download', methods=['GET'])
+@jwt_required()
+def download_report_job(job_id):
+    """Download the artifact of a completed report job"""
+    job = report_job_service.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Report job not found'
+        }), 404
+
+    if job.status != 'completed':
+        return jsonify({
+            'success': False,
+            'error': f'Report is not ready (status: {job.status})',
+            'data': job.to_dict()
+        }), 409
+
+    return send_file(
+        job.path,
+        mimetype=job.mimetype,
+        as_attachment=True,
+        download_name=job.download_name
+    )
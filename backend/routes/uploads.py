@@ -1,11 +1,14 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 from models import db, User, Product
-import os
-import uuid
-from PIL import Image
-import io
+from services.image_processing import image_processing_service, ImageProcessingError, ImageQueueFullError
+from services.image_store import image_store, image_url, variant_urls, valid_hash
+from services.storage import storage_service, LocalStorage, StorageError
+from services.image_cache import image_cache
+from services.file_serving import file_serving_service
+from concurrent.futures import TimeoutError
 
 uploads_bp = Blueprint('uploads', __name__)
 
@@ -14,26 +17,63 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
-def resize_image(image_data, max_size=(800, 800)):
-    """Resize image to max_size while maintaining aspect ratio"""
+def image_task(fn, *args):
+    """
+    Run an image processing call, mapping its errors to responses
+
+    Returns (result, None) or (None, error response).
+    """
     try:
-        img = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-        
-        # Resize while maintaining aspect ratio
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=85, optimize=True)
-        output.seek(0)
-        
-        return output.getvalue()
-    except Exception as e:
-        raise Exception(f"Image processing failed: {str(e)}")
+        return fn(*args), None
+    except ImageQueueFullError as e:
+        response = jsonify({
+            'success': False,
+            'error': str(e)
+        })
+        response.headers['Retry-After'] = '1'
+        return None, (response, 503)
+    except TimeoutError:
+        response = jsonify({
+            'success': False,
+            'error': 'Image processing timed out, please retry shortly'
+        })
+        response.headers['Retry-After'] = '5'
+        return None, (response, 503)
+    except ImageProcessingError as e:
+        return None, (jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400)
+
+# Upload kinds: response field for the image URL, success message and the
+# roles allowed to upload (None: any user)
+UPLOAD_KINDS = {
+    'avatar': ('avatar_url', 'Avatar uploaded successfully', None),
+    'product-image': ('image_url', 'Product image uploaded successfully', ['admin', 'manager']),
+}
+
+def image_upload_response(kind, user, stored):
+    """
+    Success response for a stored image; an avatar is also set on the user
+    """
+    url_field, message, _ = UPLOAD_KINDS[kind]
+    url = image_url(stored.hash)
+    if kind == 'avatar':
+        user.avatar = url
+        db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'message': message,
+        'data': {
+            url_field: url,
+            'filename': f"{stored.hash}/full.jpg",
+            'hash': stored.hash,
+            'variants': variant_urls(url),
+            'sizes': stored.variants,
+            'deduplicated': stored.deduplicated
+        }
+    }), 200
 
 @uploads_bp.route('/upload/avatar', methods=['POST'])
 @jwt_required()
@@ -71,40 +111,12 @@ def upload_avatar():
         # Read file data
         file_data = file.read()
         
-        # Resize image
-        try:
-            resized_data = resize_image(file_data, max_size=(400, 400))
-        except Exception as e:
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 400
-        
-        # Generate unique filename
-        filename = f"avatar_{current_user_id}_{uuid.uuid4().hex}.jpg"
+        # Render the variants in a worker process, unless this image is already stored
+        stored, error = image_task(image_store.save, file_data)
+        if error:
+            return error
         
-        # Ensure upload directory exists
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'avatars')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save file
-        file_path = os.path.join(upload_dir, filename)
-        with open(file_path, 'wb') as f:
-            f.write(resized_data)
-        
-        # Update user avatar path
-        avatar_url = f"/api/v1/files/avatars/{filename}"
-        user.avatar = avatar_url
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Avatar uploaded successfully',
-            'data': {
-                'avatar_url': avatar_url,
-                'filename': filename
-            }
-        }), 200
+        return image_upload_response('avatar', user, stored)
         
     except Exception as e:
         return jsonify({
@@ -155,39 +167,181 @@ def upload_product_image():
         # Read file data
         file_data = file.read()
         
-        # Resize image
+        # Render the variants in a worker process, unless this image is already stored
+        stored, error = image_task(image_store.save, file_data)
+        if error:
+            return error
+        
+        return image_upload_response('product-image', user, stored)
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@uploads_bp.route('/upload/presign', methods=['POST'])
+@jwt_required()
+def presign_upload():
+    """Start a direct upload: presigned URL the browser PUTs the file to"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({
+                'success': False,
+                'error': 'User not found'
+            }), 404
+        
+        data = request.get_json() or {}
+        kind = data.get('kind')
+        if kind not in UPLOAD_KINDS:
+            return jsonify({
+                'success': False,
+                'error': f"kind must be one of: {', '.join(UPLOAD_KINDS)}"
+            }), 400
+        
+        roles = UPLOAD_KINDS[kind][2]
+        if roles and user.role not in roles:
+            return jsonify({
+                'success': False,
+                'error': 'Insufficient permissions'
+            }), 403
+        
         try:
-            resized_data = resize_image(file_data, max_size=(800, 800))
-        except Exception as e:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
             return jsonify({
                 'success': False,
-                'error': str(e)
+                'error': 'size (in bytes) is required'
             }), 400
         
-        # Generate unique filename
-        filename = f"product_{uuid.uuid4().hex}.jpg"
+        upload = storage_service.create_upload(kind, current_user_id, data.get('content_type'), size)
         
-        # Ensure upload directory exists
-        upload_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'products')
-        os.makedirs(upload_dir, exist_ok=True)
+        return jsonify({
+            'success': True,
+            'data': upload
+        }), 200
         
-        # Save file
-        file_path = os.path.join(upload_dir, filename)
-        with open(file_path, 'wb') as f:
-            f.write(resized_data)
+    except StorageError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@uploads_bp.route('/upload/direct/<upload_id>', methods=['PUT'])
+def receive_direct_upload(upload_id):
+    """Presigned upload target for local storage (the upload id is the credential)"""
+    try:
+        if not isinstance(storage_service.backend, LocalStorage):
+            return jsonify({
+                'success': False,
+                'error': 'Uploads go directly to object storage'
+            }), 404
         
-        # Return image URL
-        image_url = f"/api/v1/files/products/{filename}"
+        storage_service.receive_upload(upload_id, request.mimetype, request.get_data())
         
         return jsonify({
             'success': True,
-            'message': 'Product image uploaded successfully',
-            'data': {
-                'image_url': image_url,
-                'filename': filename
-            }
+            'message': 'File received'
         }), 200
         
+    except StorageError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except HTTPException:
+        # 413 for a body over MAX_CONTENT_LENGTH
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@uploads_bp.route('/upload/complete', methods=['POST'])
+@jwt_required()
+def complete_upload():
+    """Finish a direct upload: render the image variants and use the image"""
+    try:
+        current_user_id = get_jwt_identity()
+        user = User.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({
+                'success': False,
+                'error': 'User not found'
+            }), 404
+        
+        data = request.get_json() or {}
+        upload, file_data = storage_service.claim_upload(data.get('upload_id', ''), current_user_id)
+        
+        roles = UPLOAD_KINDS[upload['kind']][2]
+        if roles and user.role not in roles:
+            return jsonify({
+                'success': False,
+                'error': 'Insufficient permissions'
+            }), 403
+        
+        # Render the variants in a worker process, unless this image is already stored
+        stored, error = image_task(image_store.save, file_data)
+        if error:
+            # Keep the upload when the workers are busy, so completing can be retried
+            if error[1] != 503:
+                storage_service.finish_upload(upload)
+            return error
+        storage_service.finish_upload(upload)
+        
+        return image_upload_response(upload['kind'], user, stored)
+        
+    except StorageError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def send_upload(key, immutable=False, etag=None):
+    """
+    Serve an uploaded file from storage, or a 404 if it does not exist
+    """
+    response = storage_service.send(key, immutable=immutable, etag=etag)
+    if response is None:
+        return jsonify({
+            'success': False,
+            'error': 'File not found'
+        }), 404
+    
+    return response
+
+@uploads_bp.route('/files/images/<image_hash>/<name>', methods=['GET'])
+def serve_image(image_hash, name):
+    """Serve a variant from the image store, e.g. thumb.webp"""
+    try:
+        key = image_store.variant_key(image_hash, name)
+        if not key:
+            return jsonify({
+                'success': False,
+                'error': 'File not found'
+            }), 404
+        
+        # Content-addressed: the name never points at different bytes
+        return send_upload(key, immutable=True, etag=f'{image_hash}-{name}')
+        
+    except HTTPException:
+        # e.g. 416 for an unsatisfiable Range
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -200,25 +354,19 @@ def serve_file(filename):
     try:
         # Determine file type and directory
         if filename.startswith('avatar_'):
-            directory = os.path.join(current_app.config['UPLOAD_FOLDER'], 'avatars')
+            directory = 'avatars'
         elif filename.startswith('product_'):
-            directory = os.path.join(current_app.config['UPLOAD_FOLDER'], 'products')
+            directory = 'products'
         else:
             return jsonify({
                 'success': False,
                 'error': 'File not found'
             }), 404
         
-        # Check if file exists
-        file_path = os.path.join(directory, filename)
-        if not os.path.exists(file_path):
-            return jsonify({
-                'success': False,
-                'error': 'File not found'
-            }), 404
-        
-        return send_from_directory(directory, filename)
+        return send_upload(f'{directory}/{filename}')
         
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -229,8 +377,9 @@ def serve_file(filename):
 def serve_avatar(filename):
     """Serve avatar files"""
     try:
-        directory = os.path.join(current_app.config['UPLOAD_FOLDER'], 'avatars')
-        return send_from_directory(directory, filename)
+        return send_upload(f'avatars/{filename}')
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
@@ -241,8 +390,93 @@ def serve_avatar(filename):
 def serve_product_image(filename):
     """Serve product image files"""
     try:
-        directory = os.path.join(current_app.config['UPLOAD_FOLDER'], 'products')
-        return send_from_directory(directory, filename)
+        return send_upload(f'products/{filename}')
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Output formats of the transform endpoint: format -> (file extension, MIME type)
+TRANSFORM_FORMATS = {
+    'webp': ('webp', 'image/webp'),
+    'jpeg': ('jpg', 'image/jpeg'),
+    'png': ('png', 'image/png'),
+}
+
+@uploads_bp.route('/img/<image_hash>', methods=['GET'])
+def transform_image(image_hash):
+    """Serve a stored image resized to ?w= and/or ?h=, as ?fmt=webp|jpeg|png"""
+    try:
+        if not valid_hash(image_hash):
+            return jsonify({
+                'success': False,
+                'error': 'File not found'
+            }), 404
+        
+        max_size = current_app.config['IMAGE_TRANSFORM_MAX_SIZE']
+        width = request.args.get('w', type=int)
+        height = request.args.get('h', type=int)
+        if not width and not height:
+            return jsonify({
+                'success': False,
+                'error': 'w or h is required'
+            }), 400
+        if any(value is not None and not 1 <= value <= max_size for value in (width, height)):
+            return jsonify({
+                'success': False,
+                'error': f'w and h must be between 1 and {max_size}'
+            }), 400
+        
+        format_type = request.args.get('fmt')
+        if format_type == 'jpg':
+            format_type = 'jpeg'
+        if format_type is None:
+            # Without fmt, pick WebP for browsers that take it
+            format_type = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+        if format_type not in TRANSFORM_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"fmt must be one of: {', '.join(TRANSFORM_FORMATS)}"
+            }), 400
+        
+        extension = TRANSFORM_FORMATS[format_type][0]
+        name = f"{image_hash}-{width or ''}x{height or ''}.{extension}"
+        
+        def render():
+            original = image_store.original(image_hash)
+            if original is None:
+                raise FileNotFoundError(image_hash)
+            return image_processing_service.transform(original, width, height, format_type)
+        
+        for retry in (True, False):
+            try:
+                path, error = image_task(image_cache.get_or_render, name, render)
+            except FileNotFoundError:
+                return jsonify({
+                    'success': False,
+                    'error': 'File not found'
+                }), 404
+            if error:
+                return error
+            
+            try:
+                # Same hash and parameters always give the same bytes
+                response = file_serving_service.send(path, immutable=True, etag=name)
+                break
+            except FileNotFoundError:
+                # Evicted (by another request or worker) after the cache
+                # returned it; the next get_or_render renders it again
+                if not retry:
+                    raise
+        if 'fmt' not in request.args:
+            response.vary.add('Accept')
+        return response
+        
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({
             'success': False,
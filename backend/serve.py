@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Production server for SmartBiz360 Backend API with WebSocket support
+
+Runs the app under Flask-SocketIO's own server for WEBSOCKET_ASYNC_MODE.
+With eventlet the process is monkey-patched before the app is imported, so
+every websocket connection is a green thread on one event loop and a single
+process can hold thousands of dashboards.
+
+Everything in that process shares one thread, and CPU-bound requests
+(report rendering, XLSX/CSV/Arrow encoding, bulk import COPY) would stall
+every connection, so it is meant for /socket.io/ alone: the API itself is
+served by Gunicorn workers in threading mode, with a message bus between
+the two (WEBSOCKET_MESSAGE_QUEUE).
+
+Usage:
+    WEBSOCKET_ASYNC_MODE=eventlet python serve.py
+    WEBSOCKET_ASYNC_MODE=eventlet PORT=8000 python serve.py
+"""
+
+import os
+import sys
+
+# Worker processes spawned by the app re-import this file as __mp_main__;
+# only the server process runs it
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+
+    # Load environment variables
+    load_dotenv()
+
+    # Add current directory to Python path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from utils.green import monkey_patch
+
+    # Must happen before anything imports socket, threading or ssl
+    monkey_patch(os.getenv('WEBSOCKET_ASYNC_MODE', 'threading'))
+
+    from app import app, socketio
+    from websocket_server import start_background_tasks
+
+    port = int(os.getenv('PORT', 5000))
+    print(f"Starting SmartBiz360 Backend API on port {port} ({app.config['WEBSOCKET_ASYNC_MODE']} mode)")
+
+    options = {}
+    if app.config['WEBSOCKET_ASYNC_MODE'] == 'threading':
+        # One OS thread per connection; use eventlet for many clients
+        options['allow_unsafe_werkzeug'] = True
+    elif app.config['WEBSOCKET_ASYNC_MODE'] == 'eventlet':
+        # eventlet.wsgi serves 1024 connections at a time unless told otherwise
+        options['max_size'] = app.config['WEBSOCKET_MAX_CONNECTIONS']
+
+    start_background_tasks()
+    socketio.run(app, host='0.0.0.0', port=port, debug=False, use_reloader=False, log_output=False, **options)
@@ -0,0 +1,314 @@
+"""
+Bulk import service
+
+Imports CSV files set-based instead of row by row:
+1. rows are parsed from the upload and streamed into a temporary staging table
+   with COPY FROM STDIN
+2. each staged row is validated in SQL (required fields, lengths, numbers,
+   duplicates within the file and, unless upserting, rows that already exist)
+   and the first problem is recorded on the row
+3. valid rows are written with a single INSERT ... ON CONFLICT on the unique
+   key (email for customers, SKU for products)
+
+Per-row errors stay in the staging table for the caller to store. Rows are
+imported in batches on the caller's session; services/import_jobs.py feeds
+batches from a spooled file and commits each one with its checkpoint.
+"""
+from collections import namedtuple
+from psycopg2 import extensions
+from sqlalchemy import Integer, Numeric, String, text
+from models import db, Customer, Product
+from services.sales_rollup import sales_rollup_service
+import csv
+import io
+
+# A CSV column and the model column it fills; default is used when it is empty
+ImportColumn = namedtuple('ImportColumn', ['header', 'name', 'required', 'default'])
+
+ImportResult = namedtuple('ImportResult', ['rows', 'imported', 'updated', 'error_count'])
+
+class BulkImportError(ValueError):
+    """Raised when a file cannot be imported at all"""
+
+class ImportDataset:
+    def __init__(self, model, key: str, columns, insert_defaults: dict = None):
+        self.model = model
+        self.table = model.__table__
+        self.key = key
+        self.columns = columns
+        # SQL expressions for model columns that are only set on insert
+        self.insert_defaults = {
+            'created_at': "now() AT TIME ZONE 'utc'",
+            'updated_at': "now() AT TIME ZONE 'utc'",
+            **(insert_defaults or {})
+        }
+
+    @property
+    def key_column(self) -> ImportColumn:
+        return next(column for column in self.columns if column.name == self.key)
+
+    @property
+    def required_headers(self):
+        return [column.header for column in self.columns if column.required]
+
+class _CopyStream:
+    """
+    File-like object that feeds rows to COPY as CSV text, one read() at a time
+    """
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.pending) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(row)
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+
+        if size < 0:
+            size = len(self.pending)
+        chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+class BulkImportService:
+    STAGING_TABLE = 'import_staging'
+    MODES = ('insert', 'upsert')
+
+    DATASETS = {
+        'customers': ImportDataset(Customer, 'email', [
+            ImportColumn('Name', 'name', True, None),
+            ImportColumn('Email', 'email', True, None),
+            ImportColumn('Company', 'company', False, ''),
+            ImportColumn('Phone', 'phone', False, ''),
+            ImportColumn('Status', 'status', False, 'Active'),
+            ImportColumn('Address', 'address', False, ''),
+        ], insert_defaults={'join_date': "CAST(now() AT TIME ZONE 'utc' AS date)"}),
+        'products': ImportDataset(Product, 'sku', [
+            ImportColumn('Name', 'name', True, None),
+            ImportColumn('SKU', 'sku', True, None),
+            ImportColumn('Category', 'category', True, None),
+            ImportColumn('Price', 'price', True, None),
+            ImportColumn('Stock', 'stock', False, 0),
+            ImportColumn('Status', 'status', False, 'In Stock'),
+            ImportColumn('Description', 'description', False, ''),
+        ]),
+    }
+
+    def dataset(self, name: str) -> ImportDataset:
+        return self.DATASETS[name]
+
+    def read_header(self, dataset: ImportDataset, header) -> list:
+        """
+        Check a CSV header row and return the position of each dataset column
+
+        Columns missing from the file get None.
+        """
+        if not header:
+            raise BulkImportError('No data found in file')
+
+        header = [name.strip() for name in header]
+        missing = [name for name in dataset.required_headers if name not in header]
+        if missing:
+            raise BulkImportError(f'Missing required columns: {", ".join(missing)}')
+
+        return [header.index(column.header) if column.header in header else None for column in dataset.columns]
+
+    def stage(self, dataset: ImportDataset, rows) -> int:
+        """
+        COPY (line number, values...) rows into a fresh staging table
+
+        Returns the number of rows staged. The staging table is dropped when
+        the transaction ends.
+        """
+        columns = ', '.join(f'{column.name} text' for column in dataset.columns)
+        db.session.execute(text(f"DROP TABLE IF EXISTS {self.STAGING_TABLE}"))
+        db.session.execute(text(f"""
+            CREATE TEMPORARY TABLE {self.STAGING_TABLE} (
+                line_no integer PRIMARY KEY,
+                {columns},
+                error text
+            ) ON COMMIT DROP
+        """))
+
+        column_list = ', '.join(['line_no'] + [column.name for column in dataset.columns])
+        cursor = db.session.connection().connection.cursor()
+        # psycopg2 refuses COPY while a green wait callback is installed
+        # (eventlet websocket mode); lifting it for the COPY blocks the
+        # event loop until the batch is copied, which is why imports belong on
+        # the Gunicorn workers rather than serve.py
+        wait_callback = extensions.get_wait_callback()
+        extensions.set_wait_callback(None)
+        try:
+            cursor.copy_expert(
+                f"COPY {self.STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+                _CopyStream(rows)
+            )
+            return cursor.rowcount
+        finally:
+            extensions.set_wait_callback(wait_callback)
+            cursor.close()
+
+    def _check(self, dataset: ImportDataset, column: ImportColumn) -> list:
+        """
+        (condition, message) pairs that reject a staged value of column
+        """
+        value = column.name
+        checks = []
+        if column.required:
+            checks.append((f"COALESCE(btrim({value}), '') = ''", f"'{column.header} is required'"))
+
+        column_type = dataset.table.c[column.name].type
+        present = f"COALESCE(btrim({value}), '') <> ''"
+        if isinstance(column_type, Numeric):
+            limit = 10 ** ((column_type.precision or 18) - (column_type.scale or 0))
+            checks.append((
+                # CASE makes sure the value is only cast once it looks like a number
+                f"{present} AND CASE WHEN btrim({value}) ~ '^[+-]?([0-9]+[.]?[0-9]*|[.][0-9]+)$'"
+                f" THEN abs(CAST(btrim({value}) AS numeric)) >= {limit} ELSE true END",
+                f"'{column.header} must be a number below {limit}, got ' || {value}"
+            ))
+        elif isinstance(column_type, Integer):
+            checks.append((
+                f"{present} AND CASE WHEN btrim({value}) ~ '^[+-]?[0-9]{{1,10}}$'"
+                f" THEN abs(CAST(btrim({value}) AS bigint)) > 2147483647 ELSE true END",
+                f"'{column.header} must be a whole number, got ' || {value}"
+            ))
+        elif isinstance(column_type, String) and column_type.length:
+            checks.append((
+                f"char_length({value}) > {column_type.length}",
+                f"'{column.header} is longer than {column_type.length} characters'"
+            ))
+        return checks
+
+    def validate(self, dataset: ImportDataset, mode: str):
+        """
+        Record the first problem with each staged row in its error column
+        """
+        checks = [check for column in dataset.columns for check in self._check(dataset, column)]
+        cases = '\n'.join(f"WHEN {condition} THEN {message}" for condition, message in checks)
+        db.session.execute(text(f"""
+            UPDATE {self.STAGING_TABLE}
+            SET error = CASE {cases} END
+        """))
+
+        key = dataset.key_column
+        # Only the first row with a given key is imported
+        db.session.execute(text(f"""
+            UPDATE {self.STAGING_TABLE} s
+            SET error = '{key.header} ' || s.{key.name} || ' appears more than once in the file'
+            FROM (
+                SELECT line_no, row_number() OVER (PARTITION BY {key.name} ORDER BY line_no) AS occurrence
+                FROM {self.STAGING_TABLE}
+                WHERE error IS NULL
+            ) d
+            WHERE d.line_no = s.line_no AND d.occurrence > 1
+        """))
+
+        if mode == 'insert':
+            db.session.execute(text(f"""
+                UPDATE {self.STAGING_TABLE} s
+                SET error = '{key.header} ' || s.{key.name} || ' already exists'
+                FROM {dataset.table.name} t
+                WHERE t.{key.name} = s.{key.name} AND s.error IS NULL
+            """))
+
+    def _value(self, dataset: ImportDataset, column: ImportColumn) -> str:
+        """
+        SQL expression converting a staged text value to the model column
+        """
+        column_type = dataset.table.c[column.name].type
+        if isinstance(column_type, Numeric):
+            value = f"CAST(NULLIF(btrim({column.name}), '') AS numeric)"
+        elif isinstance(column_type, Integer):
+            value = f"CAST(NULLIF(btrim({column.name}), '') AS integer)"
+        else:
+            value = f"NULLIF({column.name}, '')"
+
+        if column.default is not None:
+            default = f"'{column.default}'" if isinstance(column.default, str) else str(column.default)
+            value = f"COALESCE({value}, {default})"
+        return value
+
+    def merge(self, dataset: ImportDataset, mode: str, present_columns) -> tuple:
+        """
+        Insert (and with mode='upsert', update) every valid staged row at once
+
+        Upserts only overwrite the columns present in the file. Returns
+        (inserted, updated).
+        """
+        names = [column.name for column in dataset.columns] + list(dataset.insert_defaults)
+        values = [self._value(dataset, column) for column in dataset.columns] + list(dataset.insert_defaults.values())
+
+        if mode == 'upsert':
+            assignments = [
+                f"{column.name} = EXCLUDED.{column.name}"
+                for column in dataset.columns
+                if column.name in present_columns and column.name != dataset.key
+            ] + ["updated_at = EXCLUDED.updated_at"]
+            on_conflict = f"DO UPDATE SET {', '.join(assignments)}"
+        else:
+            on_conflict = "DO NOTHING"
+
+        rows = db.session.execute(text(f"""
+            INSERT INTO {dataset.table.name} (id, {', '.join(names)})
+            SELECT gen_random_uuid(), {', '.join(values)}
+            FROM {self.STAGING_TABLE}
+            WHERE error IS NULL
+            ORDER BY line_no
+            ON CONFLICT ({dataset.key}) {on_conflict}
+            RETURNING (xmax = 0) AS inserted
+        """)).all()
+
+        inserted = sum(1 for row in rows if row.inserted)
+        return inserted, len(rows) - inserted
+
+    def error_count(self) -> int:
+        """
+        Number of rejected staged rows; their line_no and error stay in the
+        staging table until the transaction ends
+        """
+        return db.session.execute(text(f"""
+            SELECT COUNT(*) FROM {self.STAGING_TABLE} WHERE error IS NOT NULL
+        """)).scalar()
+
+    def import_rows(self, name: str, rows, positions, mode: str = 'insert', start_line: int = 1) -> ImportResult:
+        """
+        Stage, validate and merge rows (lists of CSV values) into a dataset
+
+        ``positions`` comes from read_header(); line numbers count data rows
+        from start_line. The caller commits.
+        """
+        if mode not in self.MODES:
+            raise BulkImportError(f"Invalid mode. Use {' or '.join(self.MODES)}")
+
+        dataset = self.dataset(name)
+
+        def staged_rows():
+            for line_no, row in enumerate(rows, start_line):
+                yield [line_no] + [
+                    row[position] if position is not None and position < len(row) else None
+                    for position in positions
+                ]
+
+        staged = self.stage(dataset, staged_rows())
+        if not staged:
+            return ImportResult(0, 0, 0, 0)
+
+        self.validate(dataset, mode)
+        present_columns = {column.name for column, position in zip(dataset.columns, positions) if position is not None}
+        inserted, updated = self.merge(dataset, mode, present_columns)
+
+        if dataset.model is Customer and inserted:
+            sales_rollup_service.apply_customers(count=inserted)
+
+        return ImportResult(staged, inserted, updated, self.error_count())
+
+# Global bulk import service instance
+bulk_import_service = BulkImportService()
@@ -0,0 +1,262 @@
+"""
+Columnar export sink
+
+Exports datasets as Parquet or an Arrow IPC stream for dataframe tools. Rows
+are fetched from a server-side cursor and converted into Arrow record batches
+of BATCH_SIZE rows; each batch is written (one Parquet row group per batch)
+and the encoded bytes are streamed to the client before the next one is read.
+
+Column types come from the model columns, so decimals stay decimals with
+their precision and scale, UUIDs use the arrow.uuid extension type (the UUID
+logical type in Parquet), dates are date32 and timestamps are microsecond UTC.
+"""
+from collections import namedtuple
+from flask import Response, stream_with_context
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, Numeric, func, select
+from sqlalchemy.dialects.postgresql import UUID
+from models import db, Customer, CustomerStats, Product, Order, OrderItem, Expense
+from services.delta_export import delta_export_service
+from services.exports import apply_key_range
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# A dataset's columns in export order, the tables joined onto its base table
+# and the timestamp column delta exports page through (with the id column)
+ColumnarDataset = namedtuple('ColumnarDataset', ['columns', 'joins', 'since_column'])
+
+ColumnarFormat = namedtuple('ColumnarFormat', ['extension', 'mimetype'])
+
+class ColumnarExportError(ValueError):
+    """Raised for an export request that cannot be served"""
+
+class _ChunkBuffer:
+    """
+    Write-only file object whose contents are taken out as chunks to send
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class ColumnarExportService:
+    # Rows per record batch (and per Parquet row group)
+    BATCH_SIZE = 20000
+    PARQUET_COMPRESSION = 'zstd'
+
+    FORMATS = {
+        'parquet': ColumnarFormat('parquet', 'application/vnd.apache.parquet'),
+        'arrow': ColumnarFormat('arrows', 'application/vnd.apache.arrow.stream'),
+    }
+
+    DATASETS = {
+        'orders': ColumnarDataset({
+            'id': Order.id,
+            'order_number': Order.order_number,
+            'customer_id': Order.customer_id,
+            'customer_name': Customer.name,
+            'customer_email': Customer.email,
+            'total': Order.total,
+            'status': Order.status,
+            'order_date': Order.order_date,
+            'payment_method': Order.payment_method,
+            'shipping_address': Order.shipping_address,
+            'notes': Order.notes,
+            'created_at': Order.created_at,
+            'updated_at': Order.updated_at,
+        }, [(Customer, Customer.id == Order.customer_id)], Order.updated_at),
+        'order_items': ColumnarDataset({
+            'id': OrderItem.id,
+            'order_id': OrderItem.order_id,
+            'order_number': Order.order_number,
+            'order_date': Order.order_date,
+            'product_id': OrderItem.product_id,
+            'sku': Product.sku,
+            'product_name': Product.name,
+            'quantity': OrderItem.quantity,
+            'unit_price': OrderItem.unit_price,
+            'subtotal': OrderItem.subtotal,
+            'order_updated_at': Order.updated_at,
+        }, [
+            (Order, Order.id == OrderItem.order_id),
+            (Product, Product.id == OrderItem.product_id)
+        ], Order.updated_at),
+        'customers': ColumnarDataset({
+            'id': Customer.id,
+            'name': Customer.name,
+            'email': Customer.email,
+            'company': Customer.company,
+            'phone': Customer.phone,
+            'status': Customer.status,
+            'join_date': Customer.join_date,
+            'address': Customer.address,
+            'total_orders': func.coalesce(CustomerStats.order_count, 0),
+            'total_spent': func.coalesce(CustomerStats.lifetime_spend, 0),
+            'created_at': Customer.created_at,
+            'updated_at': Customer.updated_at,
+        }, [(CustomerStats, CustomerStats.customer_id == Customer.id)],
+            func.greatest(Customer.updated_at, CustomerStats.updated_at)),
+        'products': ColumnarDataset({
+            'id': Product.id,
+            'name': Product.name,
+            'sku': Product.sku,
+            'category': Product.category,
+            'price': Product.price,
+            'stock': Product.stock,
+            'status': Product.status,
+            'image': Product.image,
+            'description': Product.description,
+            'created_at': Product.created_at,
+            'updated_at': Product.updated_at,
+        }, [], Product.updated_at),
+        'expenses': ColumnarDataset({
+            'id': Expense.id,
+            'description': Expense.description,
+            'category': Expense.category,
+            'amount': Expense.amount,
+            'date': Expense.date,
+            'vendor': Expense.vendor,
+            'created_at': Expense.created_at,
+        }, [], Expense.created_at),
+    }
+
+    def arrow_type(self, column_type):
+        """
+        Arrow type for a SQLAlchemy column type
+        """
+        if isinstance(column_type, UUID):
+            return pa.uuid()
+        if isinstance(column_type, Numeric) and not isinstance(column_type, Float):
+            return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+        if isinstance(column_type, Float):
+            return pa.float64()
+        if isinstance(column_type, BigInteger):
+            return pa.int64()
+        if isinstance(column_type, Integer):
+            return pa.int32()
+        if isinstance(column_type, Boolean):
+            return pa.bool_()
+        if isinstance(column_type, DateTime):
+            # Stored as naive UTC
+            return pa.timestamp('us', tz='UTC')
+        if isinstance(column_type, Date):
+            return pa.date32()
+        return pa.string()
+
+    def delta_columns(self, name: str):
+        dataset = self.DATASETS[name]
+        return dataset.since_column, dataset.columns['id']
+
+    def delta_joins(self, name: str):
+        return self.DATASETS[name].joins
+
+    def query(self, name: str, columns=None, window=None, key_range=None):
+        """
+        Build the select for a dataset, projected to columns (all by default)
+        and limited to a delta window or key range
+
+        Returns (statement, Arrow schema).
+        """
+        dataset = self.DATASETS[name]
+        if columns:
+            unknown = [column for column in columns if column not in dataset.columns]
+            if unknown:
+                raise ColumnarExportError(
+                    f'Unknown columns: {", ".join(unknown)}. Available: {", ".join(dataset.columns)}'
+                )
+        else:
+            columns = list(dataset.columns)
+
+        expressions = [dataset.columns[column] for column in columns]
+        schema = pa.schema([pa.field(column, self.arrow_type(expression.type))
+                            for column, expression in zip(columns, expressions)])
+
+        base = next(iter(dataset.columns.values())).table
+        stmt = select(*[expression.label(column) for column, expression in zip(columns, expressions)]).select_from(base)
+        for table, onclause in dataset.joins:
+            stmt = stmt.outerjoin(table, onclause)
+        stmt = delta_export_service.apply(stmt, window, *self.delta_columns(name))
+        stmt = apply_key_range(stmt, dataset.columns['id'], key_range)
+        return stmt, schema
+
+    def _array(self, values, field):
+        if field.type == pa.uuid():
+            storage = pa.array([value.bytes if value is not None else None for value in values], pa.binary(16))
+            return pa.ExtensionArray.from_storage(field.type, storage)
+        return pa.array(values, field.type)
+
+    def record_batches(self, stmt, schema):
+        """
+        Yield the rows of stmt as record batches, read from a server-side cursor
+        """
+        result = db.session.execute(stmt.execution_options(yield_per=self.BATCH_SIZE))
+        for rows in result.partitions():
+            columns = list(zip(*rows))
+            yield pa.RecordBatch.from_arrays(
+                [self._array(values, field) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+
+    def iter_chunks(self, batches, schema, format_type: str):
+        """
+        Encode record batches as Parquet or an Arrow IPC stream, yielding the
+        bytes written for each batch
+        """
+        buffer = _ChunkBuffer()
+        if format_type == 'parquet':
+            writer = pq.ParquetWriter(buffer, schema, compression=self.PARQUET_COMPRESSION)
+        else:
+            writer = pa.ipc.new_stream(buffer, schema)
+
+        with writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                chunk = buffer.drain()
+                if chunk:
+                    yield chunk
+        # Footer (Parquet) or end-of-stream marker (Arrow)
+        yield buffer.drain()
+
+    def send(self, stmt, schema, format_type: str, download_name: str):
+        """
+        Build a Flask response that streams the export to the client
+        """
+        def generate():
+            try:
+                yield from self.iter_chunks(self.record_batches(stmt, schema), schema, format_type)
+            except Exception:
+                # Headers are already sent, so the client just sees a truncated file
+                logger.exception(f"Columnar export {download_name} failed mid-stream")
+                raise
+
+        export_format = self.FORMATS[format_type]
+        response = Response(stream_with_context(generate()), mimetype=export_format.mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename={download_name}.{export_format.extension}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+# Global columnar export service instance
+columnar_export_service = ColumnarExportService()
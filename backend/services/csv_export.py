@@ -0,0 +1,66 @@
+"""
+CSV export sink
+
+Streams CSV downloads instead of building them in memory. Rows are encoded in
+small chunks as they come off a generator or server-side cursor and handed to
+a Flask streaming response, so memory use stays flat whatever the row count and
+the header reaches the client before the query has returned its first row.
+"""
+from flask import Response, stream_with_context
+from typing import Iterable, Sequence
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CsvSink:
+    # Bytes of encoded CSV buffered before a chunk is sent
+    CHUNK_SIZE = 64 * 1024
+
+    def iter_chunks(self, rows: Iterable[Sequence], header: Sequence = None):
+        """
+        Yield the CSV for header and rows as UTF-8 encoded chunks
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if header:
+            writer.writerow(header)
+            # Send the header right away so the download starts immediately
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+        for row in rows:
+            writer.writerow(row)
+            if buffer.tell() >= self.CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def send(self, rows: Iterable[Sequence], download_name: str, header: Sequence = None):
+        """
+        Build a Flask response that streams the CSV to the client
+
+        The request context (and with it the database session feeding rows)
+        stays open until the last chunk has been sent.
+        """
+        def generate():
+            try:
+                yield from self.iter_chunks(rows, header)
+            except Exception:
+                # Headers are already sent, so the client just sees a cut-off file
+                logger.exception(f"CSV export {download_name} failed mid-stream")
+                raise
+
+        response = Response(stream_with_context(generate()), mimetype='text/csv')
+        response.headers['Content-Disposition'] = f'attachment; filename={download_name}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+# Global CSV sink instance
+csv_sink = CsvSink()
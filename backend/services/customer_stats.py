@@ -0,0 +1,163 @@
+"""
+Customer stats service
+
+Keeps the customer_stats projection (order count, lifetime spend, first and
+last order, average order value) in step with orders, so customer pages and
+exports read one row per customer instead of loading every order.
+Counters are additive upserts issued on the caller's session, so they commit
+or roll back together with the order change that caused them. Every change
+sets customer_stats.updated_at, which delta exports combine with
+customers.updated_at, so the customer row itself is never rewritten by an
+order write.
+"""
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from models import db, Order, CustomerStats
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What a single order adds to its customer's stats row
+CustomerOrderContribution = namedtuple(
+    'CustomerOrderContribution', ['order_id', 'customer_id', 'created_at', 'total', 'status']
+)
+
+STATS_SQL = """
+    SELECT customer_id,
+           COUNT(*) AS order_count,
+           COUNT(*) FILTER (WHERE status IS DISTINCT FROM 'Cancelled') AS billable_order_count,
+           COALESCE(SUM(total) FILTER (WHERE status IS DISTINCT FROM 'Cancelled'), 0) AS lifetime_spend,
+           MIN(created_at) AS first_order_at,
+           MAX(created_at) AS last_order_at
+    FROM orders
+    GROUP BY customer_id
+"""
+
+class CustomerStatsService:
+    def order_contribution(self, order) -> CustomerOrderContribution:
+        """
+        Capture what an order currently contributes to its customer's stats
+        """
+        return CustomerOrderContribution(
+            order_id=order.id,
+            customer_id=order.customer_id,
+            created_at=order.created_at or datetime.utcnow(),
+            total=Decimal(str(order.total or 0)),
+            status=order.status
+        )
+
+    def apply_order(self, contribution: CustomerOrderContribution, sign: int = 1):
+        """
+        Add (sign=1) or remove (sign=-1) an order contribution from its customer
+
+        Adding upserts the row and only widens the first/last order dates.
+        Removing only updates an existing row, never going below zero, and
+        recomputes the dates from the customer's other orders; a customer
+        without a row has nothing to remove.
+        """
+        billable = contribution.status != 'Cancelled'
+        values = {
+            'order_count': 1,
+            'billable_order_count': 1 if billable else 0,
+            'lifetime_spend': contribution.total if billable else Decimal('0'),
+        }
+
+        if sign < 0:
+            # Every order of this customer except the one being removed
+            others = select(Order.created_at).where(
+                Order.customer_id == contribution.customer_id,
+                Order.id != contribution.order_id
+            ).subquery()
+            db.session.execute(
+                update(CustomerStats)
+                .where(CustomerStats.customer_id == contribution.customer_id)
+                .values(
+                    **{
+                        column: func.greatest(getattr(CustomerStats, column) - value, 0)
+                        for column, value in values.items()
+                    },
+                    first_order_at=select(func.min(others.c.created_at)).scalar_subquery(),
+                    last_order_at=select(func.max(others.c.created_at)).scalar_subquery(),
+                    updated_at=datetime.utcnow()
+                )
+            )
+            return
+
+        stmt = insert(CustomerStats).values(
+            customer_id=contribution.customer_id,
+            first_order_at=contribution.created_at,
+            last_order_at=contribution.created_at,
+            updated_at=datetime.utcnow(),
+            **values
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CustomerStats.customer_id],
+            set_={
+                **{
+                    column: getattr(CustomerStats, column) + getattr(stmt.excluded, column)
+                    for column in values
+                },
+                'first_order_at': func.least(CustomerStats.first_order_at, stmt.excluded.first_order_at),
+                'last_order_at': func.greatest(CustomerStats.last_order_at, stmt.excluded.last_order_at),
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+
+    def rebuild(self) -> int:
+        """
+        Recompute the customer_stats rows that differ from orders
+
+        Only drifted rows are rewritten, so only those customers are sent again
+        by the next delta export. Customers left without orders get an all-zero
+        row rather than none, which keeps their watermark.
+        Returns the number of rows written.
+        """
+        drifted = [str(customer_id) for customer_id in self.check()]
+        if not drifted:
+            return 0
+
+        ids = bindparam('ids', drifted)
+        db.session.execute(
+            text("DELETE FROM customer_stats WHERE customer_id = ANY(CAST(:ids AS uuid[]))").bindparams(ids)
+        )
+        result = db.session.execute(text(f"""
+            INSERT INTO customer_stats (
+                customer_id, order_count, billable_order_count, lifetime_spend,
+                first_order_at, last_order_at, updated_at
+            )
+            SELECT c.id, COALESCE(stats.order_count, 0), COALESCE(stats.billable_order_count, 0),
+                   COALESCE(stats.lifetime_spend, 0), stats.first_order_at, stats.last_order_at,
+                   now() AT TIME ZONE 'utc'
+            FROM customers c
+            LEFT JOIN ({STATS_SQL}) stats ON stats.customer_id = c.id
+            WHERE c.id = ANY(CAST(:ids AS uuid[]))
+        """).bindparams(ids))
+
+        logger.info(f"Rebuilt customer stats ({result.rowcount} customers)")
+        return result.rowcount
+
+    def check(self) -> list:
+        """
+        Compare customer_stats with orders
+
+        Returns the ids of customers whose stored stats differ from a fresh
+        computation. Customers without orders match a missing or all-zero row.
+        """
+        rows = db.session.execute(text(f"""
+            SELECT COALESCE(s.customer_id, f.customer_id) AS customer_id
+            FROM customer_stats s
+            FULL OUTER JOIN ({STATS_SQL}) f ON f.customer_id = s.customer_id
+            WHERE COALESCE(s.order_count, 0) <> COALESCE(f.order_count, 0)
+               OR COALESCE(s.billable_order_count, 0) <> COALESCE(f.billable_order_count, 0)
+               OR COALESCE(s.lifetime_spend, 0) <> COALESCE(f.lifetime_spend, 0)
+               OR s.first_order_at IS DISTINCT FROM f.first_order_at
+               OR s.last_order_at IS DISTINCT FROM f.last_order_at
+        """)).all()
+        return [row.customer_id for row in rows]
+
+# Global customer stats service instance
+customer_stats_service = CustomerStatsService()
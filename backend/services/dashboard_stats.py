@@ -0,0 +1,148 @@
+"""
+Dashboard statistics service
+
+Computes every current/previous period metric shown on the dashboard with a
+single round trip, using conditional aggregates instead of one query per metric.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func, select, and_, true
+from models import db, Product, Customer, Order, OrderItem
+
+class DashboardStatsService:
+    def resolve_period(self, days_param: str):
+        """
+        Resolve the ``days`` query parameter into (current_start, previous_start, today)
+        """
+        today = datetime.utcnow()
+        if days_param == 'month':
+            # This month
+            current_start = datetime(today.year, today.month, 1)
+            previous_start = datetime(today.year, today.month - 1, 1) if today.month > 1 else datetime(today.year - 1, 12, 1)
+        elif days_param == 'last_month':
+            # Last month
+            if today.month == 1:
+                current_start = datetime(today.year - 1, 12, 1)
+                previous_start = datetime(today.year - 1, 11, 1)
+            else:
+                current_start = datetime(today.year, today.month - 1, 1)
+                previous_start = datetime(today.year, today.month - 2, 1) if today.month > 2 else datetime(today.year - 1, 12, 1)
+        elif days_param == 'year':
+            # This year
+            current_start = datetime(today.year, 1, 1)
+            previous_start = datetime(today.year - 1, 1, 1)
+        else:
+            # Numeric days (7, 30, 90, etc.)
+            try:
+                period_days = int(days_param)
+            except ValueError:
+                period_days = 30
+
+            current_start = today - timedelta(days=period_days)
+            previous_start = today - timedelta(days=period_days * 2)
+
+        return current_start, previous_start, today
+
+    def get_period_metrics(self, current_start: datetime, previous_start: datetime) -> dict:
+        """
+        Get revenue, customer, units sold and pending order metrics for the
+        current and previous period in one SQL statement
+        """
+        in_current = Order.created_at >= current_start
+        in_previous = and_(Order.created_at >= previous_start, Order.created_at < current_start)
+        not_cancelled = Order.status != 'Cancelled'
+        is_pending = Order.status == 'Pending'
+
+        # One pass over orders
+        order_totals = select(
+            func.sum(Order.total).filter(not_cancelled, in_current).label('revenue'),
+            func.sum(Order.total).filter(not_cancelled, in_previous).label('prev_revenue'),
+            func.count(Order.id).filter(is_pending).label('pending_orders'),
+            func.count(Order.id).filter(is_pending, in_previous).label('prev_pending_orders')
+        ).select_from(Order).subquery()
+
+        # One pass over the order items of both periods
+        item_totals = select(
+            func.sum(OrderItem.quantity).filter(in_current).label('products_sold'),
+            func.sum(OrderItem.quantity).filter(in_previous).label('prev_products_sold')
+        ).select_from(OrderItem).join(Order, OrderItem.order_id == Order.id).where(
+            Order.created_at >= previous_start
+        ).subquery()
+
+        # One pass over customers
+        is_active = Customer.status == 'Active'
+        customer_totals = select(
+            func.count(Customer.id).filter(is_active).label('active_customers'),
+            func.count(Customer.id).filter(is_active, Customer.created_at >= current_start).label('new_active_current'),
+            func.count(Customer.id).filter(
+                is_active,
+                Customer.created_at >= previous_start,
+                Customer.created_at < current_start
+            ).label('new_active_prev')
+        ).select_from(Customer).subquery()
+
+        # Each subquery yields exactly one row, so joining them is a cheap cross join
+        row = db.session.execute(
+            select(order_totals, item_totals, customer_totals).select_from(
+                order_totals.join(item_totals, true()).join(customer_totals, true())
+            )
+        ).one()
+
+        return {
+            'total_revenue': row.revenue or Decimal('0.0'),
+            'prev_revenue': row.prev_revenue or Decimal('0.0'),
+            'active_customers': row.active_customers or 0,
+            'new_active_current': row.new_active_current or 0,
+            'new_active_prev': row.new_active_prev or 0,
+            'products_sold': row.products_sold or 0,
+            'prev_products_sold': row.prev_products_sold or 0,
+            'pending_orders': row.pending_orders or 0,
+            'prev_pending_orders': row.prev_pending_orders or 0
+        }
+
+    def get_top_products(self, current_start: datetime, limit: int = 4):
+        """
+        Get the best selling products (by units) since current_start
+        """
+        return db.session.query(
+            Product.name,
+            func.sum(OrderItem.quantity).label('sales'),
+            func.sum(OrderItem.subtotal).label('revenue')
+        ).join(OrderItem).join(Order).filter(
+            Order.created_at >= current_start
+        ).group_by(Product.name).order_by(
+            func.sum(OrderItem.quantity).desc()
+        ).limit(limit).all()
+
+    def get_delivery_time_stats(self) -> dict:
+        """
+        Get delivery time statistics (whole days from creation to completion)
+        for completed orders, computed entirely in the database
+        """
+        days = func.floor(func.extract('epoch', Order.updated_at - Order.created_at) / 86400)
+
+        row = db.session.execute(
+            select(
+                func.count().label('sample_size'),
+                func.avg(days).label('average'),
+                func.percentile_cont(0.5).within_group(days).label('p50'),
+                func.percentile_cont(0.9).within_group(days).label('p90'),
+                func.percentile_cont(0.99).within_group(days).label('p99')
+            ).select_from(Order).where(
+                Order.status == 'Completed',
+                Order.created_at.isnot(None),
+                Order.updated_at.isnot(None),
+                Order.updated_at >= Order.created_at
+            )
+        ).one()
+
+        return {
+            'average_days': float(row.average or 0.0),
+            'p50_days': float(row.p50 or 0.0),
+            'p90_days': float(row.p90 or 0.0),
+            'p99_days': float(row.p99 or 0.0),
+            'sample_size': row.sample_size
+        }
+
+# Global dashboard stats service instance
+dashboard_stats_service = DashboardStatsService()
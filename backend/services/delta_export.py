@@ -0,0 +1,197 @@
+"""
+Delta export service
+
+Lets export consumers sync only what changed. Rows are read in
+(updated_at, id) order, so a position in a table is the (updated_at, id) of the
+last row seen; that position is handed out as an opaque watermark token and
+passed back as since= on the next export.
+
+Rows whose updated_at is within DELTA_EXPORT_LAG seconds of now are left for
+the next export, so a transaction that set updated_at but had not committed
+yet when the export ran is not skipped. Deleted customers, products and
+orders leave a tombstone (export_tombstones) that the deletions feed returns
+with its own watermark; tombstones are kept for
+EXPORT_TOMBSTONE_RETENTION_DAYS, and a since= older than that is refused so
+the consumer knows to run a full export.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import delete, select, tuple_
+from models import db, ExportTombstone
+import base64
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# A position in a dataset: everything at or before (updated_at, id) has been exported
+Watermark = namedtuple('Watermark', ['updated_at', 'id'])
+
+# Rows after `after` (None: from the start) up to and including `upto`;
+# `watermark` is where the next export continues from
+DeltaWindow = namedtuple('DeltaWindow', ['after', 'upto', 'watermark', 'has_more'])
+
+MIN_ID = uuid.UUID(int=0)
+MAX_ID = uuid.UUID(int=2 ** 128 - 1)
+
+class DeltaExportError(ValueError):
+    """Raised for a since= value that cannot be used"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class DeltaExportService:
+    TOKEN_VERSION = 'v1'
+    DATASETS = ('customers', 'products', 'orders')
+    PRUNE_INTERVAL = timedelta(hours=1)
+
+    def __init__(self):
+        self.last_pruned = None
+
+    def encode(self, watermark: Watermark) -> str:
+        """
+        Opaque token for a watermark
+        """
+        raw = f"{self.TOKEN_VERSION}|{watermark.updated_at.isoformat()}|{watermark.id}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode(self, token: str) -> Watermark:
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('ascii')
+            version, updated_at, record_id = raw.split('|')
+            if version != self.TOKEN_VERSION:
+                raise ValueError(version)
+            return Watermark(datetime.fromisoformat(updated_at), uuid.UUID(record_id))
+        except ValueError:
+            raise DeltaExportError('Invalid since. Use an ISO 8601 timestamp or a watermark token')
+
+    def parse_since(self, value: str, dataset: str = None) -> Watermark:
+        """
+        Parse since= as an ISO 8601 timestamp (rows changed at or after it) or
+        a watermark token from a previous export
+
+        For datasets with a deletions feed, a since= older than the tombstone
+        retention is refused with status 410.
+        """
+        try:
+            since = datetime.fromisoformat(value)
+        except ValueError:
+            watermark = self.decode(value)
+        else:
+            if since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            watermark = Watermark(since, MIN_ID)
+
+        if dataset not in self.DATASETS:
+            return watermark
+        oldest = datetime.utcnow() - timedelta(days=current_app.config['EXPORT_TOMBSTONE_RETENTION_DAYS'])
+        if watermark.updated_at < oldest:
+            raise DeltaExportError(
+                'since is older than the deletion history; run a full export to resync', 410
+            )
+        return watermark
+
+    def cutoff(self) -> datetime:
+        """
+        Newest updated_at a delta export may include
+        """
+        return datetime.utcnow() - timedelta(seconds=current_app.config['DELTA_EXPORT_LAG'])
+
+    def window(self, updated_column, id_column, since: Watermark = None, limit: int = None,
+               filters=(), joins=()) -> DeltaWindow:
+        """
+        Work out which rows the export covers before it starts streaming
+
+        With a limit the window ends at the limit-th changed row, found with
+        an index scan, so the watermark can be sent in the response headers.
+        joins are the (table, onclause) outer joins updated_column reads from.
+        """
+        cutoff = Watermark(self.cutoff(), MAX_ID)
+        if limit:
+            key = tuple_(updated_column, id_column)
+            stmt = select(updated_column, id_column).select_from(id_column.table)
+            for table, onclause in joins:
+                stmt = stmt.outerjoin(table, onclause)
+            stmt = stmt.where(key <= tuple_(*cutoff), *filters)
+            if since is not None:
+                stmt = stmt.where(key > tuple_(*since))
+            last = db.session.execute(
+                stmt.order_by(updated_column, id_column).offset(limit - 1).limit(1)
+            ).first()
+            if last is not None:
+                upto = Watermark(*last)
+                return DeltaWindow(since, upto, upto, True)
+
+        return DeltaWindow(since, cutoff, cutoff, False)
+
+    def full_window(self) -> DeltaWindow:
+        """
+        Window for an export of the whole table
+
+        Nothing is filtered; the watermark is taken before the export starts,
+        so rows changed while it runs are sent again by the next delta.
+        """
+        cutoff = Watermark(self.cutoff(), MAX_ID)
+        return DeltaWindow(None, None, cutoff, False)
+
+    def apply(self, stmt, window: DeltaWindow, updated_column, id_column):
+        """
+        Limit stmt to the window's rows, in (updated_at, id) order
+        """
+        if window is None or window.upto is None:
+            return stmt
+
+        key = tuple_(updated_column, id_column)
+        stmt = stmt.where(key <= tuple_(*window.upto))
+        if window.after is not None:
+            stmt = stmt.where(key > tuple_(*window.after))
+        return stmt.order_by(updated_column, id_column)
+
+    def headers(self, response, window: DeltaWindow):
+        """
+        Attach the continuation watermark to an export response
+        """
+        response.headers['X-Export-Watermark'] = self.encode(window.watermark)
+        response.headers['X-Export-Has-More'] = 'true' if window.has_more else 'false'
+        return response
+
+    def record_deletion(self, dataset: str, record_id):
+        """
+        Add a tombstone for a deleted row; it is committed with the delete
+        """
+        now = datetime.utcnow()
+        db.session.add(ExportTombstone(dataset=dataset, record_id=record_id, deleted_at=now))
+        self._prune(now)
+
+    def deletions(self, dataset: str, since: Watermark = None, limit: int = 10000):
+        """
+        Tombstones of a dataset after since, oldest first
+
+        Returns (tombstones, window).
+        """
+        window = self.window(
+            ExportTombstone.deleted_at, ExportTombstone.record_id, since, limit,
+            filters=[ExportTombstone.dataset == dataset]
+        )
+        stmt = self.apply(
+            select(ExportTombstone).where(ExportTombstone.dataset == dataset),
+            window, ExportTombstone.deleted_at, ExportTombstone.record_id
+        ).limit(limit)
+        return db.session.execute(stmt).scalars().all(), window
+
+    def _prune(self, now: datetime):
+        """
+        Delete tombstones past the retention period, at most once per PRUNE_INTERVAL per process
+        """
+        if self.last_pruned and now - self.last_pruned < self.PRUNE_INTERVAL:
+            return
+        self.last_pruned = now
+        oldest = now - timedelta(days=current_app.config['EXPORT_TOMBSTONE_RETENTION_DAYS'])
+        result = db.session.execute(delete(ExportTombstone).where(ExportTombstone.deleted_at < oldest))
+        if result.rowcount:
+            logger.info(f"Pruned {result.rowcount} export tombstones")
+
+# Global delta export service instance
+delta_export_service = DeltaExportService()
@@ -0,0 +1,189 @@
+"""
+Export row sources
+
+Each dataset is a fixed column list plus a generator of row tuples read from a
+server-side cursor (yield_per), so the writers that consume them (CSV, XLSX)
+never hold the whole table in memory. Passing a delta window (see
+services/delta_export.py) limits a dataset to the rows changed inside it, and
+a key range to one shard of a parallel export (services/parallel_export.py).
+"""
+from collections import namedtuple
+from sqlalchemy import func, select
+from models import db, Customer, CustomerStats, Product, Order, OrderItem
+from services.delta_export import delta_export_service
+
+# Rows with lower <= id < upper (None: unbounded), in id order
+KeyRange = namedtuple('KeyRange', ['lower', 'upper'])
+
+def apply_key_range(stmt, id_column, key_range):
+    """
+    Limit stmt to one key range, in id order
+    """
+    if key_range is None:
+        return stmt
+    if key_range.lower is not None:
+        stmt = stmt.where(id_column >= key_range.lower)
+    if key_range.upper is not None:
+        stmt = stmt.where(id_column < key_range.upper)
+    return stmt.order_by(id_column)
+
+def _datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+class ExportService:
+    BATCH_SIZE = 1000
+
+    CUSTOMER_COLUMNS = [
+        'ID', 'Name', 'Email', 'Company', 'Phone', 'Status', 'Join Date',
+        'Address', 'Total Orders', 'Total Spent', 'Created At'
+    ]
+    PRODUCT_COLUMNS = [
+        'ID', 'Name', 'SKU', 'Category', 'Price', 'Stock', 'Status', 'Image',
+        'Description', 'Created At', 'Updated At'
+    ]
+    ORDER_COLUMNS = [
+        'ID', 'Order Number', 'Customer', 'Customer Email', 'Products', 'Total',
+        'Status', 'Order Date', 'Payment Method', 'Shipping Address', 'Notes',
+        'Created At', 'Updated At'
+    ]
+
+    # Columns delta exports page through, per dataset; a customer also changes
+    # when its order totals do
+    DELTA_COLUMNS = {
+        'customers': (func.greatest(Customer.updated_at, CustomerStats.updated_at), Customer.id),
+        'products': (Product.updated_at, Product.id),
+        'orders': (Order.updated_at, Order.id)
+    }
+    # Tables the delta columns are read from besides the dataset's own
+    DELTA_JOINS = {
+        'customers': [(CustomerStats, CustomerStats.customer_id == Customer.id)]
+    }
+
+    def delta_columns(self, name: str):
+        return self.DELTA_COLUMNS[name]
+
+    def delta_joins(self, name: str):
+        return self.DELTA_JOINS.get(name, [])
+
+    def _stream(self, stmt):
+        """
+        Execute stmt on a server-side cursor, fetching BATCH_SIZE rows at a time
+        """
+        return db.session.execute(stmt.execution_options(yield_per=self.BATCH_SIZE))
+
+    def customer_rows(self, window=None, key_range=None):
+        """
+        Yield one export row per customer
+        """
+        stmt = select(
+            Customer.id, Customer.name, Customer.email, Customer.company, Customer.phone,
+            Customer.status, Customer.join_date, Customer.address, Customer.created_at,
+            CustomerStats.order_count, CustomerStats.billable_order_count, CustomerStats.lifetime_spend
+        ).outerjoin(CustomerStats, CustomerStats.customer_id == Customer.id)
+        stmt = delta_export_service.apply(stmt, window, *self.delta_columns('customers'))
+        stmt = apply_key_range(stmt, Customer.id, key_range)
+
+        for row in self._stream(stmt):
+            yield (
+                str(row.id),
+                row.name,
+                row.email,
+                row.company or '',
+                row.phone or '',
+                row.status,
+                _date(row.join_date),
+                row.address or '',
+                row.order_count or 0,
+                float(row.lifetime_spend) if row.billable_order_count else 0,
+                _datetime(row.created_at)
+            )
+
+    def product_rows(self, window=None, key_range=None):
+        """
+        Yield one export row per product
+        """
+        stmt = select(
+            Product.id, Product.name, Product.sku, Product.category, Product.price,
+            Product.stock, Product.status, Product.image, Product.description,
+            Product.created_at, Product.updated_at
+        )
+        stmt = delta_export_service.apply(stmt, window, *self.delta_columns('products'))
+        stmt = apply_key_range(stmt, Product.id, key_range)
+
+        for row in self._stream(stmt):
+            yield (
+                str(row.id),
+                row.name,
+                row.sku,
+                row.category,
+                float(row.price),
+                row.stock,
+                row.status,
+                row.image or '',
+                row.description or '',
+                _datetime(row.created_at),
+                _datetime(row.updated_at)
+            )
+
+    def order_rows(self, window=None, key_range=None):
+        """
+        Yield one export row per order, with its product names joined
+        """
+        products_list = select(
+            func.string_agg(Product.name, ', ')
+        ).select_from(OrderItem).join(Product, Product.id == OrderItem.product_id).where(
+            OrderItem.order_id == Order.id
+        ).scalar_subquery()
+
+        stmt = select(
+            Order.id, Order.order_number, Customer.name.label('customer_name'),
+            Customer.email.label('customer_email'), products_list.label('products'),
+            Order.total, Order.status, Order.order_date, Order.payment_method,
+            Order.shipping_address, Order.notes, Order.created_at, Order.updated_at
+        ).outerjoin(Customer, Customer.id == Order.customer_id)
+        stmt = delta_export_service.apply(stmt, window, *self.delta_columns('orders'))
+        stmt = apply_key_range(stmt, Order.id, key_range)
+
+        for row in self._stream(stmt):
+            yield (
+                str(row.id),
+                row.order_number,
+                row.customer_name or '',
+                row.customer_email or '',
+                row.products or '',
+                float(row.total),
+                row.status,
+                _date(row.order_date),
+                row.payment_method or '',
+                row.shipping_address or '',
+                row.notes or '',
+                _datetime(row.created_at),
+                _datetime(row.updated_at)
+            )
+
+    def _datasets(self):
+        return {
+            'customers': (self.CUSTOMER_COLUMNS, self.customer_rows),
+            'products': (self.PRODUCT_COLUMNS, self.product_rows),
+            'orders': (self.ORDER_COLUMNS, self.order_rows)
+        }
+
+    def columns(self, name: str):
+        """
+        Get the header of a named dataset
+        """
+        return self._datasets()[name][0]
+
+    def dataset(self, name: str, window=None, key_range=None):
+        """
+        Get (columns, rows) for a named dataset, optionally limited to a delta
+        window or key range
+        """
+        columns, rows = self._datasets()[name]
+        return columns, rows(window, key_range)
+
+# Global export service instance
+export_service = ExportService()
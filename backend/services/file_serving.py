@@ -0,0 +1,82 @@
+"""
+File serving for uploads
+
+Uploaded files are written once and never changed: image store files are
+named by content hash and the older avatar/product files by a random name.
+Responses therefore carry long-lived Cache-Control headers. Content-hashed
+files are marked immutable for a year, so browsers do not even revalidate
+them; other uploads get FILE_CACHE_MAX_AGE seconds. Conditional GET
+(ETag / Last-Modified -> 304) and Range requests (206) are supported.
+
+FILE_SERVING_MODE decides who sends the bytes:
+
+- flask: the worker streams the file itself.
+- x-sendfile: Apache (mod_xsendfile) or lighttpd sends it, given the
+  absolute path in an X-Sendfile header.
+- x-accel: nginx sends it from an internal location, given the URI
+  FILE_ACCEL_PREFIX + path relative to UPLOAD_FOLDER in an X-Accel-Redirect
+  header. nginx answers conditional and Range requests itself and keeps the
+  Content-Type and Cache-Control headers set here.
+
+With either offload mode, a Python worker only checks the file exists and
+builds the headers.
+"""
+from flask import Response, send_file
+import mimetypes
+import os
+
+class FileServingService:
+    MODES = ('flask', 'x-sendfile', 'x-accel')
+    IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+    def __init__(self):
+        self.mode = 'flask'
+        self.accel_prefix = None
+        self.max_age = 0
+        self.upload_folder = None
+
+    def init_app(self, app):
+        """
+        Read the serving mode; x-sendfile is switched on through Flask's USE_X_SENDFILE
+        """
+        self.mode = app.config['FILE_SERVING_MODE']
+        if self.mode not in self.MODES:
+            raise ValueError(f"FILE_SERVING_MODE must be one of: {', '.join(self.MODES)}")
+        self.accel_prefix = app.config['FILE_ACCEL_PREFIX'].rstrip('/')
+        self.max_age = app.config['FILE_CACHE_MAX_AGE']
+        self.upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        app.config['USE_X_SENDFILE'] = self.mode == 'x-sendfile'
+
+    def send(self, path: str, immutable: bool = False, etag: str = None) -> Response:
+        """
+        Response for an uploaded file
+
+        immutable marks a content-hashed file that never changes under its
+        name. etag replaces the default ETag (built from mtime and size) with
+        one that is the same on every server, e.g. the content hash.
+        """
+        path = os.path.abspath(path)
+        max_age = self.IMMUTABLE_MAX_AGE if immutable else self.max_age
+
+        if self.mode == 'x-accel':
+            response = Response(mimetype=mimetypes.guess_type(path)[0] or 'application/octet-stream')
+            relative = os.path.relpath(path, self.upload_folder).replace(os.sep, '/')
+            response.headers['X-Accel-Redirect'] = f'{self.accel_prefix}/{relative}'
+            if etag:
+                response.set_etag(etag)
+            if max_age:
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+        else:
+            # send_file handles conditional and Range requests; with
+            # USE_X_SENDFILE it sends only the headers plus X-Sendfile
+            response = send_file(path, conditional=True, etag=etag or True, max_age=max_age or None)
+            if response.status_code == 200:
+                response.accept_ranges = 'bytes'
+
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+# Global file serving service instance
+file_serving_service = FileServingService()
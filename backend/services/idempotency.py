@@ -0,0 +1,150 @@
+"""
+Idempotency key service
+
+Stores the response of a write request under its Idempotency-Key header so a
+client retrying after a timeout gets the original response back instead of
+running the request again. Keys are scoped to the endpoint and the caller and
+expire after IDEMPOTENCY_KEY_TTL seconds.
+
+Bookkeeping runs on its own connection, so claiming a key is committed before
+the route runs and storing the response never mixes with the route's session.
+The one exception is the 'committed' mark: it is written in the route's own
+transaction, so a claim whose writes were committed is never taken over and
+run again, even if the process dies before the response is stored.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import delete, event, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from models import db, IdempotencyKey
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+class IdempotencyService:
+    MAX_KEY_LENGTH = 255
+    # Responses with these statuses are not stored, so a retry runs the request again
+    RETRYABLE_STATUSES = range(500, 600)
+    PRUNE_INTERVAL = timedelta(minutes=5)
+
+    def __init__(self):
+        self.last_pruned = None
+
+    def fingerprint(self, method: str, path: str, body: bytes) -> str:
+        """
+        Hash what makes two requests "the same request"
+        """
+        digest = hashlib.sha256()
+        for part in (method.encode('utf-8'), path.encode('utf-8'), body or b''):
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def claim(self, scope: str, key: str, fingerprint: str, ttl: int, lock_timeout: int):
+        """
+        Try to take ownership of a key
+
+        Returns None when the caller now owns the key and should run the
+        request, otherwise the existing IdempotencyKey row. Expired keys and
+        uncommitted claims older than lock_timeout (a crashed request) are
+        taken over.
+        """
+        now = datetime.utcnow()
+        stmt = insert(IdempotencyKey).values(
+            scope=scope,
+            key=key,
+            fingerprint=fingerprint,
+            status='processing',
+            created_at=now,
+            locked_until=now + timedelta(seconds=lock_timeout),
+            expires_at=now + timedelta(seconds=ttl)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={
+                'fingerprint': stmt.excluded.fingerprint,
+                'status': stmt.excluded.status,
+                'response_status': None,
+                'response_body': None,
+                'response_mimetype': None,
+                'created_at': stmt.excluded.created_at,
+                'locked_until': stmt.excluded.locked_until,
+                'expires_at': stmt.excluded.expires_at
+            },
+            where=or_(
+                IdempotencyKey.expires_at < now,
+                (IdempotencyKey.status == 'processing') & (IdempotencyKey.locked_until < now)
+            )
+        ).returning(IdempotencyKey.key)
+
+        with db.engine.begin() as conn:
+            self._prune(conn, now)
+            if conn.execute(stmt).first() is not None:
+                return None
+            return conn.execute(
+                select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            ).first()
+
+    @contextmanager
+    def track_commit(self, scope: str, key: str):
+        """
+        Mark a claim 'committed' in the same transaction as the route's writes
+        """
+        session = db.session()
+
+        def before_commit(session):
+            session.execute(update(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == 'processing'
+            ).values(status='committed'))
+
+        event.listen(session, 'before_commit', before_commit)
+        try:
+            yield
+        finally:
+            event.remove(session, 'before_commit', before_commit)
+
+    def complete(self, scope: str, key: str, status_code: int, body: bytes, mimetype: str):
+        """
+        Store the response for a claimed key
+        """
+        with db.engine.begin() as conn:
+            conn.execute(update(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key
+            ).values(
+                status='completed',
+                response_status=status_code,
+                response_body=body,
+                response_mimetype=mimetype,
+                locked_until=None
+            ))
+
+    def release(self, scope: str, key: str):
+        """
+        Drop a claim whose request failed, so the client can retry it
+
+        A claim whose writes were committed is kept: running the request again
+        would repeat them.
+        """
+        with db.engine.begin() as conn:
+            conn.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status == 'processing'
+            ))
+
+    def _prune(self, conn, now: datetime):
+        """
+        Delete expired keys, at most once per PRUNE_INTERVAL per process
+        """
+        if self.last_pruned and now - self.last_pruned < self.PRUNE_INTERVAL:
+            return
+        self.last_pruned = now
+        result = conn.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+        if result.rowcount:
+            logger.info(f"Pruned {result.rowcount} expired idempotency keys")
+
+# Global idempotency service instance
+idempotency_service = IdempotencyService()
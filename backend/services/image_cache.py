@@ -0,0 +1,157 @@
+"""
+Transformed image cache
+
+Images rendered by the /img endpoint are kept as files in IMAGE_CACHE_FOLDER,
+named by image hash, size and format. Using a file sets its mtime, so the
+oldest mtime is the least recently used file. When the files written by this
+process push the cache past IMAGE_CACHE_MAX_BYTES, the folder is scanned and
+the least recently used files are removed until it is under LOW_WATER of the
+limit. Other processes sharing the folder are counted at each scan, so the
+bound holds across workers up to what they wrote since their last scan.
+
+Renders are single-flight: when several requests in a process miss on the
+same file, one renders it and the others wait for its result.
+"""
+from concurrent.futures import TimeoutError
+import logging
+import os
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    """
+    A render in progress that other requests can wait for
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.path = None
+        self.error = None
+
+class ImageCache:
+    # Evict down to this fraction of the limit, so evictions are not needed on every write
+    LOW_WATER = 0.9
+
+    def __init__(self):
+        self.folder = None
+        self.max_bytes = 0
+        self.timeout = None
+        self.size = 0
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def init_app(self, app):
+        """
+        Create the cache folder and measure what it holds
+        """
+        self.folder = app.config['IMAGE_CACHE_FOLDER']
+        self.max_bytes = app.config['IMAGE_CACHE_MAX_BYTES']
+        self.timeout = app.config['IMAGE_TIMEOUT']
+        os.makedirs(self.folder, exist_ok=True)
+        self.size = sum(size for _, _, size in self._entries())
+
+    def _entries(self):
+        """
+        (mtime, path, size) of every cached file
+        """
+        entries = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def get(self, name: str):
+        """
+        Path of a cached file, marked as just used, or None
+
+        The file can still be evicted before the caller opens it; a caller
+        that then gets FileNotFoundError asks again and it is rendered anew.
+        """
+        path = os.path.join(self.folder, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name: str, data: bytes) -> str:
+        """
+        Add a file to the cache, evicting the least recently used ones if it is full
+        """
+        path = os.path.join(self.folder, name)
+        fd, temp_path = tempfile.mkstemp(prefix='.render-', dir=self.folder)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        entries = sorted(self._entries())
+        size = sum(entry[2] for entry in entries)
+        target = self.max_bytes * self.LOW_WATER
+        removed = 0
+        for _, path, file_size in entries:
+            if size <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+            removed += 1
+        self.size = size
+        logger.info(f"Evicted {removed} images from the transform cache, {size / 1024 / 1024:.1f} MiB left")
+
+    def get_or_render(self, name: str, render) -> str:
+        """
+        Path of a cached file, calling render() for its bytes on a miss
+
+        Concurrent misses on the same name wait for the first one's render
+        instead of rendering again.
+        """
+        path = self.get(name)
+        if path:
+            return path
+
+        with self.lock:
+            flight = self.flights.get(name)
+            leader = flight is None
+            if leader:
+                flight = self.flights[name] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                raise TimeoutError()
+            if flight.error:
+                raise flight.error
+            return flight.path
+
+        try:
+            # Another request may have finished rendering it since the first check
+            flight.path = self.get(name) or self.put(name, render())
+            return flight.path
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[name]
+            flight.done.set()
+
+# Global image cache instance
+image_cache = ImageCache()
@@ -0,0 +1,215 @@
+"""
+Image processing service
+
+Decoding, resizing and re-encoding uploads is CPU-heavy and holds the GIL for
+long stretches, which stalls every other request thread (including websocket
+pings). Images are therefore processed in a pool of IMAGE_WORKERS worker
+processes. At most IMAGE_QUEUE_DEPTH images wait for a free worker; beyond
+that, resize(), render() and transform() raise ImageQueueFullError right
+away so the route can answer 503 instead of piling up requests.
+IMAGE_WORKERS = 0 processes images in the request thread.
+
+Large JPEGs are decoded in draft mode: libjpeg scales them down by 1/2, 1/4
+or 1/8 while decoding, as long as the result stays at least as big as the
+target size, which saves most of the decode time and memory for photos
+straight from a camera.
+
+render_variants() decodes an upload once and encodes every size the image
+store keeps (see services/image_store.py) in one worker call, so an upload
+takes a single pool slot however many variants it produces.
+transform_image() renders one arbitrary size for the /img endpoint.
+"""
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+import io
+import logging
+import multiprocessing
+import threading
+
+logger = logging.getLogger(__name__)
+
+class ImageProcessingError(ValueError):
+    """Raised for an upload that cannot be processed as an image"""
+
+class ImageQueueFullError(Exception):
+    """Raised when every worker is busy and the queue is full"""
+
+def resize_image(image_data: bytes, max_size=(800, 800), quality: int = 85) -> bytes:
+    """
+    Resize image to fit max_size, keeping its aspect ratio, and encode it as JPEG
+    """
+    try:
+        img = Image.open(io.BytesIO(image_data))
+
+        # Let libjpeg decode at a reduced scale that still covers max_size
+        if img.format == 'JPEG':
+            img.draft('RGB', max_size)
+
+        # Convert to RGB if necessary
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+
+        # Resize while maintaining aspect ratio
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=quality, optimize=True)
+        return output.getvalue()
+    except Exception as e:
+        raise ImageProcessingError(f"Image processing failed: {str(e)}")
+
+def render_variants(image_data: bytes, sizes: dict, formats=('webp', 'jpeg'), quality: int = 85) -> dict:
+    """
+    Resize an image to each of sizes ({name: (width, height)}) and encode
+    every size in every format
+
+    Returns {name: {'width': ..., 'height': ..., format: bytes, ...}}.
+    """
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        largest = max(sizes.values())
+
+        if img.format == 'JPEG':
+            img.draft('RGB', largest)
+
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        variants = {}
+        # Largest first, so each smaller size is resampled from the previous one
+        for name, max_size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+            variant = {'width': img.width, 'height': img.height}
+            for format_type in formats:
+                variant[format_type] = _encode(img, format_type, quality)
+            variants[name] = variant
+        return variants
+    except Exception as e:
+        raise ImageProcessingError(f"Image processing failed: {str(e)}")
+
+def transform_image(image_data: bytes, width: int = None, height: int = None, format_type: str = 'jpeg',
+                    quality: int = 85) -> bytes:
+    """
+    Resize an image to fit width x height (either may be None to follow the
+    aspect ratio; never upscaled) and encode it as format_type
+    """
+    try:
+        img = Image.open(io.BytesIO(image_data))
+        box = (
+            width or max(1, round(height * img.width / img.height)),
+            height or max(1, round(width * img.height / img.width))
+        )
+
+        if img.format == 'JPEG':
+            img.draft('RGB', box)
+
+        # PNG keeps transparency
+        mode = 'RGBA' if format_type == 'png' and img.mode in ('RGBA', 'LA', 'P') else 'RGB'
+        if img.mode != mode:
+            img = img.convert(mode)
+
+        img.thumbnail(box, Image.Resampling.LANCZOS)
+        return _encode(img, format_type, quality)
+    except Exception as e:
+        raise ImageProcessingError(f"Image processing failed: {str(e)}")
+
+def _encode(img, format_type: str, quality: int) -> bytes:
+    output = io.BytesIO()
+    if format_type == 'webp':
+        img.save(output, format='WEBP', quality=quality, method=4)
+    elif format_type == 'png':
+        img.save(output, format='PNG', optimize=True)
+    else:
+        img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+class ImageProcessingService:
+    def __init__(self):
+        self.executor = None
+        self.workers = 0
+        self.timeout = None
+        self.slots = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Read the pool settings; worker processes start on first use
+        """
+        self.workers = app.config['IMAGE_WORKERS']
+        self.timeout = app.config['IMAGE_TIMEOUT']
+        # Images being processed plus images waiting for a worker
+        self.slots = threading.BoundedSemaphore(self.workers + app.config['IMAGE_QUEUE_DEPTH'])
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self.executor
+
+    def _reset_pool(self, broken: ProcessPoolExecutor):
+        with self.lock:
+            if self.executor is broken:
+                self.executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def resize(self, image_data: bytes, max_size=(800, 800)) -> bytes:
+        """
+        Resize an uploaded image in the worker pool and return the JPEG bytes
+        """
+        return self._run(resize_image, image_data, max_size)
+
+    def render(self, image_data: bytes, sizes: dict) -> dict:
+        """
+        Render every variant of an uploaded image in the worker pool (see render_variants)
+        """
+        return self._run(render_variants, image_data, sizes)
+
+    def transform(self, image_data: bytes, width: int, height: int, format_type: str) -> bytes:
+        """
+        Resize and re-encode an image in the worker pool (see transform_image)
+        """
+        return self._run(transform_image, image_data, width, height, format_type)
+
+    def _run(self, fn, *args):
+        """
+        Run fn(*args) in the worker pool and wait for the result
+
+        Raises ImageQueueFullError when the pool is saturated, TimeoutError
+        after IMAGE_TIMEOUT seconds and ImageProcessingError for bad images.
+        """
+        if not self.workers:
+            return fn(*args)
+
+        if not self.slots.acquire(blocking=False):
+            raise ImageQueueFullError('Image processing is busy, please retry shortly')
+
+        pool = self._pool()
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self.slots.release()
+            self._reset_pool(pool)
+            raise ImageProcessingError('Image processing failed: worker crashed')
+        except Exception:
+            self.slots.release()
+            raise
+        # The slot is held until the worker is done, even if the request gives up waiting
+        future.add_done_callback(lambda _: self.slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            logger.error("Image worker pool broke, restarting it")
+            self._reset_pool(pool)
+            raise ImageProcessingError('Image processing failed: worker crashed')
+        except TimeoutError:
+            logger.warning(f"Image processing took longer than {self.timeout}s")
+            raise
+
+# Global image processing service instance
+image_processing_service = ImageProcessingService()
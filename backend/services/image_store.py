@@ -0,0 +1,170 @@
+"""
+Content-addressed image store
+
+Uploaded images are keyed by the SHA-256 of the uploaded bytes. Each image is
+rendered once into every size in VARIANTS, as WebP and as a JPEG fallback,
+and kept in upload storage (services/storage.py) under
+images/{hash[:2]}/{hash}/ as thumb.webp, thumb.jpg, medium.webp, ... with a
+manifest.json holding the pixel sizes. The uploaded file is kept as well
+(original, not served) for rendering other sizes on request. Uploading the
+same file again finds the manifest and returns the stored set without
+touching the image workers.
+
+The manifest is written after every variant, so an image counts as stored
+only once all its files exist. Two concurrent uploads of the same file both
+render it and write the same keys, which is harmless.
+
+Product.image and User.avatar hold the URL of the full JPEG, which older
+clients can keep using; variant_urls() turns such a URL into the URLs of
+every variant.
+"""
+from collections import namedtuple
+from services.file_serving import file_serving_service
+from services.image_processing import image_processing_service
+from services.storage import storage_service
+import hashlib
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes of the stored sizes: list avatars and thumbnails, cards and
+# detail views
+VARIANTS = {
+    'thumb': (128, 128),
+    'medium': (400, 400),
+    'full': (800, 800),
+}
+
+# Image format -> file extension, preferred format first
+FORMATS = {
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+URL_PREFIX = '/api/v1/files/images'
+
+_HASH_PATTERN = re.compile(r'[0-9a-f]{64}')
+_URL_PATTERN = re.compile(r'^' + re.escape(URL_PREFIX) + r'/([0-9a-f]{64})/')
+_NAME_PATTERN = re.compile(r'^(%s)\.(%s)$' % ('|'.join(VARIANTS), '|'.join(FORMATS.values())))
+
+# A stored image: its hash, {variant: {'width', 'height'}} and whether the
+# upload matched an image that was already stored
+StoredImage = namedtuple('StoredImage', ['hash', 'variants', 'deduplicated'])
+
+def valid_hash(value: str) -> bool:
+    return bool(_HASH_PATTERN.fullmatch(value))
+
+def image_url(image_hash: str, variant: str = 'full', extension: str = 'jpg') -> str:
+    return f"{URL_PREFIX}/{image_hash}/{variant}.{extension}"
+
+def variant_urls(url: str):
+    """
+    URLs of every variant of a stored image URL, as
+    {variant: {'webp': url, 'jpeg': url}}
+
+    Returns None for URLs outside the image store (e.g. uploads made before it).
+    """
+    match = _URL_PATTERN.match(url or '')
+    if not match:
+        return None
+    image_hash = match.group(1)
+    return {
+        variant: {format_type: image_url(image_hash, variant, extension)
+                  for format_type, extension in FORMATS.items()}
+        for variant in VARIANTS
+    }
+
+class ImageStore:
+    MANIFEST = 'manifest.json'
+    ORIGINAL = 'original'
+    # Variant files never change under their key
+    CACHE_CONTROL = f'public, max-age={file_serving_service.IMMUTABLE_MAX_AGE}, immutable'
+
+    def key(self, image_hash: str, name: str) -> str:
+        return f'images/{image_hash[:2]}/{image_hash}/{name}'
+
+    def get(self, image_hash: str):
+        """
+        The stored image with this hash, or None
+        """
+        manifest = storage_service.get(self.key(image_hash, self.MANIFEST))
+        if manifest is None:
+            return None
+        return StoredImage(image_hash, json.loads(manifest)['variants'], True)
+
+    def save(self, image_data: bytes) -> StoredImage:
+        """
+        Store an uploaded image and its variants, or find the identical image
+        stored before
+
+        Rendering goes through image_processing_service, so this raises its
+        ImageQueueFullError, TimeoutError and ImageProcessingError.
+        """
+        image_hash = hashlib.sha256(image_data).hexdigest()
+        stored = self.get(image_hash)
+        if stored:
+            return stored
+
+        rendered = image_processing_service.render(image_data, VARIANTS)
+
+        # The upload itself, for rendering other sizes later; it is never served
+        storage_service.put(self.key(image_hash, self.ORIGINAL), image_data, 'application/octet-stream')
+
+        variants = {}
+        for variant, images in rendered.items():
+            for format_type, extension in FORMATS.items():
+                storage_service.put(
+                    self.key(image_hash, f'{variant}.{extension}'), images[format_type],
+                    CONTENT_TYPES[format_type], self.CACHE_CONTROL
+                )
+            variants[variant] = {'width': images['width'], 'height': images['height']}
+        storage_service.put(
+            self.key(image_hash, self.MANIFEST),
+            json.dumps({'hash': image_hash, 'variants': variants}).encode('utf-8'),
+            'application/json'
+        )
+
+        logger.info(f"Stored image {image_hash}")
+        return StoredImage(image_hash, variants, False)
+
+    def delete(self, image_hash: str):
+        """
+        Remove an image and all its variants
+        """
+        storage_service.delete(self.key(image_hash, self.MANIFEST))
+        storage_service.delete(self.key(image_hash, self.ORIGINAL))
+        for variant in VARIANTS:
+            for extension in FORMATS.values():
+                storage_service.delete(self.key(image_hash, f'{variant}.{extension}'))
+
+    def original(self, image_hash: str):
+        """
+        Bytes of the uploaded original, or None if the image is not stored
+
+        Images stored before originals were kept fall back to the full variant.
+        """
+        if not valid_hash(image_hash):
+            return None
+        data = storage_service.get(self.key(image_hash, self.ORIGINAL))
+        if data is None:
+            data = storage_service.get(self.key(image_hash, 'full.jpg'))
+        return data
+
+    def variant_key(self, image_hash: str, name: str):
+        """
+        Storage key of a variant file (e.g. thumb.webp), or None if the name
+        is not one of the variant files
+        """
+        if not valid_hash(image_hash) or not _NAME_PATTERN.match(name):
+            return None
+        return self.key(image_hash, name)
+
+# Global image store instance
+image_store = ImageStore()
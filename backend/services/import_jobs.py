@@ -0,0 +1,379 @@
+"""
+Import job service
+
+CSV imports run as persistent background jobs instead of inside the request:
+1. the upload is spooled to IMPORT_SPOOL_FOLDER while it is hashed
+2. an import_jobs row is created, unique per (dataset, mode, file hash), so
+   submitting the same file again returns the existing job
+3. a worker claims the job with a lease and imports IMPORT_BATCH_SIZE rows at
+   a time through bulk_import_service; each batch commits together with its
+   row errors and the job's checkpoint (byte offset and counters)
+
+A job whose worker died (expired lease) is picked up again on startup, when
+it is polled or when its file is submitted again, and continues from the last
+committed byte offset, so no row is imported twice or skipped.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from sqlalchemy import or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from models import db, ImportJob
+from services.bulk_import import bulk_import_service, BulkImportError
+import csv
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class _OffsetLines:
+    """
+    Decoded lines of a binary file, tracking the byte offset of what was read
+
+    csv.reader pulls lines only as it needs them, so after it returns a row
+    ``offset`` is exactly the end of that row in the file.
+    """
+
+    def __init__(self, file, offset: int = 0):
+        file.seek(offset)
+        self.file = file
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self.file:
+            start = self.offset
+            self.offset += len(line)
+            if start == 0 and line.startswith(b'\xef\xbb\xbf'):
+                line = line[3:]
+            yield line.decode('utf-8')
+
+class ImportJobService:
+    LEASE = timedelta(minutes=2)
+    SPOOL_CHUNK_SIZE = 1024 * 1024
+    POLL_INTERVAL = 0.25
+    FINISHED = ('completed', 'failed')
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.spool_folder = None
+        self.batch_size = None
+
+    def init_app(self, app):
+        """
+        Bind the service to the Flask app, start the workers and resume
+        jobs left behind by a previous process
+        """
+        self.app = app
+        self.spool_folder = app.config['IMPORT_SPOOL_FOLDER']
+        self.batch_size = app.config['IMPORT_BATCH_SIZE']
+        os.makedirs(self.spool_folder, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['IMPORT_WORKERS'],
+            thread_name_prefix='import-worker'
+        )
+        self.executor.submit(self.resume_pending)
+
+    def read_header(self, dataset: str, path: str):
+        """
+        Parse the header of a spooled file
+
+        Returns (column positions, byte offset of the first data row).
+        """
+        with open(path, 'rb') as f:
+            lines = _OffsetLines(f)
+            header = next(csv.reader(lines), None)
+            positions = bulk_import_service.read_header(bulk_import_service.dataset(dataset), header)
+            return positions, lines.offset
+
+    def spool(self, source, dataset: str, mode: str):
+        """
+        Copy an upload stream to the spool folder, hashing it on the way
+
+        Returns (path, file hash, size in bytes).
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(dir=self.spool_folder, prefix=f'{dataset}-{mode}-', suffix='.csv')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = source.read(self.SPOOL_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            self._discard(path)
+            raise
+        file_hash = digest.hexdigest()
+        return path, file_hash, size
+
+    def submit(self, dataset: str, mode: str, source, filename: str = None, user_id=None):
+        """
+        Spool an upload and create its import job
+
+        Returns (job, started). A file that was already submitted for the same
+        dataset and mode returns the existing job with started False; a failed
+        one is queued again instead and resumes from its checkpoint.
+        """
+        if dataset not in bulk_import_service.DATASETS:
+            raise BulkImportError(f"Unknown dataset: {dataset}")
+        if mode not in bulk_import_service.MODES:
+            raise BulkImportError(f"Invalid mode. Use {' or '.join(bulk_import_service.MODES)}")
+
+        path, file_hash, size = self.spool(source, dataset, mode)
+        try:
+            self.read_header(dataset, path)
+        except UnicodeDecodeError:
+            self._discard(path)
+            raise BulkImportError('File must be UTF-8 encoded')
+        except BulkImportError:
+            self._discard(path)
+            raise
+
+        stmt = insert(ImportJob).values(
+            id=uuid.uuid4(),
+            dataset=dataset,
+            mode=mode,
+            file_hash=file_hash,
+            filename=filename,
+            path=path,
+            total_bytes=size,
+            status='queued',
+            created_by=user_id,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        ).on_conflict_do_nothing(constraint='uq_import_jobs_file').returning(ImportJob.id)
+        job_id = db.session.execute(stmt).scalar()
+        db.session.commit()
+
+        if job_id is not None:
+            job = db.session.get(ImportJob, job_id)
+        else:
+            job = db.session.execute(select(ImportJob).where(
+                ImportJob.dataset == dataset, ImportJob.mode == mode, ImportJob.file_hash == file_hash
+            )).scalar_one()
+
+            if job.status != 'failed':
+                # Completed, or queued/running from its own copy of the file
+                self._discard(path)
+                if self._stalled(job):
+                    self.executor.submit(self._run, job.id)
+                return job, False
+
+            # Same bytes, so the checkpoint is valid against the new copy
+            previous_path = job.path
+            job.status = 'queued'
+            job.error = None
+            job.finished_at = None
+            job.path = path
+            db.session.commit()
+            if previous_path != path:
+                self._discard(previous_path)
+            logger.info(f"Import job {job.id} queued again from row {job.rows_processed}")
+
+        self.executor.submit(self._run, job.id)
+        return job, True
+
+    def get(self, job_id):
+        """
+        Get a job by id, resuming it if its worker has gone away
+        """
+        job = db.session.get(ImportJob, job_id)
+        if job and self._stalled(job):
+            self.executor.submit(self._run, job.id)
+        return job
+
+    def wait(self, job_id, timeout: float = None) -> ImportJob:
+        """
+        Poll a job until it finishes or timeout seconds pass
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            db.session.expire_all()
+            job = db.session.get(ImportJob, job_id)
+            if job is None or job.status in self.FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(self.POLL_INTERVAL)
+
+    def resume_pending(self):
+        """
+        Queue every job that is waiting or whose worker lease has expired
+        """
+        with self.app.app_context():
+            now = datetime.utcnow()
+            try:
+                job_ids = db.session.execute(select(ImportJob.id).where(or_(
+                    ImportJob.status == 'queued',
+                    (ImportJob.status == 'running') & (ImportJob.lease_expires_at < now)
+                )).order_by(ImportJob.created_at)).scalars().all()
+            except Exception as e:
+                logger.error(f"Failed to look up unfinished import jobs: {str(e)}")
+                return 0
+
+        for job_id in job_ids:
+            logger.info(f"Resuming import job {job_id}")
+            self.executor.submit(self._run, job_id)
+        return len(job_ids)
+
+    def _discard(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _stalled(self, job: ImportJob) -> bool:
+        now = datetime.utcnow()
+        if job.status == 'running':
+            return job.lease_expires_at is not None and job.lease_expires_at < now
+        return job.status == 'queued' and job.created_at is not None and job.created_at < now - self.LEASE
+
+    def _claim(self, job_id, token: str) -> bool:
+        """
+        Take ownership of a queued job or one whose lease expired
+        """
+        now = datetime.utcnow()
+        claimed = db.session.execute(update(ImportJob).where(
+            ImportJob.id == job_id,
+            or_(
+                ImportJob.status == 'queued',
+                (ImportJob.status == 'running') & (ImportJob.lease_expires_at < now)
+            )
+        ).values(
+            status='running',
+            worker_token=token,
+            lease_expires_at=now + self.LEASE,
+            started_at=db.func.coalesce(ImportJob.started_at, now),
+            updated_at=now
+        ).returning(ImportJob.id)).scalar()
+        db.session.commit()
+        return claimed is not None
+
+    def _checkpoint(self, job: ImportJob, token: str, byte_offset: int, result) -> bool:
+        """
+        Store the batch's row errors and advance the job, in the batch's transaction
+
+        Returns False if another worker has taken the job over.
+        """
+        now = datetime.utcnow()
+        advanced = db.session.execute(update(ImportJob).where(
+            ImportJob.id == job.id,
+            ImportJob.worker_token == token
+        ).values(
+            byte_offset=byte_offset,
+            rows_processed=ImportJob.rows_processed + result.rows,
+            imported_count=ImportJob.imported_count + result.imported,
+            updated_count=ImportJob.updated_count + result.updated,
+            error_count=ImportJob.error_count + result.error_count,
+            lease_expires_at=now + self.LEASE,
+            updated_at=now
+        ).returning(ImportJob.id)).scalar()
+        if advanced is None:
+            return False
+
+        if result.error_count:
+            db.session.execute(text(f"""
+                INSERT INTO import_row_errors (job_id, line_no, message)
+                SELECT :job_id, line_no, error
+                FROM {bulk_import_service.STAGING_TABLE}
+                WHERE error IS NOT NULL
+                ORDER BY line_no
+            """), {'job_id': job.id})
+        return True
+
+    def _finish(self, job_id, token: str, status: str, error: str = None):
+        now = datetime.utcnow()
+        db.session.execute(update(ImportJob).where(
+            ImportJob.id == job_id,
+            ImportJob.worker_token == token
+        ).values(
+            status=status,
+            error=error,
+            worker_token=None,
+            lease_expires_at=None,
+            finished_at=now,
+            updated_at=now
+        ))
+        db.session.commit()
+
+    def _run(self, job_id):
+        """
+        Import a job's file from its checkpoint inside the worker pool
+        """
+        with self.app.app_context():
+            token = uuid.uuid4().hex
+            if not self._claim(job_id, token):
+                # Finished, or another worker is on it
+                return
+
+            job = db.session.get(ImportJob, job_id)
+            try:
+                positions, data_start = self.read_header(job.dataset, job.path)
+
+                with open(job.path, 'rb') as f:
+                    lines = _OffsetLines(f, max(job.byte_offset, data_start))
+                    rows = (row for row in csv.reader(lines) if row)
+
+                    while True:
+                        batch = list(islice(rows, self.batch_size))
+                        if not batch:
+                            break
+
+                        result = bulk_import_service.import_rows(
+                            job.dataset, batch, positions, job.mode, start_line=job.rows_processed + 1
+                        )
+                        if not self._checkpoint(job, token, lines.offset, result):
+                            db.session.rollback()
+                            logger.warning(f"Import job {job_id} was taken over by another worker")
+                            return
+                        db.session.commit()
+                        self._notify(job)
+
+                if not job.rows_processed:
+                    raise BulkImportError('No data found in file')
+
+                self._finish(job_id, token, 'completed')
+                self._discard(job.path)
+                logger.info(
+                    f"Import job {job_id} ({job.dataset}) completed: {job.imported_count} imported, "
+                    f"{job.updated_count} updated, {job.error_count} errors"
+                )
+            except Exception as e:
+                db.session.rollback()
+                if isinstance(e, UnicodeDecodeError):
+                    message = f'File must be UTF-8 encoded (after row {job.rows_processed})'
+                else:
+                    message = str(e)
+                self._finish(job_id, token, 'failed', message)
+                logger.error(f"Import job {job_id} failed after row {job.rows_processed}: {message}")
+
+            db.session.refresh(job)
+            self._notify(job)
+
+    def _notify(self, job: ImportJob):
+        try:
+            from websocket_server import notify_import_progress
+            notify_import_progress({
+                'job_id': str(job.id),
+                'dataset': job.dataset,
+                'status': job.status,
+                'rows': job.rows_processed,
+                'imported_count': job.imported_count,
+                'updated_count': job.updated_count,
+                'error_count': job.error_count,
+                'progress': round(job.byte_offset / job.total_bytes * 100, 1) if job.total_bytes else 0,
+                'done': job.status in self.FINISHED
+            })
+        except Exception as e:
+            logger.error(f"Failed to notify import job {job.id}: {str(e)}")
+
+# Global import job service instance
+import_job_service = ImportJobService()
@@ -0,0 +1,138 @@
+"""
+Inventory service
+
+Set-based stock reservation for the order write path. Stock is taken with one
+conditional UPDATE per order (``stock >= quantity`` is checked under the row
+lock), so concurrent orders cannot both pass a stale check and oversell, and
+product statuses are recalculated in the same statement.
+
+Product rows are locked in id order before they are updated, so two orders
+touching the same products cannot deadlock. Callers should reserve or release
+stock before touching the sales rollup and customer stats rows, keeping one
+lock order across every order write.
+"""
+from collections import OrderedDict
+from sqlalchemy import text
+from models import db
+import uuid
+
+class StockError(Exception):
+    """Raised when an order cannot be fulfilled; carries the HTTP status"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class InventoryService:
+    def quantities(self, items) -> OrderedDict:
+        """
+        Total quantity per product for a list of order item dicts
+        """
+        totals = OrderedDict()
+        for item in items:
+            product_id = str(uuid.UUID(str(item['product_id'])))
+            totals[product_id] = totals.get(product_id, 0) + item['quantity']
+        return totals
+
+    def fetch(self, product_ids) -> dict:
+        """
+        Load id, name and stock for many products in one query
+        """
+        rows = db.session.execute(text("""
+            SELECT id, name, stock
+            FROM products
+            WHERE id = ANY(CAST(:ids AS uuid[]))
+        """), {'ids': list(product_ids)}).all()
+        return {str(row.id): row for row in rows}
+
+    def validate(self, items) -> dict:
+        """
+        Check that every product exists and has enough stock right now
+
+        This is an early, unlocked check for a friendly error message; reserve()
+        is what guarantees the stock. Returns the fetched product rows.
+        """
+        quantities = self.quantities(items)
+        products = self.fetch(quantities.keys())
+
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product:
+                raise StockError(f'Product with ID {product_id} not found', 404)
+            if product.stock < quantity:
+                raise StockError(f'Insufficient stock for product {product.name}', 409)
+
+        return products
+
+    def _lock(self, product_ids):
+        """
+        Lock product rows in a fixed (id) order
+        """
+        db.session.execute(text("""
+            SELECT id
+            FROM products
+            WHERE id = ANY(CAST(:ids AS uuid[]))
+            ORDER BY id
+            FOR UPDATE
+        """), {'ids': list(product_ids)})
+
+    def reserve(self, items):
+        """
+        Take stock for order items in one conditional UPDATE
+
+        Raises StockError (409) if any product no longer has enough stock,
+        e.g. a concurrent order took it; the caller must roll back, since
+        other products may already be updated.
+        """
+        quantities = self.quantities(items)
+        if not quantities:
+            return
+
+        self._lock(quantities.keys())
+        result = db.session.execute(text("""
+            UPDATE products p
+            SET stock = p.stock - r.quantity,
+                status = CASE
+                    WHEN p.stock - r.quantity = 0 THEN 'Out of Stock'
+                    WHEN p.stock - r.quantity <= 10 THEN 'Low Stock'
+                    ELSE p.status
+                END,
+                updated_at = now() AT TIME ZONE 'utc'
+            FROM unnest(CAST(:ids AS uuid[]), CAST(:quantities AS integer[])) AS r(id, quantity)
+            WHERE p.id = r.id AND p.stock >= r.quantity
+            RETURNING p.id
+        """), {'ids': list(quantities.keys()), 'quantities': list(quantities.values())})
+
+        reserved = {str(row.id) for row in result}
+        missing = [product_id for product_id in quantities if product_id not in reserved]
+        if missing:
+            products = self.fetch(missing)
+            product = products.get(missing[0])
+            if not product:
+                raise StockError(f'Product with ID {missing[0]} not found', 404)
+            raise StockError(f'Insufficient stock for product {product.name}', 409)
+
+    def release(self, items):
+        """
+        Return stock for order items in one UPDATE
+        """
+        quantities = self.quantities(items)
+        if not quantities:
+            return
+
+        self._lock(quantities.keys())
+        db.session.execute(text("""
+            UPDATE products p
+            SET stock = p.stock + r.quantity,
+                status = CASE
+                    WHEN p.stock + r.quantity > 10 THEN 'In Stock'
+                    WHEN p.stock + r.quantity > 0 THEN 'Low Stock'
+                    ELSE 'Out of Stock'
+                END,
+                updated_at = now() AT TIME ZONE 'utc'
+            FROM unnest(CAST(:ids AS uuid[]), CAST(:quantities AS integer[])) AS r(id, quantity)
+            WHERE p.id = r.id
+        """), {'ids': list(quantities.keys()), 'quantities': list(quantities.values())})
+
+# Global inventory service instance
+inventory_service = InventoryService()
@@ -0,0 +1,290 @@
+"""
+Message bus for websocket fan-out across workers
+
+Socket.IO keeps each client's rooms in the memory of the worker it is
+connected to, so on its own an emit only reaches that worker's clients. With
+a bus the emit is published instead, and every worker, the sender included,
+delivers it to its own clients. Workers also publish their client and room
+counts, so any of them can report them for the whole cluster.
+
+WEBSOCKET_MESSAGE_QUEUE selects the bus:
+- postgres (default): LISTEN/NOTIFY on the app database, no extra service
+- redis://host:port/db: Redis pub/sub (needs `pip install redis`)
+- none: in-process only, for a single worker; scripts set it for themselves
+"""
+import json
+import logging
+import pickle
+import select
+import threading
+import time
+import psycopg2
+import socketio
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+def decode_message(message):
+    """A bus message as a dict, or None if it is not one of ours"""
+    if isinstance(message, dict):
+        return message
+    if isinstance(message, bytes):
+        try:
+            return pickle.loads(message)
+        except Exception:
+            pass
+    try:
+        return json.loads(message)
+    except Exception:
+        return None
+
+class ClusterBus:
+    """
+    What the app needs from a bus on top of Socket.IO's pub/sub managers
+
+    Client and room counts of the other servers: every server announces its
+    own each presence interval, and one that has not been heard from for
+    three intervals is assumed gone. Emits to a single client connected
+    here (replies such as pong) skip the bus.
+    """
+
+    def __init__(self, *args, presence_interval: int = 10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.presence_interval = presence_interval
+        self.peers = {}
+        # Set by the websocket manager: () -> (clients, {room: clients})
+        self.local_counts = lambda: (0, {})
+
+    def initialize(self):
+        super().initialize()
+        if not self.write_only:
+            self.server.start_background_task(self._announce)
+
+    def emit(self, event, data, namespace=None, room=None, skip_sid=None, callback=None, **kwargs):
+        if room is not None and self.server is not None and self.is_connected(room, namespace or '/'):
+            kwargs['ignore_queue'] = True
+        return super().emit(event, data, namespace=namespace, room=room, skip_sid=skip_sid, callback=callback, **kwargs)
+
+    def announce(self):
+        clients, rooms = self.local_counts()
+        self._publish({'method': 'presence', 'host_id': self.host_id, 'clients': clients, 'rooms': rooms})
+
+    def peer_counts(self):
+        """(servers, clients, {room: clients}) summed over the other live servers"""
+        cutoff = time.time() - 3 * self.presence_interval
+        servers, clients, rooms = 0, 0, {}
+        for host_id, (seen, presence) in list(self.peers.items()):
+            if seen < cutoff:
+                self.peers.pop(host_id, None)
+                continue
+            servers += 1
+            clients += presence['clients']
+            for room, count in presence['rooms'].items():
+                rooms[room] = rooms.get(room, 0) + count
+        return servers, clients, rooms
+
+    def _announce(self):
+        while True:
+            try:
+                self.announce()
+            except Exception as e:
+                logger.error(f"Failed to announce websocket presence: {str(e)}")
+            self.server.sleep(self.presence_interval)
+
+    def _listen(self):
+        for message in super()._listen():
+            data = decode_message(message)
+            if data and data.get('method') == 'presence':
+                if data.get('host_id') != self.host_id:
+                    self.peers[data['host_id']] = (time.time(), data)
+                continue
+            yield data if data is not None else message
+
+class PostgresManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager on PostgreSQL LISTEN/NOTIFY
+
+    Messages are JSON. A NOTIFY payload is limited to 8000 bytes, so larger
+    messages are written to the websocket_messages table (models.py) and
+    only their id is sent. Servers purge the table as they announce.
+    """
+    name = 'postgres'
+    MAX_PAYLOAD = 7900
+    OVERFLOW_TABLE = 'websocket_messages'
+    OVERFLOW_TTL = 60  # Seconds an overflowed message is kept for slow listeners
+
+    def __init__(self, url: str, channel: str = 'flask-socketio', write_only: bool = False, logger=None):
+        self.url = url.replace('postgresql+psycopg2://', 'postgresql://')
+        self.publisher = None
+        self.publish_lock = threading.Lock()
+        self.leading = False
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _connect(self):
+        conn = psycopg2.connect(self.url)
+        conn.autocommit = True
+        return conn
+
+    def _publisher(self):
+        if self.publisher is None or self.publisher.closed:
+            self.publisher = self._connect()
+            # A new session holds no advisory lock
+            self.leading = False
+        return self.publisher
+
+    def _drop_publisher(self):
+        if self.publisher is not None:
+            self.publisher.close()
+        self.publisher = None
+        self.leading = False
+
+    def _publish(self, data):
+        if isinstance(data.get('data'), tuple):
+            # Several event arguments; JSON would turn them into one list
+            data = dict(data, data=list(data['data']), args=True)
+        payload = json.dumps(data)
+        with self.publish_lock:
+            for retry in (True, False):
+                try:
+                    with self._publisher().cursor() as cursor:
+                        if len(payload) > self.MAX_PAYLOAD:
+                            payload = f'@{self._store(cursor, payload)}'
+                        cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, payload))
+                    return
+                except psycopg2.Error as e:
+                    self._drop_publisher()
+                    logger.error(f"Cannot publish to postgres ({str(e).strip()})... {'retrying' if retry else 'giving up'}")
+
+    def _store(self, cursor, payload: str) -> int:
+        cursor.execute(
+            sql.SQL("INSERT INTO {} (payload) VALUES (%s) RETURNING id").format(sql.Identifier(self.OVERFLOW_TABLE)),
+            (payload,)
+        )
+        return cursor.fetchone()[0]
+
+    def purge(self):
+        """
+        Delete overflowed messages older than OVERFLOW_TTL
+        """
+        with self.publish_lock:
+            try:
+                with self._publisher().cursor() as cursor:
+                    cursor.execute(
+                        sql.SQL("DELETE FROM {} WHERE created_at < now() - %s * interval '1 second'").format(
+                            sql.Identifier(self.OVERFLOW_TABLE)
+                        ),
+                        (self.OVERFLOW_TTL,)
+                    )
+            except psycopg2.Error as e:
+                self._drop_publisher()
+                logger.error(f"Cannot purge {self.OVERFLOW_TABLE} ({str(e).strip()})")
+
+    def _fetch(self, conn, message_id: str):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                sql.SQL("SELECT payload FROM {} WHERE id = %s").format(sql.Identifier(self.OVERFLOW_TABLE)),
+                (int(message_id),)
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+                retry_sleep = 1
+                while True:
+                    # select() is cooperative once the process is monkey-patched
+                    if not select.select([conn], [], [], 5)[0]:
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        payload = conn.notifies.pop(0).payload
+                        if payload.startswith('@'):
+                            payload = self._fetch(conn, payload[1:])
+                        message = decode_message(payload) if payload else None
+                        if message is None:
+                            continue
+                        if message.pop('args', False):
+                            message['data'] = tuple(message['data'])
+                        yield message
+            except (psycopg2.Error, OSError) as e:
+                logger.error(f"Cannot receive from postgres ({str(e).strip()})... retrying in {retry_sleep} secs")
+                if conn is not None:
+                    conn.close()
+                time.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+    def try_lead(self) -> bool:
+        """
+        Whether this server runs the cluster's periodic jobs
+
+        The leader holds a session advisory lock on its publishing
+        connection; if the server dies, the lock goes with the connection
+        and the next server to ask takes over.
+        """
+        with self.publish_lock:
+            try:
+                if not self.leading:
+                    with self._publisher().cursor() as cursor:
+                        cursor.execute('SELECT pg_try_advisory_lock(hashtext(%s))', (self.channel,))
+                        self.leading = cursor.fetchone()[0]
+            except psycopg2.Error as e:
+                self._drop_publisher()
+                logger.error(f"Cannot take the websocket leader lock ({str(e).strip()})")
+        return self.leading
+
+class PostgresBus(ClusterBus, PostgresManager):
+    def announce(self):
+        super().announce()
+        self.purge()
+
+class RedisBus(ClusterBus, socketio.RedisManager):
+    def try_lead(self) -> bool:
+        """
+        Whether this server runs the cluster's periodic jobs
+
+        The leader key expires three presence intervals after its holder
+        last renewed it.
+        """
+        key = f'{self.channel}:leader'
+        ttl = 3 * self.presence_interval
+        try:
+            if self.redis.set(key, self.host_id, nx=True, ex=ttl):
+                return True
+            if self.redis.get(key) == self.host_id.encode():
+                self.redis.expire(key, ttl)
+                return True
+        except Exception as e:
+            logger.error(f"Cannot take the websocket leader lock ({str(e)})")
+        return False
+
+def create_message_bus(config, write_only: bool = False):
+    """
+    The Socket.IO client manager for WEBSOCKET_MESSAGE_QUEUE, or None for
+    in-process delivery
+
+    A write_only bus can emit to every server's clients from a process that
+    serves none, e.g. a script or worker outside the app servers.
+    """
+    queue = (config.get('WEBSOCKET_MESSAGE_QUEUE') or 'none').strip()
+    channel = config['WEBSOCKET_CHANNEL']
+    interval = config['WEBSOCKET_PRESENCE_INTERVAL']
+
+    if queue.startswith(('redis://', 'rediss://')):
+        return RedisBus(queue, channel=channel, write_only=write_only, presence_interval=interval)
+
+    if queue == 'postgres':
+        url = config['SQLALCHEMY_DATABASE_URI']
+        if not url.startswith(('postgresql://', 'postgresql+psycopg2://', 'postgres://')):
+            logger.warning("WEBSOCKET_MESSAGE_QUEUE=postgres needs a PostgreSQL database; websocket events stay in this process")
+            return None
+        return PostgresBus(url, channel=channel, write_only=write_only, presence_interval=interval)
+
+    if queue != 'none':
+        raise ValueError(f"Unknown WEBSOCKET_MESSAGE_QUEUE: {queue}")
+    return None
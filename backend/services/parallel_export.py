@@ -0,0 +1,213 @@
+"""
+Parallel export service
+
+Splits a large export into shards by primary key range and renders each shard
+in a separate worker process with its own database connection, so CSV
+formatting and Decimal/UUID conversion use more than one core. IDs are random
+UUIDs, so equal slices of the UUID space hold about the same number of rows.
+
+Each worker writes its shard to a part file in EXPORT_SPOOL_FOLDER. The
+response streams the parts in key order as they finish: CSV parts are
+concatenated under one header, Parquet and Arrow parts are zipped as
+part-00000.parquet, part-00001.parquet, ... Rows come out in id order.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from flask import Flask, Response, stream_with_context
+from models import db
+from services.columnar_export import columnar_export_service
+from services.csv_export import csv_sink
+from services.exports import export_service, KeyRange
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+import zipfile
+
+logger = logging.getLogger(__name__)
+
+# Flask app of a worker process, bound to its own engine
+_worker_app = None
+
+def _init_worker(config: dict):
+    global _worker_app
+    _worker_app = Flask('export-worker')
+    _worker_app.config.update(config)
+    db.init_app(_worker_app)
+
+def _export_part(dataset: str, format_type: str, key_range: KeyRange, columns, path: str) -> str:
+    """
+    Write one shard of an export to path (runs in a worker process)
+    """
+    with _worker_app.app_context():
+        if format_type == 'csv':
+            _, rows = export_service.dataset(dataset, key_range=key_range)
+            chunks = csv_sink.iter_chunks(rows)
+        else:
+            stmt, schema = columnar_export_service.query(dataset, columns=columns, key_range=key_range)
+            chunks = columnar_export_service.iter_chunks(
+                columnar_export_service.record_batches(stmt, schema), schema, format_type
+            )
+
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    return path
+
+class _ZipBuffer:
+    """
+    Write-only, unseekable file object for zipfile whose output is drained in chunks
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class ParallelExportService:
+    READ_CHUNK_SIZE = 1024 * 1024
+    MAX_SHARDS = 64
+    # Datasets and formats a parallel export supports
+    FORMATS = {
+        'orders': ('csv', 'parquet', 'arrow'),
+        'order_items': ('parquet', 'arrow'),
+    }
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.spool_folder = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Bind the service to the Flask app; worker processes start on first use
+        """
+        self.app = app
+        self.spool_folder = app.config['EXPORT_SPOOL_FOLDER']
+        os.makedirs(self.spool_folder, exist_ok=True)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # spawn: workers must not share the parent's open database connections
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.app.config['EXPORT_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=({
+                        'SQLALCHEMY_DATABASE_URI': self.app.config['SQLALCHEMY_DATABASE_URI'],
+                        'SQLALCHEMY_ENGINE_OPTIONS': self.app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+                        'SQLALCHEMY_TRACK_MODIFICATIONS': False
+                    },)
+                )
+            return self.executor
+
+    def key_ranges(self, shards: int):
+        """
+        Split the UUID space into shards equal, contiguous key ranges
+        """
+        step = 2 ** 128 // shards
+        bounds = [None] + [uuid.UUID(int=step * i) for i in range(1, shards)] + [None]
+        return [KeyRange(lower, upper) for lower, upper in zip(bounds, bounds[1:])]
+
+    def submit(self, dataset: str, format_type: str, shards: int, columns=None):
+        """
+        Start rendering every shard; returns the futures in key order
+        """
+        futures = []
+        for index, key_range in enumerate(self.key_ranges(shards)):
+            path = os.path.join(self.spool_folder, f'{dataset}-{uuid.uuid4().hex}-{index:05d}.part')
+            futures.append(self._pool().submit(_export_part, dataset, format_type, key_range, columns, path))
+        return futures
+
+    def _read(self, path: str):
+        try:
+            with open(path, 'rb') as f:
+                while True:
+                    chunk = f.read(self.READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+        finally:
+            os.remove(path)
+
+    def iter_chunks(self, futures, format_type: str, header=None):
+        """
+        Yield the parts in order, each as soon as it and the ones before it are done
+        """
+        try:
+            if format_type == 'csv':
+                if header:
+                    yield from csv_sink.iter_chunks([], header)
+                for future in futures:
+                    yield from self._read(future.result())
+                return
+
+            extension = columnar_export_service.FORMATS[format_type].extension
+            buffer = _ZipBuffer()
+            # Parts are already compressed (Parquet) or meant to be read as is (Arrow)
+            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for index, future in enumerate(futures):
+                    with archive.open(f'part-{index:05d}.{extension}', 'w', force_zip64=True) as entry:
+                        for chunk in self._read(future.result()):
+                            entry.write(chunk)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+                    yield buffer.drain()
+            # Central directory
+            yield buffer.drain()
+        finally:
+            # Client went away or a shard failed: stop the rest and clean up
+            for future in futures:
+                if not future.cancel():
+                    future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        """
+        Remove the part file of a shard that will not be streamed
+        """
+        if future.exception() is None and os.path.exists(future.result()):
+            os.remove(future.result())
+
+    def send(self, dataset: str, format_type: str, shards: int, download_name: str, columns=None):
+        """
+        Build a Flask response that streams a sharded export
+        """
+        futures = self.submit(dataset, format_type, shards, columns)
+        header = export_service.columns(dataset) if format_type == 'csv' else None
+
+        def generate():
+            try:
+                yield from self.iter_chunks(futures, format_type, header)
+            except Exception:
+                logger.exception(f"Parallel export {download_name} failed mid-stream")
+                raise
+
+        if format_type == 'csv':
+            mimetype, filename = 'text/csv', f'{download_name}.csv'
+        else:
+            mimetype, filename = 'application/zip', f'{download_name}.{format_type}.zip'
+        response = Response(stream_with_context(generate()), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+# Global parallel export service instance
+parallel_export_service = ParallelExportService()
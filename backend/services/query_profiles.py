@@ -0,0 +1,40 @@
+"""
+Query loader profiles
+
+Named sets of loader options for the places that serialize models with their
+relationships. Order serialization touches the customer, the items and each
+item's product; loading those lazily costs one query per order and per item.
+Routes pick a profile instead of spelling out (or forgetting) the options.
+
+Profiles are built on use because backref attributes such as Order.customer
+only exist once the mappers are configured.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+from models import Customer, Order, OrderItem, Deal
+
+QUERY_PROFILES = {
+    # Pages of orders: customer joined in, items and products in one extra query each
+    'order_list': lambda: (
+        joinedload(Order.customer),
+        selectinload(Order.order_items).joinedload(OrderItem.product)
+    ),
+    # A single order: everything in one round trip
+    'order_detail': lambda: (
+        joinedload(Order.customer),
+        joinedload(Order.order_items).joinedload(OrderItem.product)
+    ),
+    # Customers with their lifetime stats row
+    'customer_list': lambda: (
+        joinedload(Customer.stats),
+    ),
+    # Deals with their customer names (CRM report)
+    'deal_list': lambda: (
+        joinedload(Deal.customer),
+    )
+}
+
+def load_profile(name: str):
+    """
+    Get the loader options for a named profile, for use with .options(*...)
+    """
+    return QUERY_PROFILES[name]()
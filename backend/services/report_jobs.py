@@ -0,0 +1,318 @@
+"""
+Report job service
+
+Renders reports on a bounded worker pool instead of the request thread.
+Jobs live in the report_jobs table, keyed by (report type, parameters, data
+version), so every server process sees the same jobs: a job can be polled and
+downloaded from any of them, identical requests attach to the job that is
+already rendering wherever they arrive, and a finished report is served from
+its file until the data changes.
+
+Finished jobs are pruned together with their files after RETENTION. A job
+whose worker died (expired lease), or whose file has gone missing, is
+rendered again the next time it is requested or polled.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from models import db, Customer, Order, Product, Lead, Deal, ReportJob
+from services.reports import build_dashboard_report, build_crm_report
+from services.xlsx_export import XLSX_MIMETYPE
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class ReportJobService:
+    # Finished jobs and their files are kept this long
+    RETENTION = timedelta(days=1)
+    # A render that has not finished after this is started again
+    LEASE = timedelta(minutes=10)
+    PRUNE_INTERVAL = timedelta(minutes=5)
+    POLL_INTERVAL = 0.25
+    FINISHED = ('completed', 'failed')
+    EXTENSIONS = {'pdf': 'pdf', 'csv': 'csv', 'xlsx': 'xlsx'}
+    MIMETYPES = {
+        'pdf': 'application/pdf',
+        'csv': 'text/csv',
+        'xlsx': XLSX_MIMETYPE
+    }
+
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self.cache_folder = None
+        self.last_pruned = None
+        self.builders = {
+            'dashboard': lambda format_type, params: build_dashboard_report(format_type, params.get('days', '30')),
+            'crm': lambda format_type, params: build_crm_report(format_type)
+        }
+
+    def init_app(self, app):
+        """
+        Bind the service to the Flask app and start the worker pool
+        """
+        self.app = app
+        self.cache_folder = app.config['REPORT_CACHE_FOLDER']
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config['REPORT_WORKERS'],
+            thread_name_prefix='report-worker'
+        )
+
+    def data_version(self, report_type: str) -> str:
+        """
+        Get a cheap fingerprint of the data a report is built from
+        """
+        if report_type == 'dashboard':
+            row = db.session.execute(select(
+                select(func.count(Order.id)).scalar_subquery(),
+                select(func.max(Order.updated_at)).scalar_subquery(),
+                select(func.max(Customer.updated_at)).scalar_subquery(),
+                select(func.max(Product.updated_at)).scalar_subquery(),
+                # Reports cover a window relative to today
+                func.current_date()
+            )).one()
+        else:
+            # Leads and deals carry no updated_at, so hash the reported columns
+            row = db.session.execute(select(
+                select(func.md5(func.string_agg(
+                    func.concat(Lead.id, Lead.name, Lead.email, Lead.company, Lead.status, Lead.source),
+                    aggregate_order_by(',', Lead.id)
+                ))).scalar_subquery(),
+                select(func.md5(func.string_agg(
+                    func.concat(Deal.id, Deal.name, Deal.customer_id, Deal.stage, Deal.value, Deal.close_date),
+                    aggregate_order_by(',', Deal.id)
+                ))).scalar_subquery(),
+                select(func.count(Customer.id)).scalar_subquery(),
+                select(func.max(Customer.updated_at)).scalar_subquery()
+            )).one()
+        return hashlib.sha256(repr(tuple(row)).encode('utf-8')).hexdigest()[:16]
+
+    def cache_key(self, report_type: str, format_type: str, params: dict) -> str:
+        """
+        Build the cache key for a report request
+        """
+        raw = json.dumps({
+            'type': report_type,
+            'format': format_type,
+            'params': params,
+            'version': self.data_version(report_type)
+        }, sort_keys=True)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def submit(self, report_type: str, format_type: str, params: dict) -> ReportJob:
+        """
+        Get the job for a report, queueing it unless it is already rendered or rendering
+
+        A failed job is queued again.
+        """
+        if report_type not in self.builders:
+            raise ValueError(f"Unknown report type: {report_type}")
+        if format_type not in self.EXTENSIONS:
+            raise ValueError(f"Unsupported format: {format_type}")
+
+        key = self.cache_key(report_type, format_type, params)
+        self._prune()
+
+        while True:
+            now = datetime.utcnow()
+            stmt = insert(ReportJob).values(
+                id=uuid.uuid4(),
+                cache_key=key,
+                report_type=report_type,
+                format=format_type,
+                params=params,
+                status='queued',
+                created_at=now,
+                updated_at=now
+            ).on_conflict_do_nothing(index_elements=[ReportJob.cache_key]).returning(ReportJob.id)
+            job_id = db.session.execute(stmt).scalar()
+            db.session.commit()
+
+            if job_id is not None:
+                self.executor.submit(self._run, job_id)
+                return db.session.get(ReportJob, job_id)
+
+            job = db.session.execute(select(ReportJob).where(ReportJob.cache_key == key)).scalar_one_or_none()
+            # None: pruned in between, so create it again
+            if job is not None:
+                self._resume(job, retry_failed=True)
+                return job
+
+    def get(self, job_id):
+        """
+        Get a job by id, rendering it again if its worker or its file has gone away
+        """
+        job = db.session.get(ReportJob, job_id)
+        if job:
+            self._resume(job)
+        return job
+
+    def wait(self, job_id, timeout: float = None) -> ReportJob:
+        """
+        Poll a job until it finishes or timeout seconds pass
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            db.session.expire_all()
+            job = db.session.get(ReportJob, job_id)
+            if job is None or job.status in self.FINISHED:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(self.POLL_INTERVAL)
+
+    def _resume(self, job: ReportJob, retry_failed: bool = False):
+        """
+        Queue a job again if it stalled, its file is gone or (retry_failed) it failed
+        """
+        now = datetime.utcnow()
+        if job.status == 'completed':
+            stale = not (job.path and os.path.exists(job.path))
+        elif job.status == 'failed':
+            stale = retry_failed
+        elif job.status == 'running':
+            stale = job.lease_expires_at is not None and job.lease_expires_at < now
+        else:
+            stale = job.updated_at is not None and job.updated_at < now - self.LEASE
+        if not stale:
+            return
+
+        # Only one of the processes that noticed it queues the job again
+        queued = db.session.execute(update(ReportJob).where(
+            ReportJob.id == job.id,
+            ReportJob.status == job.status,
+            ReportJob.updated_at == job.updated_at
+        ).values(
+            status='queued',
+            error=None,
+            finished_at=None,
+            updated_at=now
+        ).returning(ReportJob.id)).scalar()
+        db.session.commit()
+        db.session.refresh(job)
+        if queued is not None:
+            logger.info(f"Report job {job.id} queued again")
+            self.executor.submit(self._run, job.id)
+
+    def _prune(self):
+        """
+        Delete jobs finished more than RETENTION ago together with their files,
+        at most once per PRUNE_INTERVAL per process
+        """
+        now = datetime.utcnow()
+        if self.last_pruned and now - self.last_pruned < self.PRUNE_INTERVAL:
+            return
+        self.last_pruned = now
+        cutoff = now - self.RETENTION
+
+        # The rows go first, so no job points at a file being deleted
+        paths = db.session.execute(
+            delete(ReportJob).where(ReportJob.finished_at < cutoff).returning(ReportJob.path)
+        ).scalars().all()
+        db.session.commit()
+        for path in paths:
+            if path:
+                self._discard(path)
+
+        # Partial files of renders whose worker died
+        with os.scandir(self.cache_folder) as entries:
+            for entry in entries:
+                if entry.name.endswith('.tmp') and entry.stat().st_mtime < cutoff.timestamp():
+                    self._discard(entry.path)
+        if paths:
+            logger.info(f"Pruned {len(paths)} report jobs")
+
+    def _discard(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _claim(self, job_id, token: str) -> bool:
+        """
+        Take ownership of a queued job or one whose lease expired
+        """
+        now = datetime.utcnow()
+        claimed = db.session.execute(update(ReportJob).where(
+            ReportJob.id == job_id,
+            or_(
+                ReportJob.status == 'queued',
+                (ReportJob.status == 'running') & (ReportJob.lease_expires_at < now)
+            )
+        ).values(
+            status='running',
+            worker_token=token,
+            lease_expires_at=now + self.LEASE,
+            started_at=now,
+            updated_at=now
+        ).returning(ReportJob.id)).scalar()
+        db.session.commit()
+        return claimed is not None
+
+    def _finish(self, job_id, token: str, status: str, **values) -> bool:
+        now = datetime.utcnow()
+        finished = db.session.execute(update(ReportJob).where(
+            ReportJob.id == job_id,
+            ReportJob.worker_token == token
+        ).values(
+            status=status,
+            worker_token=None,
+            lease_expires_at=None,
+            finished_at=now,
+            updated_at=now,
+            **values
+        ).returning(ReportJob.id)).scalar()
+        db.session.commit()
+        return finished is not None
+
+    def _download_name(self, job: ReportJob) -> str:
+        timestamp = job.created_at.strftime('%Y%m%d_%H%M%S')
+        return f"{job.report_type}_report_{timestamp}.{self.EXTENSIONS[job.format]}"
+
+    def _run(self, job_id):
+        """
+        Render a report inside the worker pool
+        """
+        with self.app.app_context():
+            token = uuid.uuid4().hex
+            if not self._claim(job_id, token):
+                # Finished, or another worker is on it
+                return
+
+            job = db.session.get(ReportJob, job_id)
+            try:
+                data, mimetype, download_name = self.builders[job.report_type](job.format, job.params)
+
+                # Write atomically so readers never see a partial file
+                path = os.path.join(self.cache_folder, f"{job.id.hex}.{self.EXTENSIONS[job.format]}")
+                tmp_path = f"{path}.{token}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+
+                if not self._finish(job_id, token, 'completed', error=None, path=path,
+                                    mimetype=self.MIMETYPES[job.format], download_name=self._download_name(job)):
+                    logger.warning(f"Report job {job_id} was taken over by another worker")
+                    return
+                logger.info(f"Report job {job_id} ({job.report_type}/{job.format}) completed")
+            except Exception as e:
+                db.session.rollback()
+                self._finish(job_id, token, 'failed', error=str(e))
+                logger.error(f"Report job {job_id} failed: {str(e)}")
+
+            db.session.refresh(job)
+            try:
+                from websocket_server import notify_report_ready
+                notify_report_ready(job.to_dict())
+            except Exception as e:
+                logger.error(f"Failed to notify report job {job_id}: {str(e)}")
+
+# Global report job service instance
+report_job_service = ReportJobService()
@@ -0,0 +1,324 @@
+"""
+Report rendering service
+
+Builds the dashboard and CRM reports (CSV, Excel, PDF) as bytes so they can be
+rendered either inline or by a background report job.
+"""
+from datetime import datetime
+import csv
+import io
+from sqlalchemy import func
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from models import db, Customer, Order, Lead, Deal
+from services.dashboard_stats import dashboard_stats_service
+from services.query_profiles import load_profile
+from services.xlsx_export import xlsx_sink, XLSX_MIMETYPE
+
+REPORT_FORMATS = ('pdf', 'csv', 'xlsx')
+
+def _csv_bytes(rows):
+    """
+    Render report rows as UTF-8 CSV
+    """
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue().encode('utf-8')
+
+def build_dashboard_report(format_type: str, days_param: str):
+    """
+    Render the dashboard report
+
+    Returns a (data, mimetype, download_name) tuple.
+    """
+    # Calculate date range (same logic as get_dashboard_stats)
+    current_start, previous_start, today = dashboard_stats_service.resolve_period(days_param)
+
+    # Get dashboard data
+    metrics = dashboard_stats_service.get_period_metrics(current_start, previous_start)
+    total_revenue = metrics['total_revenue']
+    active_customers = metrics['active_customers']
+    products_sold = metrics['products_sold']
+    pending_orders = metrics['pending_orders']
+
+    # Get top products
+    top_products = dashboard_stats_service.get_top_products(current_start, limit=10)
+
+    # Get recent orders for PDF
+    recent_orders = db.session.query(Order).options(*load_profile('order_list')).order_by(
+        Order.created_at.desc()
+    ).limit(10).all()
+
+    # Prepare report data
+    report_data = {
+        'period': days_param,
+        'date_range': f"{current_start.strftime('%Y-%m-%d')} to {today.strftime('%Y-%m-%d')}",
+        'total_revenue': float(total_revenue),
+        'active_customers': active_customers,
+        'products_sold': int(products_sold),
+        'pending_orders': pending_orders,
+        'top_products': [
+            {
+                'name': p.name,
+                'sales': int(p.sales),
+                'revenue': float(p.revenue)
+            }
+            for p in top_products
+        ],
+        'recent_orders': [
+            {
+                'order_number': order.order_number,
+                'customer': order.customer.name,
+                'total': float(order.total),
+                'status': order.status,
+                'date': order.order_date.strftime('%Y-%m-%d') if order.order_date else ''
+            }
+            for order in recent_orders
+        ],
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'dashboard_report_{timestamp}'
+
+    if format_type in ('csv', 'xlsx'):
+        rows = [
+            ['Dashboard Report'],
+            ['Period', report_data['date_range']],
+            ['Generated At', report_data['generated_at']],
+            [],
+            ['Metric', 'Value'],
+            ['Total Revenue', f"${report_data['total_revenue']:,.2f}"],
+            ['Active Customers', report_data['active_customers']],
+            ['Products Sold', report_data['products_sold']],
+            ['Pending Orders', report_data['pending_orders']],
+            [],
+            ['Top Products'],
+            ['Product Name', 'Sales', 'Revenue']
+        ]
+        for product in report_data['top_products']:
+            rows.append([product['name'], product['sales'], f"${product['revenue']:,.2f}"])
+
+        if format_type == 'xlsx':
+            return xlsx_sink.to_bytes(rows, sheet_name='Dashboard Report'), XLSX_MIMETYPE, f'{filename}.xlsx'
+
+        return _csv_bytes(rows), 'text/csv', f'{filename}.csv'
+
+    else:  # PDF - generate PDF with tables
+        # Create PDF in memory
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+        story = []
+        styles = getSampleStyleSheet()
+
+        # Title
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=20,
+            textColor=colors.HexColor('#1e40af'),
+            spaceAfter=30,
+            alignment=1  # Center
+        )
+        story.append(Paragraph("Dashboard Report", title_style))
+        story.append(Spacer(1, 0.2*inch))
+
+        # Report Info
+        info_style = styles['Normal']
+        story.append(Paragraph(f"<b>Period:</b> {report_data['date_range']}", info_style))
+        story.append(Paragraph(f"<b>Generated At:</b> {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}", info_style))
+        story.append(Spacer(1, 0.3*inch))
+
+        # Key Metrics Table
+        metrics_data = [
+            ['Metric', 'Value'],
+            ['Total Revenue', f"${report_data['total_revenue']:,.2f}"],
+            ['Active Customers', str(report_data['active_customers'])],
+            ['Products Sold', f"{report_data['products_sold']:,}"],
+            ['Pending Orders', str(report_data['pending_orders'])],
+        ]
+
+        metrics_table = Table(metrics_data, colWidths=[3*inch, 2*inch])
+        metrics_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ]))
+
+        story.append(Paragraph("<b>Key Metrics</b>", styles['Heading2']))
+        story.append(Spacer(1, 0.1*inch))
+        story.append(metrics_table)
+        story.append(Spacer(1, 0.3*inch))
+
+        # Top Products Table
+        if report_data['top_products']:
+            products_data = [['Product Name', 'Sales (Units)', 'Revenue']]
+            for product in report_data['top_products']:
+                products_data.append([
+                    product['name'],
+                    str(product['sales']),
+                    f"${product['revenue']:,.2f}"
+                ])
+
+            products_table = Table(products_data, colWidths=[3*inch, 1.5*inch, 1.5*inch])
+            products_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('ALIGN', (1, 1), (2, -1), 'RIGHT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ]))
+
+            story.append(Paragraph("<b>Top Selling Products</b>", styles['Heading2']))
+            story.append(Spacer(1, 0.1*inch))
+            story.append(products_table)
+            story.append(Spacer(1, 0.3*inch))
+
+        # Recent Orders Table
+        if report_data['recent_orders']:
+            orders_data = [['Order Number', 'Customer', 'Total', 'Status', 'Date']]
+            for order in report_data['recent_orders']:
+                orders_data.append([
+                    order['order_number'],
+                    order['customer'],
+                    f"${order['total']:,.2f}",
+                    order['status'],
+                    order['date']
+                ])
+
+            orders_table = Table(orders_data, colWidths=[1.2*inch, 1.5*inch, 1*inch, 1*inch, 1.3*inch])
+            orders_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#dc2626')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('ALIGN', (2, 1), (2, -1), 'RIGHT'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('FONTSIZE', (0, 1), (-1, -1), 9),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ]))
+
+            story.append(Paragraph("<b>Recent Orders</b>", styles['Heading2']))
+            story.append(Spacer(1, 0.1*inch))
+            story.append(orders_table)
+
+        # Build PDF
+        doc.build(story)
+        buffer.seek(0)
+
+        return buffer.getvalue(), 'application/pdf', f'{filename}.pdf'
+
+def build_crm_report(format_type: str):
+    """
+    Render the CRM report
+
+    Returns a (data, mimetype, download_name) tuple.
+    """
+    # Get CRM data
+    leads = Lead.query.all()
+    deals = Deal.query.options(*load_profile('deal_list')).all()
+    customers = Customer.query.all()
+
+    stats = {
+        'total_leads': len(leads),
+        'total_deals': len(deals),
+        'total_customers': len(customers),
+        'pipeline_value': float(db.session.query(func.sum(Deal.value)).filter(
+            Deal.stage.in_(['Qualified', 'Proposal', 'Negotiation'])
+        ).scalar() or 0),
+    }
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'crm_report_{timestamp}'
+
+    if format_type in ('csv', 'xlsx'):
+        rows = [
+            ['CRM Report'],
+            ['Generated At', datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            [],
+            ['Metric', 'Value'],
+            ['Total Leads', stats['total_leads']],
+            ['Total Deals', stats['total_deals']],
+            ['Total Customers', stats['total_customers']],
+            ['Pipeline Value', f"${stats['pipeline_value']:,.2f}"],
+            [],
+            ['Deals'],
+            ['Name', 'Stage', 'Value', 'Customer']
+        ]
+        for deal in deals[:50]:
+            rows.append([deal.name, deal.stage, f"${float(deal.value):,.2f}", deal.customer.name if deal.customer else ''])
+
+        if format_type == 'xlsx':
+            return xlsx_sink.to_bytes(rows, sheet_name='CRM Report'), XLSX_MIMETYPE, f'{filename}.xlsx'
+
+        return _csv_bytes(rows), 'text/csv', f'{filename}.csv'
+
+    else:  # PDF
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
+        story = []
+        styles = getSampleStyleSheet()
+
+        story.append(Paragraph("CRM Report", ParagraphStyle('Title', parent=styles['Heading1'], fontSize=20, textColor=colors.HexColor('#1e40af'), alignment=1)))
+        story.append(Spacer(1, 0.2*inch))
+
+        # Stats table
+        stats_data = [
+            ['Metric', 'Value'],
+            ['Total Leads', str(stats['total_leads'])],
+            ['Total Deals', str(stats['total_deals'])],
+            ['Total Customers', str(stats['total_customers'])],
+            ['Pipeline Value', f"${stats['pipeline_value']:,.2f}"],
+        ]
+        stats_table = Table(stats_data, colWidths=[3*inch, 2*inch])
+        stats_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+        ]))
+        story.append(stats_table)
+        story.append(Spacer(1, 0.3*inch))
+
+        # Deals table
+        if deals:
+            deals_data = [['Deal Name', 'Stage', 'Value', 'Customer']]
+            for deal in deals[:20]:
+                deals_data.append([deal.name, deal.stage, f"${float(deal.value):,.2f}", deal.customer.name if deal.customer else ''])
+            deals_table = Table(deals_data, colWidths=[2*inch, 1.5*inch, 1*inch, 1.5*inch])
+            deals_table.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+            ]))
+            story.append(Paragraph("<b>Recent Deals</b>", styles['Heading2']))
+            story.append(Spacer(1, 0.1*inch))
+            story.append(deals_table)
+
+        doc.build(story)
+        buffer.seek(0)
+        return buffer.getvalue(), 'application/pdf', f'{filename}.pdf'
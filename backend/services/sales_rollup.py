@@ -0,0 +1,164 @@
+"""
+Daily sales rollup service
+
+Keeps the daily_sales_rollup table in step with orders and customers so that
+trend endpoints read one row per day instead of scanning every order.
+All writes are additive upserts issued on the caller's session, so they commit
+or roll back together with the order/customer change that caused them.
+Removals only update an existing row and never take a counter below zero: a
+day that has no row yet (not backfilled) has nothing to remove.
+"""
+from collections import namedtuple
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import func, text, update
+from sqlalchemy.dialects.postgresql import insert
+from models import db, DailySalesRollup
+import logging
+
+logger = logging.getLogger(__name__)
+
+# What a single order adds to its day's rollup row
+OrderContribution = namedtuple('OrderContribution', ['created_at', 'total', 'status', 'units'])
+
+class SalesRollupService:
+    COUNTER_COLUMNS = (
+        'revenue', 'order_count', 'units_sold', 'new_customers',
+        'cancelled_count', 'cancelled_total'
+    )
+
+    def _apply(self, day: date, **deltas):
+        """
+        Add deltas to the rollup row for day, creating the row if needed
+
+        Deltas that are all negative (a removal) only update an existing row,
+        clamping each counter at zero.
+        """
+        values = {column: deltas.get(column, 0) for column in self.COUNTER_COLUMNS}
+        if not any(values.values()):
+            return
+
+        if all(value <= 0 for value in values.values()):
+            db.session.execute(
+                update(DailySalesRollup)
+                .where(DailySalesRollup.day == day)
+                .values(
+                    **{
+                        column: func.greatest(getattr(DailySalesRollup, column) + value, 0)
+                        for column, value in values.items() if value
+                    },
+                    updated_at=datetime.utcnow()
+                )
+            )
+            return
+
+        stmt = insert(DailySalesRollup).values(day=day, updated_at=datetime.utcnow(), **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailySalesRollup.day],
+            set_={
+                **{
+                    column: getattr(DailySalesRollup, column) + getattr(stmt.excluded, column)
+                    for column in self.COUNTER_COLUMNS
+                },
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+
+    def order_contribution(self, order, units: int = None) -> OrderContribution:
+        """
+        Capture what an order currently contributes to the rollup
+
+        ``units`` is the total item quantity; pass it when the items are already
+        in hand, otherwise it is summed from ``order.order_items``.
+        """
+        if units is None:
+            units = sum(item.quantity for item in order.order_items)
+        return OrderContribution(
+            created_at=order.created_at or datetime.utcnow(),
+            total=Decimal(str(order.total or 0)),
+            status=order.status,
+            units=units
+        )
+
+    def apply_order(self, contribution: OrderContribution, sign: int = 1):
+        """
+        Add (sign=1) or remove (sign=-1) an order contribution from its day
+        """
+        day = contribution.created_at.date()
+        total = contribution.total * sign
+
+        if contribution.status == 'Cancelled':
+            self._apply(day, cancelled_count=sign, cancelled_total=total)
+        else:
+            self._apply(day, revenue=total, order_count=sign, units_sold=contribution.units * sign)
+
+    def apply_customers(self, created_at: datetime = None, count: int = 1):
+        """
+        Record new (count > 0) or deleted (count < 0) customers for a day
+        """
+        day = (created_at or datetime.utcnow()).date()
+        self._apply(day, new_customers=count)
+
+    def rebuild(self, start_day: date = None, end_day: date = None) -> int:
+        """
+        Recompute rollup rows from orders and customers for [start_day, end_day]
+
+        With no bounds the whole table is rebuilt. Returns the number of rows written.
+        """
+        params = {'start_day': start_day, 'end_day': end_day}
+        day_filter = """
+            (CAST(:start_day AS date) IS NULL OR {col}::date >= CAST(:start_day AS date))
+            AND (CAST(:end_day AS date) IS NULL OR {col}::date <= CAST(:end_day AS date))
+        """
+
+        db.session.execute(text(f"""
+            DELETE FROM daily_sales_rollup
+            WHERE {day_filter.format(col='day')}
+        """), params)
+
+        result = db.session.execute(text(f"""
+            INSERT INTO daily_sales_rollup (
+                day, revenue, order_count, units_sold, new_customers,
+                cancelled_count, cancelled_total, updated_at
+            )
+            SELECT day,
+                   COALESCE(SUM(revenue), 0),
+                   COALESCE(SUM(order_count), 0),
+                   COALESCE(SUM(units_sold), 0),
+                   COALESCE(SUM(new_customers), 0),
+                   COALESCE(SUM(cancelled_count), 0),
+                   COALESCE(SUM(cancelled_total), 0),
+                   now() AT TIME ZONE 'utc'
+            FROM (
+                SELECT o.created_at::date AS day,
+                       SUM(o.total) FILTER (WHERE o.status IS DISTINCT FROM 'Cancelled') AS revenue,
+                       COUNT(*) FILTER (WHERE o.status IS DISTINCT FROM 'Cancelled') AS order_count,
+                       SUM(COALESCE(i.units, 0)) FILTER (WHERE o.status IS DISTINCT FROM 'Cancelled') AS units_sold,
+                       0 AS new_customers,
+                       COUNT(*) FILTER (WHERE o.status = 'Cancelled') AS cancelled_count,
+                       SUM(o.total) FILTER (WHERE o.status = 'Cancelled') AS cancelled_total
+                FROM orders o
+                LEFT JOIN (
+                    SELECT order_id, SUM(quantity) AS units
+                    FROM order_items
+                    GROUP BY order_id
+                ) i ON i.order_id = o.id
+                WHERE o.created_at IS NOT NULL AND {day_filter.format(col='o.created_at')}
+                GROUP BY 1
+
+                UNION ALL
+
+                SELECT c.created_at::date, 0, 0, 0, COUNT(*), 0, 0
+                FROM customers c
+                WHERE c.created_at IS NOT NULL AND {day_filter.format(col='c.created_at')}
+                GROUP BY 1
+            ) daily
+            GROUP BY day
+        """), params)
+
+        logger.info(f"Rebuilt daily sales rollup ({result.rowcount} days)")
+        return result.rowcount
+
+# Global sales rollup service instance
+sales_rollup_service = SalesRollupService()
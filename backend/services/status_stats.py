@@ -0,0 +1,64 @@
+"""
+Status histogram service
+
+The /stats endpoints count rows per status. Instead of one COUNT query per
+status, histogram() gets every status bucket, the grand total, any per-bucket
+aggregates and any extra scalar values in one grouped scan:
+
+    SELECT status, GROUPING(status), COUNT(*), <aggregates>, <extras>
+    FROM <table> WHERE <filters>
+    GROUP BY ROLLUP(status)
+
+ROLLUP adds the grand total row, which is returned even when no rows match, so
+extras always come back. When only counts are asked for, an index on the status
+column lets Postgres answer with an index-only scan.
+"""
+from collections import namedtuple
+from sqlalchemy import func, select
+from models import db
+
+# total: rows matched; counts: {status: rows}; aggregates: {status: {name: value}};
+# totals: {name: value} over all rows; extras: {name: value}
+StatusHistogram = namedtuple('StatusHistogram', ['total', 'counts', 'aggregates', 'totals', 'extras'])
+
+class StatusStatsService:
+    def histogram(self, status_column, filters=(), aggregates=None, extras=None) -> StatusHistogram:
+        """
+        Count rows per value of status_column in one statement
+
+        ``filters`` restrict the rows counted; ``aggregates`` maps names to
+        aggregate expressions computed per status and overall (e.g.
+        ``{'revenue': func.sum(Order.total)}``); ``extras`` maps names to scalar
+        subqueries that ride along in the same round trip.
+        """
+        aggregates = aggregates or {}
+        extras = extras or {}
+
+        stmt = select(
+            status_column.label('status'),
+            func.grouping(status_column).label('is_total'),
+            func.count().label('count'),
+            *[expression.label(f'aggregate_{name}') for name, expression in aggregates.items()],
+            *[expression.label(f'extra_{name}') for name, expression in extras.items()]
+        ).where(*filters).group_by(func.rollup(status_column))
+
+        total = 0
+        counts = {}
+        per_status = {}
+        totals = {name: None for name in aggregates}
+        extra_values = {name: None for name in extras}
+
+        for row in db.session.execute(stmt).mappings():
+            values = {name: row[f'aggregate_{name}'] for name in aggregates}
+            if row['is_total']:
+                total = row['count']
+                totals = values
+                extra_values = {name: row[f'extra_{name}'] for name in extras}
+            else:
+                counts[row['status']] = row['count']
+                per_status[row['status']] = values
+
+        return StatusHistogram(total, counts, per_status, totals, extra_values)
+
+# Global status stats service instance
+status_stats_service = StatusStatsService()
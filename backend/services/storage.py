@@ -0,0 +1,319 @@
+"""
+Upload storage
+
+Uploaded files live in the storage backend chosen by STORAGE_BACKEND:
+
+- local: files under UPLOAD_FOLDER on this server's disk (the default).
+- s3: a bucket on Amazon S3 or an S3-compatible store (MinIO, Ceph, ...), so
+  every app server sees the same files.
+
+Files are addressed by keys like images/ab/<hash>/thumb.webp or
+avatars/<name>.jpg; the local backend maps a key to the same path under
+UPLOAD_FOLDER.
+
+Direct uploads keep file bytes out of the upload routes: create_upload()
+returns a presigned URL the browser PUTs the file to (for local storage,
+PUT /api/v1/upload/direct/<upload_id> on this app), landing under incoming/.
+The browser then calls the completion route, which checks the upload with
+claim_upload() and reads it back to render the image variants. The declared
+size and content type are part of the signature, so storage rejects a PUT
+that does not match them. Unclaimed incoming/ files are removed after a day
+(for S3, set a lifecycle rule on the incoming/ prefix).
+"""
+from datetime import datetime, timedelta
+from flask import current_app, redirect
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from werkzeug.security import safe_join
+from services.file_serving import file_serving_service
+import logging
+import os
+import tempfile
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class StorageError(ValueError):
+    """Raised for a direct upload that cannot be accepted or completed"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class LocalStorage:
+    """
+    Files under a directory on this server
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str):
+        return safe_join(self.root, key)
+
+    def put(self, key: str, data: bytes, content_type: str = None, cache_control: str = None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+    def get(self, key: str):
+        if not self.exists(key):
+            return None
+        with open(self.path(key), 'rb') as f:
+            return f.read()
+
+    def exists(self, key: str) -> bool:
+        path = self.path(key)
+        return bool(path) and os.path.isfile(path)
+
+    def delete(self, key: str):
+        path = self.path(key)
+        if path and os.path.isfile(path):
+            os.remove(path)
+
+    def send(self, key: str, immutable: bool = False, etag: str = None):
+        if not self.exists(key):
+            return None
+        return file_serving_service.send(self.path(key), immutable=immutable, etag=etag)
+
+    def presign_upload(self, key: str, upload_id: str, content_type: str, size: int, expires: int) -> str:
+        # The upload id is itself signed and carries the key, type and size
+        return f'/api/v1/upload/direct/{upload_id}'
+
+    def prune(self, prefix: str, older_than: datetime):
+        directory = self.path(prefix)
+        if not directory or not os.path.isdir(directory):
+            return 0
+        removed = 0
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path) and datetime.utcfromtimestamp(os.path.getmtime(path)) < older_than:
+                os.remove(path)
+                removed += 1
+        return removed
+
+class S3Storage:
+    """
+    Objects in an S3 (or S3-compatible) bucket
+    """
+
+    def __init__(self, bucket: str, endpoint_url: str = None, region: str = None, access_key_id: str = None,
+                 secret_access_key: str = None, public_url: str = None, url_expires: int = 3600):
+        # Only needed when this backend is configured
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expires = url_expires
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            # SigV4 signs Content-Length and Content-Type into presigned PUTs
+            config=Config(signature_version='s3v4')
+        )
+
+    def put(self, key: str, data: bytes, content_type: str = None, cache_control: str = None):
+        params = {'Bucket': self.bucket, 'Key': key, 'Body': data}
+        if content_type:
+            params['ContentType'] = content_type
+        if cache_control:
+            params['CacheControl'] = cache_control
+        self.client.put_object(**params)
+
+    def get(self, key: str):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def send(self, key: str, immutable: bool = False, etag: str = None):
+        """
+        Redirect to the object; the bucket or CDN serves the bytes (and
+        answers 404 for a missing key, so no HEAD request is made here)
+        """
+        if self.public_url:
+            response = redirect(f'{self.public_url}/{key}', 302)
+            max_age = file_serving_service.IMMUTABLE_MAX_AGE if immutable else file_serving_service.max_age
+        else:
+            url = self.client.generate_presigned_url(
+                'get_object', Params={'Bucket': self.bucket, 'Key': key}, ExpiresIn=self.url_expires
+            )
+            response = redirect(url, 302)
+            # The redirect must not outlive the signature
+            max_age = self.url_expires // 2
+        if max_age:
+            response.cache_control.private = True
+            response.cache_control.max_age = max_age
+        return response
+
+    def presign_upload(self, key: str, upload_id: str, content_type: str, size: int, expires: int) -> str:
+        return self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': key, 'ContentType': content_type, 'ContentLength': size},
+            ExpiresIn=expires
+        )
+
+    def prune(self, prefix: str, older_than: datetime):
+        # Left to a bucket lifecycle rule on the prefix
+        return 0
+
+class StorageService:
+    INCOMING_PREFIX = 'incoming'
+    INCOMING_RETENTION = timedelta(days=1)
+    PRUNE_INTERVAL = timedelta(hours=1)
+
+    def __init__(self):
+        self.backend = None
+        self.last_pruned = None
+
+    def init_app(self, app):
+        """
+        Create the configured storage backend
+        """
+        name = app.config['STORAGE_BACKEND']
+        if name == 'local':
+            self.backend = LocalStorage(app.config['UPLOAD_FOLDER'])
+        elif name == 's3':
+            self.backend = S3Storage(
+                app.config['S3_BUCKET'],
+                endpoint_url=app.config['S3_ENDPOINT_URL'],
+                region=app.config['S3_REGION'],
+                access_key_id=app.config['S3_ACCESS_KEY_ID'],
+                secret_access_key=app.config['S3_SECRET_ACCESS_KEY'],
+                public_url=app.config['S3_PUBLIC_URL'],
+                url_expires=app.config['STORAGE_URL_EXPIRES']
+            )
+        else:
+            raise ValueError("STORAGE_BACKEND must be 'local' or 's3'")
+
+    def put(self, key: str, data: bytes, content_type: str = None, cache_control: str = None):
+        self.backend.put(key, data, content_type, cache_control)
+
+    def get(self, key: str):
+        """
+        Contents of a key, or None if it does not exist
+        """
+        return self.backend.get(key)
+
+    def exists(self, key: str) -> bool:
+        return self.backend.exists(key)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def send(self, key: str, immutable: bool = False, etag: str = None):
+        """
+        Response serving a key, or None if it does not exist
+        """
+        return self.backend.send(key, immutable=immutable, etag=etag)
+
+    def _serializer(self) -> URLSafeTimedSerializer:
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='direct-upload')
+
+    def create_upload(self, kind: str, user_id: str, content_type: str, size: int) -> dict:
+        """
+        Reserve an incoming key for a direct upload and presign a PUT to it
+        """
+        if content_type not in current_app.config['UPLOAD_CONTENT_TYPES']:
+            raise StorageError(
+                f"Content type not allowed. Allowed types: {', '.join(current_app.config['UPLOAD_CONTENT_TYPES'])}"
+            )
+        if size <= 0 or size > current_app.config['MAX_CONTENT_LENGTH']:
+            raise StorageError(f"File size must be between 1 and {current_app.config['MAX_CONTENT_LENGTH']} bytes")
+
+        self._prune()
+        expires = current_app.config['STORAGE_UPLOAD_EXPIRES']
+        key = f'{self.INCOMING_PREFIX}/{uuid.uuid4().hex}'
+        upload_id = self._serializer().dumps({
+            'key': key, 'kind': kind, 'user_id': str(user_id), 'content_type': content_type, 'size': size
+        })
+        return {
+            'upload_id': upload_id,
+            'method': 'PUT',
+            'url': self.backend.presign_upload(key, upload_id, content_type, size, expires),
+            'headers': {'Content-Type': content_type},
+            'expires_in': expires
+        }
+
+    def verify_upload(self, upload_id: str, max_age: int = None) -> dict:
+        """
+        Decode an upload id; raises StorageError if it is forged or expired
+        """
+        try:
+            return self._serializer().loads(
+                upload_id, max_age=max_age or current_app.config['STORAGE_UPLOAD_EXPIRES']
+            )
+        except SignatureExpired:
+            raise StorageError('Upload expired, please start a new one', 410)
+        except BadSignature:
+            raise StorageError('Invalid upload id')
+
+    def receive_upload(self, upload_id: str, content_type: str, data: bytes):
+        """
+        Store the body of a direct upload PUT to the local backend
+        """
+        upload = self.verify_upload(upload_id)
+        if content_type != upload['content_type'] or len(data) != upload['size']:
+            raise StorageError('Content-Type and size must match the ones the upload was created with')
+        self.put(upload['key'], data, content_type)
+
+    def claim_upload(self, upload_id: str, user_id: str):
+        """
+        Check a finished direct upload belongs to user_id and read it
+
+        Returns (upload, data). Call finish_upload() once it is processed.
+        """
+        # Leave the browser the whole URL lifetime to finish the PUT
+        upload = self.verify_upload(upload_id, max_age=2 * current_app.config['STORAGE_UPLOAD_EXPIRES'])
+        if upload['user_id'] != str(user_id):
+            raise StorageError('Upload belongs to another user', 403)
+        data = self.get(upload['key'])
+        if data is None:
+            raise StorageError('Upload not found; PUT the file to the upload URL first', 404)
+        # Stores that do not check signed headers could take a different body
+        if len(data) != upload['size']:
+            self.delete(upload['key'])
+            raise StorageError('Uploaded file does not match the declared size')
+        return upload, data
+
+    def finish_upload(self, upload: dict):
+        self.delete(upload['key'])
+
+    def _prune(self):
+        """
+        Remove abandoned direct uploads, at most once per PRUNE_INTERVAL per process
+        """
+        now = datetime.utcnow()
+        if self.last_pruned and now - self.last_pruned < self.PRUNE_INTERVAL:
+            return
+        self.last_pruned = now
+        removed = self.backend.prune(self.INCOMING_PREFIX, now - self.INCOMING_RETENTION)
+        if removed:
+            logger.info(f"Removed {removed} abandoned direct uploads")
+
+# Global storage service instance
+storage_service = StorageService()
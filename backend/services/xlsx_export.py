@@ -0,0 +1,85 @@
+"""
+XLSX export sink
+
+Every endpoint that offers an Excel download writes through this sink. It uses
+XlsxWriter's constant_memory mode, which flushes each row to disk as soon as
+the next one starts, so memory use does not grow with the number of rows as
+long as the rows themselves come from a generator or server-side cursor.
+"""
+from flask import send_file
+from typing import Iterable, Sequence
+import io
+import tempfile
+import xlsxwriter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+class XlsxSink:
+    WORKBOOK_OPTIONS = {
+        'constant_memory': True,
+        # Exported values are data, never formulas or hyperlinks
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'strings_to_numbers': False
+    }
+
+    def write(self, target, rows: Iterable[Sequence], header: Sequence = None, sheet_name: str = 'Sheet1') -> int:
+        """
+        Write rows to target (a path or binary file object) as a one-sheet workbook
+
+        Rows are written in order and never held in memory together. Returns
+        the number of data rows written.
+        """
+        workbook = xlsxwriter.Workbook(target, self.WORKBOOK_OPTIONS)
+        try:
+            worksheet = workbook.add_worksheet(sheet_name[:31])
+            row_index = 0
+
+            if header:
+                bold = workbook.add_format({'bold': True})
+                worksheet.write_row(0, 0, header, bold)
+                worksheet.freeze_panes(1, 0)
+                row_index = 1
+
+            count = 0
+            for row in rows:
+                worksheet.write_row(row_index, 0, ['' if value is None else value for value in row])
+                row_index += 1
+                count += 1
+        finally:
+            workbook.close()
+
+        return count
+
+    def to_bytes(self, rows: Iterable[Sequence], header: Sequence = None, sheet_name: str = 'Sheet1') -> bytes:
+        """
+        Render a small workbook in memory
+        """
+        output = io.BytesIO()
+        self.write(output, rows, header, sheet_name)
+        return output.getvalue()
+
+    def send(self, rows: Iterable[Sequence], download_name: str, header: Sequence = None, sheet_name: str = 'Sheet1'):
+        """
+        Build a Flask response that streams the workbook to the client
+
+        The workbook is assembled in an anonymous temporary file, which is
+        removed once the response has been sent.
+        """
+        spool = tempfile.TemporaryFile(suffix='.xlsx')
+        try:
+            self.write(spool, rows, header, sheet_name)
+            spool.seek(0)
+        except Exception:
+            spool.close()
+            raise
+
+        return send_file(
+            spool,
+            mimetype=XLSX_MIMETYPE,
+            as_attachment=True,
+            download_name=download_name
+        )
+
+# Global XLSX sink instance
+xlsx_sink = XlsxSink()
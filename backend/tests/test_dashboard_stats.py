@@ -0,0 +1,74 @@
+"""
+Delivery time statistics are aggregated in the database, without loading Order rows
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from models import db, Customer, Order
+from services.dashboard_stats import dashboard_stats_service
+
+DELIVERY_KEYS = {'average_days', 'p50_days', 'p90_days', 'p99_days', 'sample_size'}
+
+@pytest.fixture
+def delivered_orders(app):
+    """Ten completed orders delivered in 0..9 days, plus one still pending"""
+    with app.app_context():
+        customer = Customer(name='Delivery Test', email='delivery-test@example.com')
+        db.session.add(customer)
+        db.session.flush()
+        created = datetime(2024, 1, 1)
+        for days in range(10):
+            db.session.add(Order(
+                order_number=f'DELIVERY-{days}', customer_id=customer.id, total=100, status='Completed',
+                created_at=created, updated_at=created + timedelta(days=days)
+            ))
+        db.session.add(Order(
+            order_number='DELIVERY-PENDING', customer_id=customer.id, total=100, status='Pending',
+            created_at=created, updated_at=created + timedelta(days=30)
+        ))
+        db.session.commit()
+
+@contextmanager
+def count_order_loads():
+    loaded = []
+
+    def on_load(target, context):
+        loaded.append(target)
+
+    event.listen(Order, 'load', on_load)
+    try:
+        yield loaded
+    finally:
+        event.remove(Order, 'load', on_load)
+
+def test_delivery_time_stats_load_no_orders(app, delivered_orders):
+    with app.app_context():
+        with count_order_loads() as loaded:
+            stats = dashboard_stats_service.get_delivery_time_stats()
+
+    assert loaded == []
+    assert set(stats) == DELIVERY_KEYS
+    assert stats['sample_size'] == 10
+    assert stats['average_days'] == pytest.approx(4.5)
+    assert stats['p50_days'] == pytest.approx(4.5)
+    assert stats['p90_days'] == pytest.approx(8.1)
+    assert stats['p99_days'] == pytest.approx(8.91)
+
+def test_delivery_time_stats_without_orders(app):
+    with app.app_context():
+        stats = dashboard_stats_service.get_delivery_time_stats()
+
+    assert stats == {'average_days': 0.0, 'p50_days': 0.0, 'p90_days': 0.0, 'p99_days': 0.0, 'sample_size': 0}
+
+@pytest.mark.parametrize('url', ['/api/v1/dashboard/performance-metrics', '/api/v1/analytics/overview'])
+def test_delivery_time_endpoints_load_no_orders(client, auth_headers, delivered_orders, url):
+    with count_order_loads() as loaded:
+        response = client.get(url, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert loaded == []
+    delivery = response.get_json()['data']['delivery_time']
+    assert set(delivery) >= DELIVERY_KEYS
+    assert delivery['sample_size'] == 10
+    assert delivery['p50_days'] == pytest.approx(4.5)
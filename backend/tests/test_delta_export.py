@@ -0,0 +1,74 @@
+"""
+Delta exports send a customer again when its order totals change
+"""
+import csv
+from datetime import datetime, timedelta
+import io
+import pytest
+from sqlalchemy import text, update
+from models import db, Customer, CustomerStats, Product
+from services.customer_stats import customer_stats_service
+
+@pytest.fixture
+def customers(app, monkeypatch):
+    """Two customers last changed an hour ago, and a product to order"""
+    monkeypatch.setitem(app.config, 'DELTA_EXPORT_LAG', 0)
+    with app.app_context():
+        rows = [Customer(name=f'Delta Customer {i}', email=f'delta-{i}@example.com') for i in range(2)]
+        product = Product(name='Delta Product', sku='DELTA-1', category='Test', price=10, stock=10)
+        db.session.add_all(rows + [product])
+        db.session.flush()
+        db.session.execute(update(Customer).values(updated_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+        return [str(row.id) for row in rows], str(product.id)
+
+def place_order(client, customer_id, product_id):
+    response = client.post('/api/v1/orders', json={
+        'order_number': f'DELTA-{customer_id}',
+        'customer_id': customer_id,
+        'total': 10,
+        'order_items': [{'product_id': product_id, 'quantity': 1, 'unit_price': 10}]
+    })
+    assert response.status_code == 201, response.get_json()
+
+def exported_ids(client, headers, query):
+    response = client.get(f'/api/v1/export/customers?format=csv&{query}', headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [row['ID'] for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))]
+
+def customer_updated_at(app, customer_id):
+    with app.app_context():
+        return db.session.get(Customer, customer_id).updated_at
+
+@pytest.mark.parametrize('query', ['', '&limit=1'])
+def test_order_sends_its_customer_again(app, client, admin_headers, customers, query):
+    (buyer, other), product_id = customers
+    since = (datetime.utcnow() - timedelta(minutes=30)).isoformat()
+    before = customer_updated_at(app, buyer)
+
+    place_order(client, buyer, product_id)
+
+    assert exported_ids(client, admin_headers, f'since={since}{query}') == [buyer]
+    # The customer row itself is not rewritten
+    assert customer_updated_at(app, buyer) == before
+
+def test_rebuild_rewrites_only_drifted_customers(app, client, customers):
+    (buyer, other), product_id = customers
+    place_order(client, buyer, product_id)
+    place_order(client, other, product_id)
+    with app.app_context():
+        stamps = dict(db.session.query(CustomerStats.customer_id, CustomerStats.updated_at).all())
+        # The buyer's order disappears behind the projection's back
+        db.session.execute(text("DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE customer_id = :id)"), {'id': buyer})
+        db.session.execute(text("DELETE FROM orders WHERE customer_id = :id"), {'id': buyer})
+        db.session.commit()
+
+        assert customer_stats_service.rebuild() == 1
+        db.session.commit()
+
+        buyer_stats = db.session.get(CustomerStats, buyer)
+        other_stats = db.session.get(CustomerStats, other)
+        assert (buyer_stats.order_count, buyer_stats.lifetime_spend) == (0, 0)
+        assert buyer_stats.updated_at > stamps[buyer_stats.customer_id]
+        assert other_stats.updated_at == stamps[other_stats.customer_id]
+        assert customer_stats_service.check() == []
@@ -0,0 +1,85 @@
+"""
+Idempotency-Key claims: a request whose writes were committed never runs twice
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from models import db, Customer, IdempotencyKey, Order, Product
+from services.idempotency import idempotency_service
+from services.inventory import inventory_service
+
+KEY = 'order-key-1'
+
+@pytest.fixture
+def order_body(app):
+    with app.app_context():
+        customer = Customer(name='Idempotent Buyer', email='idempotent-buyer@example.com')
+        product = Product(name='Idempotent Product', sku='IDEMPOTENT-1', category='Test', price=10, stock=10)
+        db.session.add_all([customer, product])
+        db.session.commit()
+        return {
+            'order_number': 'IDEMPOTENT-1',
+            'customer_id': str(customer.id),
+            'total': 10,
+            'order_items': [{'product_id': str(product.id), 'quantity': 1, 'unit_price': 10}]
+        }
+
+def post_order(client, body):
+    return client.post('/api/v1/orders', json=body, headers={'Idempotency-Key': KEY})
+
+def expire_lock(app):
+    """Pretend IDEMPOTENCY_LOCK_TIMEOUT has passed since the key was claimed"""
+    with app.app_context():
+        db.session.execute(update(IdempotencyKey).where(IdempotencyKey.key == KEY).values(
+            locked_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+def order_count(app):
+    with app.app_context():
+        return Order.query.count()
+
+def test_retry_replays_the_stored_response(app, client, order_body):
+    first = post_order(client, order_body)
+    retry = post_order(client, order_body)
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_data() == first.get_data()
+    assert order_count(app) == 1
+
+def test_retry_after_lost_response_does_not_run_again(app, client, order_body, monkeypatch):
+    # The process dies after the route committed, before the response is stored
+    monkeypatch.setattr(idempotency_service, 'complete', lambda *args: None)
+    assert post_order(client, order_body).status_code == 201
+    monkeypatch.undo()
+    expire_lock(app)
+
+    retry = post_order(client, order_body)
+
+    assert retry.status_code == 409
+    assert order_count(app) == 1
+
+def test_uncommitted_claim_is_taken_over(app, client, order_body):
+    # The process died while the route ran, before it committed anything
+    with app.app_context():
+        assert idempotency_service.claim('orders.create_order:anonymous', KEY, 'unused', ttl=60, lock_timeout=60) is None
+    expire_lock(app)
+
+    retry = post_order(client, order_body)
+
+    assert retry.status_code == 201
+    assert order_count(app) == 1
+
+def test_failed_request_can_be_retried(app, client, order_body, monkeypatch):
+    def fail(items):
+        raise RuntimeError('database went away')
+
+    monkeypatch.setattr(inventory_service, 'reserve', fail)
+    assert post_order(client, order_body).status_code == 500
+    monkeypatch.undo()
+
+    retry = post_order(client, order_body)
+
+    assert retry.status_code == 201
+    assert order_count(app) == 1
@@ -0,0 +1,84 @@
+"""
+Concurrent stock reservations never oversell a product
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pytest
+from models import db, Customer, OrderItem, Product
+from services.inventory import inventory_service, StockError
+
+STOCK = 5
+BUYERS = 20
+
+@pytest.fixture
+def product_id(app):
+    with app.app_context():
+        product = Product(name='Scarce Product', sku='SCARCE-1', category='Test', price=10, stock=STOCK)
+        db.session.add(product)
+        db.session.commit()
+        return str(product.id)
+
+def run_concurrently(fn):
+    """Call fn(n) for every buyer at once and return the results in order"""
+    barrier = threading.Barrier(BUYERS)
+
+    def start(n):
+        barrier.wait()
+        return fn(n)
+
+    with ThreadPoolExecutor(max_workers=BUYERS) as executor:
+        return list(executor.map(start, range(BUYERS)))
+
+def stock_of(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+def test_concurrent_reserves_never_oversell(app, product_id):
+    def reserve(n):
+        with app.app_context():
+            try:
+                inventory_service.reserve([{'product_id': product_id, 'quantity': 1}])
+                db.session.commit()
+                return 'reserved'
+            except StockError as e:
+                db.session.rollback()
+                return e.status_code
+
+    results = run_concurrently(reserve)
+
+    assert results.count('reserved') == STOCK
+    assert results.count(409) == BUYERS - STOCK
+    assert stock_of(app, product_id) == 0
+
+def test_reserve_more_than_stock_takes_nothing(app, product_id):
+    with app.app_context():
+        with pytest.raises(StockError) as error:
+            inventory_service.reserve([{'product_id': product_id, 'quantity': STOCK + 1}])
+        db.session.rollback()
+
+    assert error.value.status_code == 409
+    assert stock_of(app, product_id) == STOCK
+
+def test_concurrent_orders_never_oversell(app, product_id):
+    with app.app_context():
+        customer = Customer(name='Scarce Buyer', email='scarce-buyer@example.com')
+        db.session.add(customer)
+        db.session.commit()
+        customer_id = str(customer.id)
+
+    def place_order(n):
+        response = app.test_client().post('/api/v1/orders', json={
+            'order_number': f'SCARCE-{n}',
+            'customer_id': customer_id,
+            'total': 10,
+            'order_items': [{'product_id': product_id, 'quantity': 1, 'unit_price': 10}]
+        })
+        return response.status_code
+
+    statuses = run_concurrently(place_order)
+
+    assert statuses.count(201) == STOCK
+    assert statuses.count(409) == BUYERS - STOCK
+    assert stock_of(app, product_id) == 0
+    with app.app_context():
+        assert db.session.query(OrderItem).filter_by(product_id=product_id).count() == STOCK
@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination over sort keys that may be NULL
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from models import db, Customer
+
+@pytest.fixture
+def customers(app):
+    """Seven customers, three of them without created_at; returns their ids by created_at"""
+    with app.app_context():
+        rows = [
+            Customer(name=f'Page Customer {i}', email=f'page-{i}@example.com',
+                     created_at=datetime(2024, 1, 1) + timedelta(days=i))
+            for i in range(7)
+        ]
+        db.session.add_all(rows)
+        db.session.flush()
+        # The column default fills in a None given to the model
+        db.session.execute(
+            update(Customer).where(Customer.id.in_([row.id for row in rows[4:]])).values(created_at=None)
+        )
+        db.session.commit()
+        dated = [str(row.id) for row in rows[:4]]
+        undated = sorted(str(row.id) for row in rows[4:])
+        return dated, undated
+
+def walk(client, headers, sort, direction='next_cursor', cursor=''):
+    """Ids of every page, following direction from cursor"""
+    pages = []
+    while cursor is not None:
+        response = client.get(f'/api/v1/customers?cursor={cursor}&per_page=2&sort={sort}', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        pages.append([customer['id'] for customer in body['data']])
+        cursor = body['pagination'][direction]
+        last = body['pagination']
+    return pages, last
+
+@pytest.mark.parametrize('sort', ['created_at', '-created_at'])
+def test_cursor_walks_every_row_once(client, auth_headers, customers, sort):
+    dated, undated = customers
+    # NULL sorts above every value: last going up, first going down
+    expected = dated + undated if sort == 'created_at' else undated[::-1] + dated[::-1]
+
+    pages, last = walk(client, auth_headers, sort)
+
+    assert [customer_id for page in pages for customer_id in page] == expected
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+    # And back again from the last page
+    back, _ = walk(client, auth_headers, sort, 'prev_cursor', last['prev_cursor'])
+    assert back == pages[-2::-1]
+
+@pytest.mark.parametrize('sort', ['created_at', '-created_at'])
+def test_page_mode_orders_like_cursor_mode(client, auth_headers, customers, sort):
+    pages, _ = walk(client, auth_headers, sort)
+
+    response = client.get(f'/api/v1/customers?page=1&per_page=10&sort={sort}', headers=auth_headers)
+
+    assert [customer['id'] for customer in response.get_json()['data']] == [i for page in pages for i in page]
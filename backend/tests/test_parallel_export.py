@@ -0,0 +1,25 @@
+"""
+The parallel export worker pool is shared by every request thread
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from services.parallel_export import parallel_export_service
+
+THREADS = 8
+
+def test_concurrent_first_use_starts_one_pool(app, monkeypatch):
+    monkeypatch.setattr(parallel_export_service, 'executor', None)
+    barrier = threading.Barrier(THREADS)
+
+    def first_use(n):
+        barrier.wait()
+        return parallel_export_service._pool()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        pools = list(executor.map(first_use, range(THREADS)))
+
+    try:
+        assert len({id(pool) for pool in pools}) == 1
+        assert pools[0]._max_workers == app.config['EXPORT_WORKERS'] >= 1
+    finally:
+        pools[0].shutdown()
@@ -0,0 +1,130 @@
+"""
+SQL statement counts of the loader profiles in services/query_profiles.py
+
+Serializing a model with its relationships must take a fixed number of
+statements whatever the number of rows, or a lazy load (N+1) has crept in.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from models import db, Customer, CustomerStats, Deal, Order, OrderItem, Product
+from services.query_profiles import QUERY_PROFILES, load_profile
+
+# Statements each profile takes to load and serialize its rows
+PROFILE_STATEMENTS = {
+    'order_list': 2,     # orders joined to customers, then items joined to products
+    'order_detail': 1,
+    'customer_list': 1,
+    'deal_list': 1,
+}
+
+def seed(count: int, start: int = 0):
+    """count customers, each with a stats row, an order of two items and a deal"""
+    products = Product.query.order_by(Product.sku).all()
+    if not products:
+        products = [
+            Product(name=f'Profile Product {i}', sku=f'PROFILE-{i}', category='Test', price=10, stock=100)
+            for i in range(2)
+        ]
+        db.session.add_all(products)
+    created = datetime(2024, 1, 1)
+    for i in range(start, start + count):
+        customer = Customer(name=f'Profile Customer {i}', email=f'profile-{i}@example.com',
+                            created_at=created + timedelta(minutes=i))
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(CustomerStats(customer_id=customer.id, order_count=1, billable_order_count=1, lifetime_spend=20))
+        order = Order(order_number=f'PROFILE-{i}', customer_id=customer.id, total=20,
+                      created_at=created + timedelta(minutes=i))
+        order.order_items = [
+            OrderItem(product_id=product.id, quantity=1, unit_price=10, subtotal=10) for product in products
+        ]
+        db.session.add(order)
+        db.session.add(Deal(name=f'Profile Deal {i}', customer_id=customer.id, value=100))
+    db.session.commit()
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', on_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', on_execute)
+
+def serialize(profile: str, order_id):
+    """Load and serialize rows the way the routes using profile do"""
+    if profile == 'order_list':
+        return [order.to_dict() for order in Order.query.options(*load_profile(profile)).all()]
+    if profile == 'order_detail':
+        return Order.query.options(*load_profile(profile)).filter_by(id=order_id).one().to_dict()
+    if profile == 'customer_list':
+        return [customer.to_dict() for customer in Customer.query.options(*load_profile(profile)).all()]
+    if profile == 'deal_list':
+        return [(deal.name, deal.customer.name) for deal in Deal.query.options(*load_profile(profile)).all()]
+    raise AssertionError(f'No serializer for profile {profile}')
+
+def test_every_profile_is_counted():
+    assert set(PROFILE_STATEMENTS) == set(QUERY_PROFILES)
+
+@pytest.mark.parametrize('count', [2, 10])
+@pytest.mark.parametrize('profile', sorted(PROFILE_STATEMENTS))
+def test_profile_statement_count(app, profile, count):
+    with app.app_context():
+        seed(count)
+        order_id = db.session.query(Order.id).first()[0]
+
+    with app.app_context():
+        with count_statements() as statements:
+            result = serialize(profile, order_id)
+
+    assert result
+    assert len(statements) == PROFILE_STATEMENTS[profile], statements
+
+@pytest.mark.parametrize('url', [
+    '/api/v1/orders?per_page={n}',
+    '/api/v1/customers?per_page={n}',
+])
+def test_endpoint_statements_do_not_grow_with_page_size(app, client, auth_headers, url):
+    with app.app_context():
+        seed(10)
+
+    counts = []
+    for per_page in (2, 10):
+        with app.app_context():
+            with count_statements() as statements:
+                response = client.get(url.format(n=per_page), headers=auth_headers)
+        assert response.status_code == 200
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+def test_dashboard_stats_statements_do_not_grow_with_orders(app, client, auth_headers):
+    counts = []
+    for start, count in ((0, 2), (2, 8)):
+        with app.app_context():
+            seed(count, start=start)
+            with count_statements() as statements:
+                response = client.get('/api/v1/dashboard/stats', headers=auth_headers)
+        assert response.status_code == 200
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+def test_order_detail_endpoint_statements(app, client, auth_headers):
+    with app.app_context():
+        seed(2)
+        order_id = db.session.query(Order.id).first()[0]
+
+    with app.app_context():
+        with count_statements() as statements:
+            response = client.get(f'/api/v1/orders/{order_id}', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.get_json()['data']['order_items']) == 2
+    assert len(statements) == PROFILE_STATEMENTS['order_detail'], statements
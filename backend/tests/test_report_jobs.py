@@ -0,0 +1,102 @@
+"""
+Report jobs are shared by every server process through the report_jobs table
+"""
+from datetime import datetime, timedelta
+import os
+import threading
+import pytest
+from sqlalchemy import update
+from models import db, ReportJob
+from services.report_jobs import report_job_service, ReportJobService
+
+@pytest.fixture
+def renders(app, monkeypatch, tmp_path):
+    """Replace the dashboard report with one that renders when released; returns the render count"""
+    release = threading.Event()
+    count = []
+
+    def build(format_type, params):
+        release.wait(10)
+        count.append(params)
+        return f"report {len(count)}".encode('utf-8'), 'text/csv', 'unused.csv'
+
+    monkeypatch.setitem(report_job_service.builders, 'dashboard', build)
+    monkeypatch.setattr(report_job_service, 'cache_folder', str(tmp_path))
+    monkeypatch.setattr(report_job_service, 'last_pruned', datetime.utcnow())
+    yield release, count
+    release.set()
+
+def finished(app, job_id, service=report_job_service) -> ReportJob:
+    with app.app_context():
+        return service.wait(job_id, timeout=10)
+
+def test_export_answers_202_without_waiting(app, client, renders):
+    release, count = renders
+
+    response = client.get('/api/v1/dashboard/export?format=csv&days=7')
+
+    assert response.status_code == 202
+    job = response.get_json()['data']
+    assert job['status'] in ('queued', 'running')
+
+    release.set()
+    assert finished(app, job['id']).status == 'completed'
+    again = client.get('/api/v1/dashboard/export?format=csv&days=7')
+    assert again.status_code == 200
+    assert again.get_data() == b'report 1'
+    assert count == [{'days': '7'}]
+
+def test_another_process_resolves_and_shares_the_job(app, client, auth_headers, renders):
+    release, count = renders
+    other = ReportJobService()
+    other.init_app(app)
+    other.builders = report_job_service.builders
+    other.cache_folder = report_job_service.cache_folder
+    try:
+        with app.app_context():
+            job_id = report_job_service.submit('dashboard', 'csv', {'days': '30'}).id
+            # A request for the same report on another worker attaches to the job
+            assert other.submit('dashboard', 'csv', {'days': '30'}).id == job_id
+            assert other.get(job_id) is not None
+
+        release.set()
+        assert finished(app, job_id, other).status == 'completed'
+    finally:
+        other.executor.shutdown()
+
+    response = client.get(f'/api/v1/reports/jobs/{job_id}/download', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(count) == 1
+
+def test_prune_deletes_old_jobs_with_their_files(app, renders):
+    release, count = renders
+    release.set()
+    with app.app_context():
+        old_id = report_job_service.submit('dashboard', 'csv', {'days': '7'}).id
+        old = finished(app, old_id)
+        db.session.execute(update(ReportJob).where(ReportJob.id == old_id).values(
+            finished_at=datetime.utcnow() - report_job_service.RETENTION - timedelta(minutes=1)))
+        db.session.commit()
+
+        report_job_service.last_pruned = None
+        new_id = report_job_service.submit('dashboard', 'csv', {'days': '30'}).id
+        new = finished(app, new_id)
+
+        assert db.session.get(ReportJob, old_id) is None
+        assert not os.path.exists(old.path)
+        assert os.path.exists(new.path)
+
+def test_missing_file_is_rendered_again(app, client, auth_headers, renders):
+    release, count = renders
+    release.set()
+    with app.app_context():
+        job_id = report_job_service.submit('dashboard', 'csv', {'days': '7'}).id
+    os.remove(finished(app, job_id).path)
+
+    response = client.get(f'/api/v1/reports/jobs/{job_id}/download', headers=auth_headers)
+    assert response.status_code == 409
+
+    assert finished(app, job_id).status == 'completed'
+    response = client.get(f'/api/v1/reports/jobs/{job_id}/download', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_data() == b'report 2'
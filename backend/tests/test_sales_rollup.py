@@ -0,0 +1,47 @@
+"""
+Incremental maintenance of the daily sales rollup
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from models import db, DailySalesRollup
+from services.sales_rollup import sales_rollup_service, OrderContribution
+
+DAY = date(2024, 3, 1)
+
+def contribution(total='100.00', status='Completed', units=2):
+    return OrderContribution(created_at=datetime(2024, 3, 1, 12), total=Decimal(total), status=status, units=units)
+
+def rollup_row():
+    return db.session.get(DailySalesRollup, DAY)
+
+def test_add_then_remove_order(app):
+    with app.app_context():
+        sales_rollup_service.apply_order(contribution())
+        sales_rollup_service.apply_order(contribution('50.00', units=1))
+        db.session.commit()
+        sales_rollup_service.apply_order(contribution(), sign=-1)
+        db.session.commit()
+
+        row = rollup_row()
+        assert (row.revenue, row.order_count, row.units_sold) == (Decimal('50.00'), 1, 1)
+
+def test_removal_from_day_without_row_inserts_nothing(app):
+    with app.app_context():
+        sales_rollup_service.apply_order(contribution(), sign=-1)
+        sales_rollup_service.apply_order(contribution(status='Cancelled'), sign=-1)
+        sales_rollup_service.apply_customers(datetime(2024, 3, 1), count=-1)
+        db.session.commit()
+
+        assert rollup_row() is None
+
+def test_removal_never_goes_below_zero(app):
+    with app.app_context():
+        sales_rollup_service.apply_order(contribution('30.00', units=1))
+        db.session.commit()
+        # An order created before the day was backfilled, so never counted
+        sales_rollup_service.apply_order(contribution('100.00', units=5), sign=-1)
+        db.session.commit()
+
+        row = rollup_row()
+        assert (row.revenue, row.order_count, row.units_sold) == (Decimal('0.00'), 0, 0)
+        assert (row.cancelled_count, row.new_customers) == (0, 0)
@@ -0,0 +1,32 @@
+"""
+A short run of benchmarks/websocket_soak.py against serve.py in eventlet mode
+
+The soak test monkey-patches its own process, so it runs as a subprocess; the
+server inherits the test database from conftest.py through the environment.
+"""
+import os
+import socket
+import subprocess
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_eventlet_server_holds_every_client(app):
+    pytest.importorskip('eventlet')
+    pytest.importorskip('wsproto')
+
+    result = subprocess.run(
+        [sys.executable, os.path.join('benchmarks', 'websocket_soak.py'),
+         '--mode', 'eventlet', '--idle', '200', '--active', '10', '--seconds', '8', '--port', str(free_port())],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert 'connected   210/210   dropped 0' in result.stdout
+    assert 'active ping/pong' in result.stdout
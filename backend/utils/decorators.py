@@ -1,7 +1,9 @@
+from datetime import datetime
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import jsonify, request, make_response, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from models import User
+from services.idempotency import idempotency_service
 
 def admin_required():
     def wrapper(fn):
@@ -18,4 +20,92 @@ def admin_required():
                 }), 403
             return fn(*args, **kwargs)
         return decorator
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def _caller_identity():
+    """The JWT identity of the caller, if the request carries a valid token"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+def idempotent():
+    """
+    Replay the stored response for a repeated Idempotency-Key header
+
+    Requests without the header run as usual. The first request with a key
+    runs and its response is stored; retries with the same key and the same
+    method, path and body get that response back without running the route.
+    Reusing a key for a different request is a 422, and a retry that arrives
+    while the first request is still running is a 409. So is a retry of a
+    request whose writes were committed but whose response was lost (the
+    process died in between): it is never run twice.
+
+    Place it below the auth decorator so unauthorized requests never claim a key.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None:
+                return fn(*args, **kwargs)
+
+            if not key or len(key) > idempotency_service.MAX_KEY_LENGTH:
+                return jsonify({
+                    'success': False,
+                    'error': f'Idempotency-Key must be 1 to {idempotency_service.MAX_KEY_LENGTH} characters'
+                }), 400
+
+            scope = f"{request.endpoint}:{_caller_identity() or 'anonymous'}"
+            fingerprint = idempotency_service.fingerprint(request.method, request.path, request.get_data())
+            existing = idempotency_service.claim(
+                scope, key, fingerprint,
+                ttl=current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400),
+                lock_timeout=current_app.config.get('IDEMPOTENCY_LOCK_TIMEOUT', 60)
+            )
+
+            if existing is not None:
+                if existing.fingerprint != fingerprint:
+                    return jsonify({
+                        'success': False,
+                        'error': 'Idempotency-Key was already used for a different request'
+                    }), 422
+                if existing.status == 'committed' and (
+                        existing.locked_until is None or existing.locked_until < datetime.utcnow()):
+                    return jsonify({
+                        'success': False,
+                        'error': 'A request with this Idempotency-Key was applied, but its response was lost'
+                    }), 409
+                if existing.status != 'completed':
+                    response = jsonify({
+                        'success': False,
+                        'error': 'A request with this Idempotency-Key is still being processed'
+                    })
+                    response.headers['Retry-After'] = '1'
+                    return response, 409
+
+                response = current_app.response_class(
+                    existing.response_body,
+                    status=existing.response_status,
+                    mimetype=existing.response_mimetype
+                )
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                with idempotency_service.track_commit(scope, key):
+                    response = make_response(fn(*args, **kwargs))
+            except Exception:
+                idempotency_service.release(scope, key)
+                raise
+
+            if response.status_code in idempotency_service.RETRYABLE_STATUSES:
+                idempotency_service.release(scope, key)
+            else:
+                idempotency_service.complete(
+                    scope, key, response.status_code, response.get_data(), response.mimetype
+                )
+            return response
+        return decorator
+    return wrapper
@@ -0,0 +1,57 @@
+"""
+Cooperative (green thread) server support
+
+In the eventlet websocket mode every connection is a green thread on one
+event loop instead of an OS thread. That only works if nothing blocks the
+loop: the process has to be monkey-patched before the app is imported
+(serve.py does it; gunicorn's eventlet worker does it itself), and psycopg2, which talks to the database through libpq
+rather than Python sockets, needs a wait callback that yields to the loop
+while a query is in flight.
+"""
+import psycopg2
+from psycopg2 import extensions
+
+GREEN_MODES = ('eventlet',)
+
+def monkey_patch(async_mode: str):
+    """
+    Patch the standard library for async_mode; call before importing the app
+    """
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+
+def is_monkey_patched(async_mode: str) -> bool:
+    if async_mode == 'eventlet':
+        from eventlet import patcher
+        return patcher.is_monkey_patched('socket')
+    return True
+
+def patch_psycopg2(async_mode: str):
+    """
+    Make psycopg2 wait for the database on the event loop
+    """
+    if async_mode == 'eventlet':
+        from eventlet.hubs import trampoline
+
+        def wait_read(fileno):
+            trampoline(fileno, read=True)
+
+        def wait_write(fileno):
+            trampoline(fileno, write=True)
+    else:
+        return
+
+    def wait_callback(conn, timeout=None):
+        while True:
+            state = conn.poll()
+            if state == extensions.POLL_OK:
+                break
+            elif state == extensions.POLL_READ:
+                wait_read(conn.fileno())
+            elif state == extensions.POLL_WRITE:
+                wait_write(conn.fileno())
+            else:
+                raise psycopg2.OperationalError(f"Bad result from poll: {state}")
+
+    extensions.set_wait_callback(wait_callback)
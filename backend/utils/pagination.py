@@ -0,0 +1,170 @@
+"""
+List pagination helpers
+
+List routes support two modes:
+- page/per_page (default): Flask-SQLAlchemy paginate(), OFFSET plus COUNT(*)
+- cursor (opt-in with ?cursor=): keyset pagination over (sort key, id), which
+  costs the same on every page and only counts rows with ?include_total=true
+
+Cursors are opaque base64 tokens holding the sort spec and the boundary row's
+sort values. Pass an empty ?cursor= for the first page, then the returned
+next_cursor/prev_cursor. ?sort= picks a sort key from the fields a route
+allows; prefix it with '-' for descending.
+
+Rows whose sort key is NULL sort above every value, as PostgreSQL does by
+default: last in ascending order, first in descending order, in both modes.
+"""
+from flask import request, current_app
+from sqlalchemy import and_, or_, tuple_
+import base64
+import json
+
+class PaginationError(ValueError):
+    pass
+
+def _encode_cursor(sort: str, direction: str, values) -> str:
+    raw = json.dumps({'s': sort, 'd': direction, 'v': [None if v is None else str(v) for v in values]})
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str, sort: str, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if data['s'] != sort or data['d'] not in ('next', 'prev') or len(data['v']) != len(columns):
+            raise PaginationError('Cursor does not match this sort order')
+        values = [_parse_value(column, value) for column, value in zip(columns, data['v'])]
+    except PaginationError:
+        raise
+    except Exception:
+        raise PaginationError('Invalid cursor')
+    return data['d'], values
+
+def _parse_value(column, value: str):
+    """Convert a cursor value back to the column's Python type"""
+    if value is None:
+        if not _nullable(column):
+            raise PaginationError('Invalid cursor')
+        return None
+    python_type = column.type.python_type
+    if hasattr(python_type, 'fromisoformat'):
+        return python_type.fromisoformat(value)
+    return python_type(value)
+
+def _nullable(column) -> bool:
+    return getattr(column.expression, 'nullable', True)
+
+def _order_by(columns, ascending: bool):
+    """ORDER BY for the sort columns, with NULL above every value"""
+    return [column.asc().nulls_last() if ascending else column.desc().nulls_first() for column in columns]
+
+def _after(columns, values, ascending: bool):
+    """
+    Filter for the rows after the boundary (values) in the page's order
+
+    The row comparison skips NULLs, so rows with a NULL sort key are added
+    or compared by id explicitly.
+    """
+    sort_column, id_column = columns
+    sort_value, id_value = values
+    if sort_value is None:
+        # The rest of the NULL rows, then going down every non-NULL one
+        nulls = and_(sort_column.is_(None), id_column > id_value if ascending else id_column < id_value)
+        return nulls if ascending else or_(nulls, sort_column.isnot(None))
+    key, bound = tuple_(*columns), tuple_(*values)
+    if not ascending:
+        return key < bound
+    return or_(key > bound, sort_column.is_(None)) if _nullable(sort_column) else key > bound
+
+def _sort_columns(model, sort_fields: dict, sort: str):
+    """Resolve a sort spec like '-created_at' to (columns, descending)"""
+    descending = sort.startswith('-')
+    name = sort.lstrip('-')
+    if name not in sort_fields:
+        raise PaginationError(f"Invalid sort field. Use one of: {', '.join(sorted(sort_fields))}")
+    # The primary key breaks ties so every row has a unique position
+    return (sort_fields[name], model.id), descending
+
+def keyset_paginate(query, model, sort_fields: dict, sort: str, per_page: int, cursor: str = None, include_total: bool = False) -> dict:
+    """
+    Fetch one page of query after/before cursor
+
+    Returns {'items', 'pagination'}; pagination holds next_cursor/prev_cursor
+    (None at either end) and total when include_total is set.
+    """
+    columns, descending = _sort_columns(model, sort_fields, sort)
+    direction, values = _decode_cursor(cursor, sort, columns) if cursor else ('next', None)
+
+    # Walking backwards flips both the comparison and the ordering
+    backwards = direction == 'prev'
+    ascending = descending == backwards
+
+    page_query = query
+    if values is not None:
+        page_query = page_query.filter(_after(columns, values, ascending))
+    page_query = page_query.order_by(None).order_by(*_order_by(columns, ascending))
+
+    items = page_query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    if backwards:
+        items.reverse()
+
+    # Going forward there is a previous page whenever we started from a cursor;
+    # going back there is a next page (the one we came from)
+    has_next = has_more if not backwards else True
+    has_prev = has_more if backwards else values is not None
+
+    def boundary(item, to):
+        return _encode_cursor(sort, to, [getattr(item, column.key) for column in columns])
+
+    pagination = {
+        'per_page': per_page,
+        'sort': sort,
+        'next_cursor': boundary(items[-1], 'next') if items and has_next else None,
+        'prev_cursor': boundary(items[0], 'prev') if items and has_prev else None,
+        'has_next': bool(items) and has_next,
+        'has_prev': bool(items) and has_prev
+    }
+    if include_total:
+        pagination['total'] = query.order_by(None).count()
+
+    return {'items': items, 'pagination': pagination}
+
+def paginate_list(query, model, sort_fields: dict, default_sort: str = '-created_at', detailed: bool = False):
+    """
+    Paginate a list route's query from the request arguments
+
+    Uses keyset pagination when ?cursor= is present, page/per_page otherwise.
+    ``detailed`` adds pages/has_next/has_prev to the page/per_page response,
+    for the routes that already returned them. Returns (items, pagination).
+    """
+    per_page = request.args.get('per_page', 10, type=int)
+    sort = request.args.get('sort')
+
+    if 'cursor' in request.args:
+        per_page = max(1, min(per_page, current_app.config.get('MAX_PAGE_SIZE', 100)))
+        page = keyset_paginate(
+            query, model, sort_fields, sort or default_sort, per_page,
+            cursor=request.args.get('cursor') or None,
+            include_total=request.args.get('include_total', '').lower() == 'true'
+        )
+        return page['items'], page['pagination']
+
+    page = request.args.get('page', 1, type=int)
+    if sort:
+        columns, descending = _sort_columns(model, sort_fields, sort)
+        query = query.order_by(None).order_by(*_order_by(columns, not descending))
+
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    meta = {
+        'page': page,
+        'per_page': per_page,
+        'total': pagination.total
+    }
+    if detailed:
+        meta.update({
+            'pages': pagination.pages,
+            'has_next': pagination.has_next,
+            'has_prev': pagination.has_prev
+        })
+    return pagination.items, meta
@@ -0,0 +1,28 @@
+"""
+Per-route upload limits
+
+MAX_CONTENT_LENGTH caps every request body. Routes that legitimately take
+large files (imports) can raise their own cap with @upload_limit('<config
+key>'); the app's request class looks the limit up on the matched view.
+"""
+from flask import Request, current_app
+
+class UploadLimitRequest(Request):
+    @property
+    def max_content_length(self):
+        limit = current_app.config.get('MAX_CONTENT_LENGTH')
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        config_key = getattr(view, 'upload_limit_config', None)
+        if config_key:
+            limit = current_app.config.get(config_key, limit)
+        return limit
+
+def upload_limit(config_key: str):
+    """
+    Allow request bodies up to app.config[config_key] on this route
+    """
+    def wrapper(fn):
+        # Copied onto outer decorators by functools.wraps
+        fn.upload_limit_config = config_key
+        return fn
+    return wrapper
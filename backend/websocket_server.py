@@ -8,16 +8,21 @@ from typing import Dict, Set
 from flask import Flask, request
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from datetime import datetime
-import threading
-import time
+from utils.green import is_monkey_patched, patch_psycopg2
+from services.message_bus import create_message_bus
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-client events are logged at DEBUG: with thousands of dashboards
+# connected, INFO lines for each would cost more than the events themselves
+# With a message bus (services/message_bus.py) emits reach the clients of
+# every worker, and the bus adds the other workers' counts to ours
 class WebSocketManager:
-    def __init__(self, socketio: SocketIO):
+    def __init__(self, socketio: SocketIO, bus=None):
         self.socketio = socketio
+        self.bus = bus
         self.connected_clients: Set[str] = set()
         self.rooms: Dict[str, Set[str]] = {
             'dashboard': set(),
@@ -27,11 +32,13 @@ class WebSocketManager:
             'inventory': set(),
             'projects': set(),
         }
+        if bus:
+            bus.local_counts = self.local_counts
         
     def add_client(self, client_id: str):
         """Add a new connected client"""
         self.connected_clients.add(client_id)
-        logger.info(f"Client {client_id} connected. Total clients: {len(self.connected_clients)}")
+        logger.debug(f"Client {client_id} connected. Total clients: {len(self.connected_clients)}")
         
     def remove_client(self, client_id: str):
         """Remove a disconnected client"""
@@ -39,30 +46,52 @@ class WebSocketManager:
         # Remove from all rooms
         for room_clients in self.rooms.values():
             room_clients.discard(client_id)
-        logger.info(f"Client {client_id} disconnected. Total clients: {len(self.connected_clients)}")
+        logger.debug(f"Client {client_id} disconnected. Total clients: {len(self.connected_clients)}")
         
     def join_room(self, client_id: str, room: str):
         """Add client to a specific room"""
         if room in self.rooms:
             self.rooms[room].add(client_id)
-            logger.info(f"Client {client_id} joined room {room}")
+            logger.debug(f"Client {client_id} joined room {room}")
             
     def leave_room(self, client_id: str, room: str):
         """Remove client from a specific room"""
         if room in self.rooms:
             self.rooms[room].discard(client_id)
-            logger.info(f"Client {client_id} left room {room}")
+            logger.debug(f"Client {client_id} left room {room}")
+            
+    def local_counts(self):
+        """(clients, {room: clients}) of this worker"""
+        return len(self.connected_clients), {room: len(clients) for room, clients in self.rooms.items()}
+        
+    def get_stats(self) -> dict:
+        """Connected clients and room membership across all workers"""
+        clients, rooms = self.local_counts()
+        servers = 1
+        if self.bus:
+            peer_servers, peer_clients, peer_rooms = self.bus.peer_counts()
+            servers += peer_servers
+            clients += peer_clients
+            for room, count in peer_rooms.items():
+                rooms[room] = rooms.get(room, 0) + count
+        return {'servers': servers, 'clients': clients, 'rooms': rooms}
+        
+    def is_leader(self) -> bool:
+        """Whether this worker runs the periodic updates for the cluster"""
+        return self.bus.try_lead() if self.bus else True
             
     def broadcast_to_room(self, room: str, event: str, data: dict):
         """Broadcast data to all clients in a room"""
-        if room in self.rooms and self.rooms[room]:
+        # Other workers' members may be newer than their last count, so
+        # with a bus the emit is always published
+        if room in self.rooms and (self.bus or self.rooms[room]):
             self.socketio.emit(event, data, room=room)
-            logger.info(f"Broadcasted {event} to {len(self.rooms[room])} clients in room {room}")
+            logger.debug(f"Broadcasted {event} to {len(self.rooms[room])} clients in room {room}")
             
     def broadcast_to_all(self, event: str, data: dict):
         """Broadcast data to all connected clients"""
         self.socketio.emit(event, data)
-        logger.info(f"Broadcasted {event} to {len(self.connected_clients)} clients")
+        logger.debug(f"Broadcasted {event} to {len(self.connected_clients)} clients")
 
 # Global WebSocket manager instance
 ws_manager = None
@@ -71,13 +100,25 @@ def init_websocket(app: Flask):
     """Initialize WebSocket server"""
     global ws_manager
     
+    # threading: one OS thread per connection; eventlet: green threads
+    # on one event loop, for thousands of connections per process
+    async_mode = app.config['WEBSOCKET_ASYNC_MODE']
+    if not is_monkey_patched(async_mode):
+        logger.warning(f"WEBSOCKET_ASYNC_MODE={async_mode} but the process is not monkey-patched; start it with serve.py")
+    patch_psycopg2(async_mode)
+    bus = create_message_bus(app.config)
+    
     socketio = SocketIO(
         app,
         cors_allowed_origins=app.config['CORS_ORIGINS'],  # IMPORTANT
-        async_mode="threading",  # Using threading for Python 3.12+ compatibility
+        async_mode=async_mode,
+        # Largest message a client may send; ours are a few bytes
+        max_http_buffer_size=app.config['WEBSOCKET_MAX_MESSAGE_SIZE'],
+        ping_interval=app.config['WEBSOCKET_PING_INTERVAL'],
+        client_manager=bus,
     )
     
-    ws_manager = WebSocketManager(socketio)
+    ws_manager = WebSocketManager(socketio, bus)
     
     @socketio.on('connect')
     def handle_connect():
@@ -195,9 +236,10 @@ def start_background_tasks():
         while True:
             try:
                 # Simulate periodic data updates
-                time.sleep(30)  # Update every 30 seconds
+                ws_manager.socketio.sleep(30)  # Update every 30 seconds
                 
-                if ws_manager and ws_manager.connected_clients:
+                # One worker broadcasts for the whole cluster
+                if ws_manager and ws_manager.is_leader() and ws_manager.get_stats()['clients']:
                     # Broadcast periodic updates to different rooms
                     broadcast_dashboard_update()
                     broadcast_crm_update()
@@ -209,9 +251,8 @@ def start_background_tasks():
             except Exception as e:
                 logger.error(f"Error in background task: {e}")
                 
-    # Start background thread
-    thread = threading.Thread(target=periodic_updates, daemon=True)
-    thread.start()
+    # Start background thread (a green thread in the eventlet mode)
+    ws_manager.socketio.start_background_task(periodic_updates)
     logger.info("Background tasks started")
 
 # Utility functions for broadcasting updates from API endpoints
@@ -249,3 +290,21 @@ def notify_project_updated(project_data):
     """Notify when a project is updated"""
     broadcast_projects_update()
     broadcast_notification(f"Project {project_data.get('name', 'Unknown')} has been updated", 'info')
+
+def notify_report_ready(job_data):
+    """Notify the report's room when a report job finishes"""
+    if ws_manager:
+        room = 'crm' if job_data.get('report_type') == 'crm' else 'dashboard'
+        ws_manager.broadcast_to_room(room, 'report_ready', job_data)
+
+def notify_import_progress(progress_data):
+    """Report import progress to the room that shows the imported data"""
+    if ws_manager:
+        room = 'inventory' if progress_data.get('dataset') == 'products' else 'crm'
+        ws_manager.broadcast_to_room(room, 'import_progress', progress_data)
+
+def get_realtime_stats():
+    """Connected clients and room membership across all workers"""
+    if ws_manager:
+        return ws_manager.get_stats()
+    return {'servers': 0, 'clients': 0, 'rooms': {}}